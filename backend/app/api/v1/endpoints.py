@@ -1,14 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body, UploadFile, File
-from fastapi.responses import StreamingResponse, Response
+from fastapi import APIRouter, HTTPException, Depends, status, Body, UploadFile, File, Request
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
+import json
+import asyncio
 
 # Import for authentication
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.core.security import create_access_token, verify_password, decode_access_token # type: ignore
 from jose import JWTError # For token decoding errors
+from starlette.concurrency import run_in_threadpool
 
 # Direct and Explicit Imports
 from app.schemas import conversation as conversation_schemas
@@ -20,6 +23,8 @@ from app.schemas import prompt as prompt_schemas
 from app.schemas import dictionary as dictionary_schemas
 from app.schemas import note as note_schemas
 from app.schemas import user as user_schemas # <-- NEW IMPORT
+from app.schemas import search as search_schemas
+from app.schemas.pagination import Page
 
 from app.crud import conversation_crud
 from app.crud import settings_crud
@@ -28,12 +33,25 @@ from app.crud import prompt_crud
 from app.crud import dictionary_crud
 from app.crud import note_crud
 from app.crud import user_crud # <-- NEW IMPORT
+from app.crud import search_crud
+from app.crud import transcription_cache_crud
+from app.crud.pagination import InvalidCursorError
 
 from app.services import translation_service
 from app.services import tts_service
+from app.services import token_counter
 from app.services import transcription_service
-
-from app.db.database import SessionLocal
+from app.services import export_service
+from app.services import backup_service
+from app.services import glossary_io_service
+from app.services.translation_cache import translation_cache
+from app.services.upstream_clients import upstream_clients
+from app.services.upstream_scheduler import PRIORITY_BATCH, upstream_scheduler
+from app.services.singleflight import translation_flights, tts_flights, transcription_flights
+from app.services.tts_cache import tts_cache, make_tts_cache_key, is_valid_key
+from app.core.config import settings as app_settings
+
+from app.db.database import SessionLocal, AsyncDBSession, open_async_db
 from app.db import models # Needed for type hinting in get_current_user
 
 # OAuth2PasswordBearer is used to extract the token from the request header
@@ -46,8 +64,13 @@ def get_db():
     finally:
         db.close()
 
+# Dependency for async endpoints: never blocks the event loop (see DATABASE_SESSION_MODE)
+async def get_async_db():
+    async with open_async_db() as db:
+        yield db
+
 # Dependency to get the current authenticated user
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+async def get_current_user(db: AsyncDBSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,7 +84,7 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         token_data = user_schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = user_crud.get_user_by_username(db, username=token_data.username)
+    user = await db.run_sync(user_crud.get_user_by_username, token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -72,10 +95,11 @@ router = APIRouter()
 @router.post("/token", response_model=user_schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_db)
 ):
-    user = user_crud.get_user_by_username(db, username=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.run_sync(user_crud.get_user_by_username, form_data.username)
+    # bcrypt is deliberately slow, so keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -109,12 +133,12 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
 async def update_current_user_password(
     password_data: user_schemas.UserUpdatePassword,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_db)
 ):
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    if not await run_in_threadpool(verify_password, password_data.old_password, current_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="كلمة المرور القديمة غير صحيحة.")
     
-    updated_user = user_crud.update_user_password(db, current_user, password_data.new_password)
+    updated_user = await db.run_sync(user_crud.update_user_password, current_user, password_data.new_password)
     return updated_user
 
 # --- Settings Endpoints ---
@@ -125,10 +149,7 @@ def create_or_update_setting(setting: setting_schemas.SettingCreate, db: Session
 
 @router.get("/settings/{key}", response_model=setting_schemas.Setting)
 def read_setting(key: str, db: Session = Depends(get_db)):
-    db_setting = settings_crud.get_setting(db, key=key)
-    if db_setting is None:
-        return setting_schemas.Setting(key=key, value=None)
-    return db_setting
+    return setting_schemas.Setting(key=key, value=settings_crud.get_settings_snapshot(db).get(key))
 
 # --- User Profile Endpoints ---
 @router.get("/profile", response_model=user_profile_schemas.UserProfile)
@@ -160,35 +181,70 @@ def read_all_conversations(skip: int = 0, limit: int = 100, db: Session = Depend
 def read_all_archived_conversations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return conversation_crud.get_archived_conversations(db, skip=skip, limit=limit)
 
+@router.get("/conversations/page", response_model=Page[conversation_schemas.ConversationSummary])
+# @router.get("/conversations/page", response_model=Page[conversation_schemas.ConversationSummary], dependencies=[Depends(get_current_user)])
+def read_conversation_summaries_page(cursor: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    try:
+        items, next_cursor = conversation_crud.get_conversation_summaries_page(db, archived=False, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/conversations/archived/page", response_model=Page[conversation_schemas.ConversationSummary])
+# @router.get("/conversations/archived/page", response_model=Page[conversation_schemas.ConversationSummary], dependencies=[Depends(get_current_user)])
+def read_archived_conversation_summaries_page(cursor: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    try:
+        items, next_cursor = conversation_crud.get_conversation_summaries_page(db, archived=True, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
 @router.get("/conversations/{conversation_id}", response_model=conversation_schemas.Conversation)
 # @router.get("/conversations/{conversation_id}", response_model=conversation_schemas.Conversation, dependencies=[Depends(get_current_user)])
-def read_single_conversation(conversation_id: int, db: Session = Depends(get_db)):
+def read_single_conversation(conversation_id: int, include_messages: bool = True, db: Session = Depends(get_db)):
     db_conversation = conversation_crud.get_conversation(db, conversation_id=conversation_id)
     if db_conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    if not include_messages:
+        conversation_info = conversation_schemas.ConversationInfo.model_validate(db_conversation)
+        return conversation_schemas.Conversation(**conversation_info.model_dump(), messages=None)
     return db_conversation
+
+@router.get("/conversations/{conversation_id}/messages", response_model=conversation_schemas.MessageWindow)
+# @router.get("/conversations/{conversation_id}/messages", response_model=conversation_schemas.MessageWindow, dependencies=[Depends(get_current_user)])
+def read_conversation_messages(conversation_id: int, limit: int = 50, before_id: Optional[int] = None, after_id: Optional[int] = None, db: Session = Depends(get_db)):
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id, not both.")
+    if conversation_crud.get_conversation(db, conversation_id=conversation_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    messages, has_more = conversation_crud.get_messages_window(db, conversation_id, limit=limit, before_id=before_id, after_id=after_id)
+    return {"messages": messages, "has_more": has_more}
     
 @router.get("/conversations/{conversation_id}/export")
 # @router.get("/conversations/{conversation_id}/export", dependencies=[Depends(get_current_user)])
-def export_conversation(conversation_id: int, db: Session = Depends(get_db)):
+def export_conversation(conversation_id: int, format: str = "txt", source_language: str = "ar", target_language: str = "en", db: Session = Depends(get_db)):
+    """
+    Streams the conversation as txt, jsonl, csv or tmx (TMX 1.4 translation memory).
+    The language codes are only used by TMX.
+    """
+    if format not in export_service.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format. Use one of: {', '.join(export_service.EXPORT_FORMATS)}.")
     db_conversation = conversation_crud.get_conversation(db, conversation_id=conversation_id)
     if db_conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    export_content = f"Conversation Title: {db_conversation.title}\n"
-    export_content += f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-    export_content += "=" * 40 + "\n\n"
-
-    for message in db_conversation.messages:
-        export_content += f"[User]: {message.original_text}\n"
-        export_content += f"[Assistant]: {message.translated_text}\n"
-        export_content += "---\n"
-
-    return Response(
-        content=export_content,
-        media_type="text/plain",
+    media_type, extension = export_service.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_service.iter_conversation_export(
+            db_conversation.id,
+            db_conversation.title,
+            format,
+            source_language=source_language,
+            target_language=target_language,
+        ),
+        media_type=media_type,
         headers={
-            "Content-Disposition": f'attachment; filename="conversation_{db_conversation.id}.txt"'
+            "Content-Disposition": f'attachment; filename="conversation_{db_conversation.id}.{extension}"'
         }
     )
 
@@ -228,64 +284,339 @@ def delete_conversation_endpoint(conversation_id: int, db: Session = Depends(get
         raise HTTPException(status_code=404, detail="Conversation not found")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@router.post("/conversations/{conversation_id}/translate", response_model=conversation_schemas.Message)
-# @router.post("/conversations/{conversation_id}/translate", response_model=conversation_schemas.Message, dependencies=[Depends(get_current_user)])
-async def add_new_message_to_conversation(conversation_id: int, request: translation_schemas.NewTranslationRequest, db: Session = Depends(get_db)):
-    api_key_setting = settings_crud.get_setting(db, key="openai_api_key")
-    if not api_key_setting or not api_key_setting.value:
+async def _load_translation_context(
+    db: AsyncDBSession, conversation_id: int
+) -> Tuple[str, models.Conversation, str, List[models.Message]]:
+    """
+    Loads what the translate endpoints need: the API key, the conversation, the translation
+    model and the context messages (empty when the conversation does not use context).
+    Raises 400 if no API key is stored and 404 if the conversation does not exist.
+    """
+    stored_settings = await db.run_sync(settings_crud.get_settings_snapshot)
+    api_key = stored_settings.get("openai_api_key")
+    if not api_key:
         raise HTTPException(status_code=400, detail="OpenAI API key is not set in settings.")
-    
-    conversation = conversation_crud.get_conversation(db, conversation_id=conversation_id)
+
+    conversation = await db.run_sync(conversation_crud.get_conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    model_setting = settings_crud.get_setting(db, key="translation_model")
-    model_name = model_setting.value if model_setting and model_setting.value else "gpt-4o-mini"
-    
+    model_name = stored_settings.get("translation_model") or "gpt-4o-mini"
+
     past_messages = []
     if conversation.use_context:
-        past_messages = conversation_crud.get_last_messages(db, conversation_id=conversation.id, limit=4)
+        past_messages = await db.run_sync(
+            conversation_crud.get_context_messages,
+            conversation.id,
+            token_counter.context_token_budget(model_name),
+            app_settings.CONTEXT_MAX_MESSAGES,
+        )
+    return api_key, conversation, model_name, past_messages
+
+@router.post("/conversations/{conversation_id}/translate", response_model=conversation_schemas.Message)
+# @router.post("/conversations/{conversation_id}/translate", response_model=conversation_schemas.Message, dependencies=[Depends(get_current_user)])
+async def add_new_message_to_conversation(conversation_id: int, request: translation_schemas.NewTranslationRequest, db: AsyncDBSession = Depends(get_async_db)):
+    api_key, conversation, model_name, past_messages = await _load_translation_context(db, conversation_id)
 
+    [reuse_key] = await db.run_sync(
+        translation_service.make_reuse_keys, [request.text_to_translate], request.target_language, conversation.custom_prompt, model_name
+    )
     translated_text = await translation_service.get_ai_translation(
         db=db, # Pass db session to service
         text=request.text_to_translate,
         target_language=request.target_language,
-        api_key=api_key_setting.value,
+        api_key=api_key,
         past_messages=past_messages,
         custom_prompt=conversation.custom_prompt,
-        model_name=model_name
+        model_name=model_name,
+        use_cache=not request.bypass_cache
     )
 
     if translated_text.startswith("Error:"):
         raise HTTPException(status_code=503, detail=translated_text)
     
-    message_to_create = conversation_schemas.MessageCreate(original_text=request.text_to_translate, translated_text=translated_text)
-    return conversation_crud.create_conversation_message(db=db, message=message_to_create, conversation_id=conversation_id)
+    message_to_create = conversation_schemas.MessageCreate(
+        original_text=request.text_to_translate,
+        translated_text=translated_text,
+        target_language=request.target_language,
+        reuse_key=reuse_key
+    )
+    return await db.run_sync(conversation_crud.create_conversation_message, message_to_create, conversation_id)
+
+@router.post("/conversations/{conversation_id}/translate/batch", response_model=translation_schemas.BatchTranslationResponse)
+# @router.post("/conversations/{conversation_id}/translate/batch", response_model=translation_schemas.BatchTranslationResponse, dependencies=[Depends(get_current_user)])
+async def add_batch_of_messages_to_conversation(conversation_id: int, request: translation_schemas.BatchTranslationRequest, db: AsyncDBSession = Depends(get_async_db)):
+    """
+    Translates a list of texts with bounded upstream concurrency. Results come back in input
+    order with per-item errors, and all successful translations are saved in one bulk write.
+    """
+    if len(request.texts) > app_settings.BATCH_TRANSLATION_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {app_settings.BATCH_TRANSLATION_MAX_ITEMS} texts.")
+
+    # Every item shares the context as it was before the batch started
+    api_key, conversation, model_name, past_messages = await _load_translation_context(db, conversation_id)
+
+    concurrency = min(request.concurrency or app_settings.BATCH_TRANSLATION_CONCURRENCY, app_settings.BATCH_TRANSLATION_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def translate_one(text: str) -> str:
+        if not text.strip():
+            return "Error: Text is empty."
+        async with semaphore:
+            return await translation_service.get_ai_translation(
+                db=db,
+                text=text,
+                target_language=request.target_language,
+                api_key=api_key,
+                past_messages=past_messages,
+                custom_prompt=conversation.custom_prompt,
+                model_name=model_name,
+                use_cache=not request.bypass_cache,
+                priority=PRIORITY_BATCH
+            )
+
+    reuse_keys = await db.run_sync(
+        translation_service.make_reuse_keys, request.texts, request.target_language, conversation.custom_prompt, model_name
+    )
+    results = await asyncio.gather(*(translate_one(text) for text in request.texts), return_exceptions=True)
+
+    items = []
+    messages_to_create = []
+    for index, (text, result, reuse_key) in enumerate(zip(request.texts, results, reuse_keys)):
+        if isinstance(result, BaseException):
+            result = f"Error: Could not get translation from AI. Details: {result}"
+        if result.startswith("Error:"):
+            items.append(translation_schemas.BatchTranslationItem(index=index, original_text=text, error=result))
+        else:
+            items.append(translation_schemas.BatchTranslationItem(index=index, original_text=text))
+            messages_to_create.append(conversation_schemas.MessageCreate(
+                original_text=text, translated_text=result, target_language=request.target_language, reuse_key=reuse_key
+            ))
+
+    created_messages = iter(await db.run_sync(conversation_crud.create_conversation_messages, messages_to_create, conversation_id))
+    for item in items:
+        if item.error is None:
+            item.message = conversation_schemas.Message.model_validate(next(created_messages))
+
+    succeeded = len(messages_to_create)
+    return translation_schemas.BatchTranslationResponse(items=items, succeeded=succeeded, failed=len(items) - succeeded)
+
+def _sse_event(event: str, data: dict) -> str:
+    """
+    Formats a single Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/conversations/{conversation_id}/translate/stream")
+# @router.post("/conversations/{conversation_id}/translate/stream", dependencies=[Depends(get_current_user)])
+async def stream_new_message_to_conversation(
+    conversation_id: int,
+    request: translation_schemas.NewTranslationRequest,
+    http_request: Request,
+    db: AsyncDBSession = Depends(get_async_db)
+):
+    """
+    Same as /translate, but forwards the translation as Server-Sent Events while it is generated:
+    'token' events carry text deltas, a final 'done' event carries the saved message,
+    and an 'error' event is sent instead if the upstream call fails or returns no text
+    (nothing is saved then).
+    """
+    api_key, conversation, model_name, past_messages = await _load_translation_context(db, conversation_id)
+
+    [reuse_key] = await db.run_sync(
+        translation_service.make_reuse_keys, [request.text_to_translate], request.target_language, conversation.custom_prompt, model_name
+    )
+    token_stream = await translation_service.stream_ai_translation(
+        db=db,
+        text=request.text_to_translate,
+        target_language=request.target_language,
+        api_key=api_key,
+        past_messages=past_messages,
+        custom_prompt=conversation.custom_prompt,
+        model_name=model_name,
+        use_cache=not request.bypass_cache
+    )
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in token_stream:
+                if await http_request.is_disconnected():
+                    return
+                parts.append(delta)
+                yield _sse_event("token", {"text": delta})
+        except Exception as e:
+            print(f"An error occurred while streaming from the OpenAI API: {e}")
+            yield _sse_event("error", {"detail": f"Error: Could not get translation from AI. Details: {e}"})
+            return
+        finally:
+            # Closes the upstream stream if the client went away mid-translation
+            await token_stream.aclose()
+
+        translated_text = "".join(parts).strip()
+        if not translated_text:
+            # Nothing to save: an empty message would still count and be indexed
+            print("The OpenAI API stream ended without any translated text")
+            yield _sse_event("error", {"detail": "Error: Could not get translation from AI. Details: the response was empty."})
+            return
+
+        message_to_create = conversation_schemas.MessageCreate(
+            original_text=request.text_to_translate,
+            translated_text=translated_text,
+            target_language=request.target_language,
+            reuse_key=reuse_key
+        )
+        # The request-scoped session may already be closed once the response is streaming
+        async with open_async_db() as stream_db:
+            db_message = await stream_db.run_sync(conversation_crud.create_conversation_message, message_to_create, conversation_id)
+        saved_message = conversation_schemas.Message.model_validate(db_message).model_dump(mode="json")
+        yield _sse_event("done", saved_message)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- Search Endpoints ---
+@router.get("/search", response_model=Page[search_schemas.SearchHit])
+# @router.get("/search", response_model=Page[search_schemas.SearchHit], dependencies=[Depends(get_current_user)])
+def search_history(q: str, kind: Optional[str] = None, conversation_id: Optional[int] = None, cursor: Optional[str] = None, limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Full-text search over message texts (original and translated) and notes, best matches first.
+    Narrow it down with kind ("message" or "note") and/or conversation_id.
+    """
+    if kind is not None and kind not in search_crud.SEARCH_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(search_crud.SEARCH_KINDS)}.")
+    try:
+        items, next_cursor = search_crud.search(db, q, kind=kind, conversation_id=conversation_id, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except search_crud.SearchUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+# --- Backup Endpoints ---
+@router.get("/backup")
+# @router.get("/backup", dependencies=[Depends(get_current_user)])
+def download_backup():
+    """
+    Streams every conversation, message, note, prompt, dictionary entry, setting and the
+    user profile as a zip of NDJSON files.
+    """
+    filename = f"translator-backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    return StreamingResponse(
+        backup_service.iter_backup_archive(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/backup/restore")
+# @router.post("/backup/restore", dependencies=[Depends(get_current_user)])
+def restore_backup(backup_file: UploadFile = File(...), replace: bool = False, db: Session = Depends(get_db)):
+    """
+    Restores an archive produced by GET /backup. Fails with 409 if the database already
+    holds data, unless replace=true.
+    """
+    try:
+        row_counts = backup_service.restore_backup_archive(db, backup_file.file, replace=replace)
+    except backup_service.BackupConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except backup_service.BackupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"The archive conflicts with existing data: {e.orig}")
+    return {"restored": row_counts}
+
+# --- Translation Cache Endpoints ---
+@router.get("/translation-cache/stats")
+# @router.get("/translation-cache/stats", dependencies=[Depends(get_current_user)])
+def read_translation_cache_stats():
+    return translation_cache.stats()
+
+@router.delete("/translation-cache", status_code=status.HTTP_204_NO_CONTENT)
+# @router.delete("/translation-cache", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user)])
+def clear_translation_cache():
+    translation_cache.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/tts-cache/stats")
+# @router.get("/tts-cache/stats", dependencies=[Depends(get_current_user)])
+def read_tts_cache_stats():
+    return tts_cache.stats()
+
+@router.delete("/tts-cache", status_code=status.HTTP_204_NO_CONTENT)
+# @router.delete("/tts-cache", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user)])
+def clear_tts_cache():
+    tts_cache.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/transcription-cache/stats")
+# @router.get("/transcription-cache/stats", dependencies=[Depends(get_current_user)])
+async def read_transcription_cache_stats(db: AsyncDBSession = Depends(get_async_db)):
+    summary = await db.run_sync(transcription_cache_crud.get_cache_summary)
+    return {**summary, **transcription_service.transcription_cache_stats.stats()}
+
+@router.delete("/transcription-cache", status_code=status.HTTP_204_NO_CONTENT)
+# @router.delete("/transcription-cache", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user)])
+async def clear_transcription_cache(db: AsyncDBSession = Depends(get_async_db)):
+    await db.run_sync(transcription_cache_crud.clear_transcripts)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/prompt-tokens/stats")
+# @router.get("/prompt-tokens/stats", dependencies=[Depends(get_current_user)])
+def read_prompt_token_stats():
+    return token_counter.prompt_token_stats.stats()
+
+@router.get("/request-coalescing/stats")
+# @router.get("/request-coalescing/stats", dependencies=[Depends(get_current_user)])
+def read_request_coalescing_stats():
+    return {flights.name: flights.stats() for flights in (translation_flights, tts_flights, transcription_flights)}
+
+@router.get("/upstream-scheduler/stats")
+# @router.get("/upstream-scheduler/stats", dependencies=[Depends(get_current_user)])
+def read_upstream_scheduler_stats():
+    return upstream_scheduler.stats()
+
+@router.get("/upstream-clients/stats")
+# @router.get("/upstream-clients/stats", dependencies=[Depends(get_current_user)])
+def read_upstream_client_stats():
+    return upstream_clients.stats()
 
 # --- Message Endpoints ---
 @router.patch("/messages/{message_id}", response_model=conversation_schemas.Message)
 # @router.patch("/messages/{message_id}", response_model=conversation_schemas.Message, dependencies=[Depends(get_current_user)])
-async def edit_message(message_id: int, payload: conversation_schemas.MessageUpdate, db: Session = Depends(get_db)):
-    db_message = conversation_crud.get_message(db, message_id)
+async def edit_message(message_id: int, payload: conversation_schemas.MessageUpdate, db: AsyncDBSession = Depends(get_async_db)):
+    db_message = await db.run_sync(conversation_crud.get_message, message_id)
     if not db_message:
         raise HTTPException(status_code=404, detail="Message not found")
 
-    api_key_setting = settings_crud.get_setting(db, key="openai_api_key")
-    if not api_key_setting or not api_key_setting.value:
+    stored_settings = await db.run_sync(settings_crud.get_settings_snapshot)
+    api_key = stored_settings.get("openai_api_key")
+    if not api_key:
         raise HTTPException(status_code=400, detail="OpenAI API key is not set in settings.")
 
+    target_language = db_message.target_language or "English"
+    model_name = "gpt-4o-mini"
+    [reuse_key] = await db.run_sync(
+        translation_service.make_reuse_keys, [payload.original_text], target_language, None, model_name
+    )
     translated_text = await translation_service.get_ai_translation(
         db=db, # Pass db session to service
         text=payload.original_text,
-        target_language="English", # This should ideally be dynamic
-        api_key=api_key_setting.value,
+        target_language=target_language,
+        api_key=api_key,
         past_messages=[],
         custom_prompt=None,
+        model_name=model_name,
+        use_cache=not payload.bypass_cache
     )
     if translated_text.startswith("Error:"):
         raise HTTPException(status_code=503, detail=translated_text)
     
-    updated_message = conversation_crud.update_message(db, message_id, payload.original_text, translated_text)
+    updated_message = await db.run_sync(
+        conversation_crud.update_message, message_id, payload.original_text, translated_text, reuse_key
+    )
     return updated_message
 
 @router.delete("/messages/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -300,47 +631,101 @@ def delete_message_endpoint(message_id: int, db: Session = Depends(get_db)):
 # --- Text-to-Speech Endpoint ---
 @router.post("/text-to-speech")
 # @router.post("/text-to-speech", dependencies=[Depends(get_current_user)])
-async def handle_text_to_speech(request: tts_schemas.TTSRequest, db: Session = Depends(get_db)):
-    api_key_setting = settings_crud.get_setting(db, key="openai_api_key")
-    if not api_key_setting or not api_key_setting.value:
+async def handle_text_to_speech(request: tts_schemas.TTSRequest, http_request: Request, db: AsyncDBSession = Depends(get_async_db)):
+    stored_settings = await db.run_sync(settings_crud.get_settings_snapshot)
+    api_key = stored_settings.get("openai_api_key")
+    if not api_key:
         raise HTTPException(status_code=400, detail="OpenAI API key is not set in settings.")
 
-    tts_model_setting = settings_crud.get_setting(db, key="tts_model")
-    tts_voice_setting = settings_crud.get_setting(db, key="tts_voice")
-    
-    tts_model = tts_model_setting.value if tts_model_setting and tts_model_setting.value else "tts-1"
-    tts_voice = tts_voice_setting.value if tts_voice_setting and tts_voice_setting.value else "alloy"
+    tts_model = stored_settings.get("tts_model") or "tts-1"
+    tts_voice = stored_settings.get("tts_voice") or "alloy"
+
+    if request.chunked:
+        audio_stream = await tts_service.stream_chunked_speech(
+            text=request.text,
+            api_key=api_key,
+            model_name=tts_model,
+            voice_name=tts_voice,
+            max_chars=app_settings.TTS_CHUNK_MAX_CHARS,
+            concurrency=app_settings.TTS_CHUNK_CONCURRENCY,
+            use_cache=app_settings.TTS_CACHE_ENABLED
+        )
+        if audio_stream is None:
+            raise HTTPException(status_code=500, detail="Failed to generate audio.")
+        # Each sentence is cached on its own; there is no single cached file for the whole
+        # text, so it is not looked up
+        return StreamingResponse(audio_stream, media_type="audio/mpeg")
+
+    cache_key = None
+    if app_settings.TTS_CACHE_ENABLED:
+        cache_key = make_tts_cache_key(request.text, tts_model, tts_voice, "mp3")
+        cached_path = await run_in_threadpool(tts_cache.get, cache_key)
+        if cached_path is not None:
+            return _cached_audio_response(http_request, cache_key, cached_path)
 
     audio_stream = await tts_service.generate_speech_from_text(
         text=request.text, 
-        api_key=api_key_setting.value,
+        api_key=api_key,
         model_name=tts_model,
-        voice_name=tts_voice
+        voice_name=tts_voice,
+        cache_key=cache_key
     )
     
     if audio_stream is None:
         raise HTTPException(status_code=500, detail="Failed to generate audio.")
 
-    return StreamingResponse(audio_stream, media_type="audio/mpeg")
+    headers = {}
+    if cache_key is not None:
+        # Once the stream completes, replays can use GET /text-to-speech/audio/{key}
+        headers = {"X-Audio-Key": cache_key, "X-TTS-Cache": "miss"}
+    return StreamingResponse(audio_stream, media_type="audio/mpeg", headers=headers)
+
+@router.get("/text-to-speech/audio/{audio_key}")
+# @router.get("/text-to-speech/audio/{audio_key}", dependencies=[Depends(get_current_user)])
+async def get_cached_speech(audio_key: str, http_request: Request):
+    """
+    Serves previously synthesized audio from the TTS cache, with Range and ETag support.
+    """
+    if not is_valid_key(audio_key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    cached_path = await run_in_threadpool(tts_cache.get, audio_key)
+    if cached_path is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return _cached_audio_response(http_request, audio_key, cached_path)
+
+def _cached_audio_response(http_request: Request, cache_key: str, path: str) -> Response:
+    # The key is a hash of the content's inputs, so it doubles as a strong ETag
+    etag = f'"{cache_key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "X-Audio-Key": cache_key,
+        "X-TTS-Cache": "hit",
+    }
+    if_none_match = http_request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type="audio/mpeg", headers=headers)
 
 # --- Transcription Endpoint ---
 @router.post("/transcribe")
 # @router.post("/transcribe", dependencies=[Depends(get_current_user)])
 async def transcribe_audio_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncDBSession = Depends(get_async_db),
     audio_file: UploadFile = File(...)
 ):
-    api_key_setting = settings_crud.get_setting(db, key="openai_api_key")
-    if not api_key_setting or not api_key_setting.value:
+    stored_settings = await db.run_sync(settings_crud.get_settings_snapshot)
+    api_key = stored_settings.get("openai_api_key")
+    if not api_key:
         raise HTTPException(status_code=400, detail="OpenAI API key is not set in settings.")
 
-    lang_setting = settings_crud.get_setting(db, key="transcription_language")
-    language = lang_setting.value if lang_setting else None
+    language = stored_settings.get("transcription_language")
     
     transcribed_text = await transcription_service.transcribe_audio(
-        api_key=api_key_setting.value,
+        api_key=api_key,
         audio_file=audio_file,
-        language=language
+        language=language,
+        db=db
     )
 
     if transcribed_text.startswith("Error:"):
@@ -360,6 +745,15 @@ def create_new_prompt(prompt: prompt_schemas.PromptCreate, db: Session = Depends
 def read_all_prompts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return prompt_crud.get_prompts(db, skip=skip, limit=limit)
 
+@router.get("/prompts/page", response_model=Page[prompt_schemas.Prompt])
+# @router.get("/prompts/page", response_model=Page[prompt_schemas.Prompt], dependencies=[Depends(get_current_user)])
+def read_prompts_page(cursor: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    try:
+        items, next_cursor = prompt_crud.get_prompts_page(db, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
 @router.get("/prompts/{prompt_id}", response_model=prompt_schemas.Prompt)
 # @router.get("/prompts/{prompt_id}", response_model=prompt_schemas.Prompt, dependencies=[Depends(get_current_user)])
 def read_single_prompt(prompt_id: int, db: Session = Depends(get_db)):
@@ -399,6 +793,49 @@ def create_new_dictionary_entry(entry: dictionary_schemas.DictionaryEntryCreate,
 def read_all_dictionary_entries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return dictionary_crud.get_dictionary_entries(db, skip=skip, limit=limit)
 
+@router.get("/dictionary/page", response_model=Page[dictionary_schemas.DictionaryEntry])
+# @router.get("/dictionary/page", response_model=Page[dictionary_schemas.DictionaryEntry], dependencies=[Depends(get_current_user)])
+def read_dictionary_entries_page(cursor: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    try:
+        items, next_cursor = dictionary_crud.get_dictionary_entries_page(db, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.post("/dictionary/import")
+# @router.post("/dictionary/import", dependencies=[Depends(get_current_user)])
+def import_dictionary(
+    glossary_file: UploadFile = File(...),
+    format: Optional[str] = None,
+    source_language: Optional[str] = None,
+    target_language: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk-imports a CSV, TSV or TBX glossary, inserting new terms and updating existing ones.
+    The format is taken from the file extension unless given explicitly. For TBX files,
+    source_language/target_language pick the languages (default: first and second of each entry).
+    """
+    glossary_format = format or glossary_io_service.detect_format(glossary_file.filename)
+    if glossary_format not in glossary_io_service.GLOSSARY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported glossary format. Use one of: {', '.join(glossary_io_service.GLOSSARY_FORMATS)}.")
+    try:
+        return glossary_io_service.import_glossary(db, glossary_file.file, glossary_format, source_language, target_language)
+    except glossary_io_service.GlossaryImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/dictionary/export")
+# @router.get("/dictionary/export", dependencies=[Depends(get_current_user)])
+def export_dictionary(format: str = "csv", source_language: str = "ar", target_language: str = "en"):
+    if format not in glossary_io_service.GLOSSARY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported glossary format. Use one of: {', '.join(glossary_io_service.GLOSSARY_FORMATS)}.")
+    media_type, extension = glossary_io_service.GLOSSARY_FORMATS[format]
+    return StreamingResponse(
+        glossary_io_service.iter_glossary_export(format, source_language=source_language, target_language=target_language),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="glossary.{extension}"'}
+    )
+
 @router.put("/dictionary/{entry_id}", response_model=dictionary_schemas.DictionaryEntry)
 # @router.put("/dictionary/{entry_id}", response_model=dictionary_schemas.DictionaryEntry, dependencies=[Depends(get_current_user)])
 def update_existing_dictionary_entry(entry_id: int, entry: dictionary_schemas.DictionaryEntryUpdate, db: Session = Depends(get_db)):
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     """
@@ -8,9 +8,114 @@ class Settings(BaseSettings):
     """
     OPENAI_API_KEY: Optional[str] = None
 
+    # Translation result cache (in-process, per worker)
+    TRANSLATION_CACHE_ENABLED: bool = True
+    TRANSLATION_CACHE_TTL_SECONDS: int = 3600
+    TRANSLATION_CACHE_MAX_ENTRIES: int = 5000
+
+    # Upstream (OpenAI-compatible) HTTP client pool
+    OPENAI_BASE_URL: Optional[str] = None
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_TIMEOUT_SECONDS: float = 120.0
+
+    # Upstream scheduler: per-API-key budgets (0 = no local limit; set them to the account's
+    # rate limits), the share of each budget kept free for interactive requests while batch
+    # work is queued, and retries of 429s / timeouts / 5xx with jittered backoff.
+    UPSTREAM_RPM_LIMIT: int = 0
+    UPSTREAM_TPM_LIMIT: int = 0
+    UPSTREAM_INTERACTIVE_RESERVE: float = 0.2
+    UPSTREAM_MAX_RETRIES: int = 3
+    UPSTREAM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    UPSTREAM_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    UPSTREAM_QUEUE_TIMEOUT_SECONDS: float = 120.0
+
+    # Batch translation
+    BATCH_TRANSLATION_CONCURRENCY: int = 8
+    BATCH_TRANSLATION_MAX_CONCURRENCY: int = 32
+    BATCH_TRANSLATION_MAX_ITEMS: int = 1000
+
+    # Settings snapshot cache. With cross-worker checks enabled, each worker compares a
+    # version row at most once per interval to pick up writes made by other workers.
+    SETTINGS_CACHE_CROSS_WORKER: bool = True
+    SETTINGS_VERSION_CHECK_INTERVAL_SECONDS: float = 1.0
+
+    # How async endpoints talk to the database:
+    #   "threadpool" - the regular sync engine, with each call run in a worker thread
+    #   "async"      - a native async engine (aiosqlite for SQLite, asyncpg for PostgreSQL)
+    DATABASE_SESSION_MODE: str = "threadpool"
+
+    # PostgreSQL text search configuration used by the search indexes ("simple" does no stemming)
+    SEARCH_TEXT_CONFIG: str = "simple"
+
+    # On-disk cache of synthesized speech (per worker size cap)
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: str = "./tts_cache"
+    TTS_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Sentence-chunked speech synthesis ("chunked" text-to-speech requests)
+    TTS_CHUNK_MAX_CHARS: int = 300
+    TTS_CHUNK_CONCURRENCY: int = 4
+
+    # Long-audio transcription: PCM WAV uploads longer than one segment, or larger than
+    # TRANSCRIPTION_MAX_UPLOAD_BYTES (below the upstream's 25 MB limit), are split near
+    # silences and the segments are transcribed concurrently. Segments are shortened as
+    # needed to stay under that size. Other formats, and WAV files over the limit, are
+    # converted to 16 kHz mono WAV first when ffmpeg is available (set
+    # TRANSCRIPTION_FFMPEG_PATH to "" to disable).
+    TRANSCRIPTION_SEGMENT_SECONDS: float = 300.0
+    TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS: float = 2.0
+    TRANSCRIPTION_SILENCE_SEARCH_SECONDS: float = 20.0
+    TRANSCRIPTION_CONCURRENCY: int = 4
+    TRANSCRIPTION_FFMPEG_PATH: str = "ffmpeg"
+    TRANSCRIPTION_CONVERT_MIN_BYTES: int = 4 * 1024 * 1024
+    TRANSCRIPTION_MAX_UPLOAD_BYTES: int = 24 * 1024 * 1024
+
+    # Persistent transcription cache, keyed by audio content hash, language and model.
+    # The least recently used entries are pruned beyond TRANSCRIPTION_CACHE_MAX_ENTRIES.
+    TRANSCRIPTION_CACHE_ENABLED: bool = True
+    TRANSCRIPTION_CACHE_MAX_ENTRIES: int = 10000
+
+    # Translation memory over earlier messages with the same target language. Similarity is
+    # 1.0 for the same text (ignoring case, punctuation and Arabic vowel marks), otherwise
+    # the trigram Dice coefficient; matches at or above the hint threshold are added to the
+    # prompt. With TRANSLATION_MEMORY_REUSE_ENABLED, an earlier translation of exactly the
+    # same text, made with the same prompt, glossary version and model, is returned without
+    # calling the model. Trigrams found in more than TRANSLATION_MEMORY_MAX_POSTINGS
+    # messages are too common to tell candidates apart and are not looked up.
+    TRANSLATION_MEMORY_ENABLED: bool = True
+    TRANSLATION_MEMORY_REUSE_ENABLED: bool = False
+    TRANSLATION_MEMORY_HINT_THRESHOLD: float = 0.7
+    TRANSLATION_MEMORY_MAX_HINTS: int = 3
+    TRANSLATION_MEMORY_CANDIDATES: int = 20
+    TRANSLATION_MEMORY_MAX_POSTINGS: int = 1000
+    TRANSLATION_MEMORY_MAX_CHARS: int = 2000
+
+    # Glossary terms are matched as whole words, so short terms are not found inside other
+    # words; Arabic terms still match after attached prefixes (ال، و، ب، ل، ك، ف).
+    # Set to False to match anywhere, for scripts written without spaces between words.
+    GLOSSARY_WHOLE_WORDS: bool = True
+
+    # Conversation context sent with each translation: the most recent messages that fit
+    # the token budget of the model (CONTEXT_TOKEN_BUDGETS, a JSON object of model name to
+    # budget, falling back to CONTEXT_TOKEN_BUDGET), at most CONTEXT_MAX_MESSAGES of them.
+    # Tokens are counted with tiktoken when it is installed, otherwise estimated.
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {}
+    CONTEXT_MAX_MESSAGES: int = 20
+    TOKEN_COUNT_ENCODING: str = "o200k_base"
+
+    # Prometheus-style metrics at /metrics: per-route HTTP latency, database statement
+    # timings, upstream latency/errors/tokens per model and the cache counters.
+    # Off by default: the endpoint is not authenticated, so only enable it where
+    # /metrics is reachable by the scraper alone.
+    METRICS_ENABLED: bool = False
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 # Create a single, importable instance of the settings
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,365 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+@dataclass
+class _Sample:
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[_Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[_Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [_Sample(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[_Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [_Sample(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = HTTP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then the sum and the total count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[_Sample]:
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(_Sample(f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(_Sample(f"{self.name}_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append(_Sample(f"{self.name}_sum", labels, total))
+            samples.append(_Sample(f"{self.name}_count", labels, count))
+        return samples
+
+
+@dataclass
+class CollectedMetric:
+    """
+    A value read at scrape time from a collector (e.g. a stats() dict).
+    """
+    name: str
+    kind: str
+    help: str
+    labels: Dict[str, str]
+    value: float
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in the Prometheus text format, without a client library.
+
+    Metrics defined here are updated as things happen (middleware, engine events, service
+    hooks). Collectors are called on every scrape; they expose the counters the services
+    already keep for their /.../stats endpoints, under the same names.
+    Each worker process has its own registry.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[CollectedMetric]]] = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = HTTP_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[CollectedMetric]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_stats(
+        self,
+        prefix: str,
+        stats: Callable[[], Dict[str, object]],
+        counters: Iterable[str] = (),
+        labels: Optional[Dict[str, str]] = None,
+        nested_label: str = "key",
+    ) -> None:
+        """
+        Exposes a stats() dict: each number becomes `<prefix>_<key>` (with a _total suffix
+        for the keys listed in `counters`), booleans become 0 or 1, and nested dicts get
+        their keys as the `nested_label` label.
+        """
+        counters = set(counters)
+        labels = dict(labels or {})
+
+        def collect() -> Iterator[CollectedMetric]:
+            for key, value in stats().items():
+                kind = "counter" if key in counters else "gauge"
+                name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+                help_text = f"'{key}' from the {prefix} stats"
+                if isinstance(value, dict):
+                    for nested_key, nested_value in value.items():
+                        if isinstance(nested_value, (int, float)):
+                            yield CollectedMetric(name, kind, help_text, {**labels, nested_label: str(nested_key)}, nested_value)
+                elif isinstance(value, (int, float)):
+                    yield CollectedMetric(name, kind, help_text, labels, value)
+
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                lines.append(f"{sample.name}{_format_labels(sample.labels)} {_format_value(sample.value)}")
+
+        # Collected values are grouped by name: several collectors may share a metric
+        families: Dict[str, List[CollectedMetric]] = {}
+        for collector in collectors:
+            try:
+                for collected in collector():
+                    families.setdefault(collected.name, []).append(collected)
+            except Exception as e:
+                print(f"A metrics collector failed: {e}")
+        for name, collected in families.items():
+            lines.append(f"# HELP {name} {_escape(collected[0].help)}")
+            lines.append(f"# TYPE {name} {collected[0].kind}")
+            for item in collected:
+                lines.append(f"{name}{_format_labels(item.labels)} {_format_value(item.value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry, served at /metrics
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request until its response (including streamed bodies) is sent.",
+    ("method", "route"),
+    HTTP_BUCKETS,
+)
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled.", ("method",)
+)
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "Time spent executing database statements.", ("operation",), DB_BUCKETS
+)
+db_query_errors = metrics.counter(
+    "db_query_errors_total", "Database statements that raised an error.", ("operation",)
+)
+upstream_request_duration = metrics.histogram(
+    "upstream_request_duration_seconds",
+    "Time until an upstream API response (or the start of a streamed one), per attempt.",
+    ("endpoint", "model"),
+    UPSTREAM_BUCKETS,
+)
+upstream_requests = metrics.counter(
+    "upstream_requests_total", "Upstream API attempts by outcome.", ("endpoint", "model", "outcome")
+)
+upstream_tokens = metrics.counter(
+    "upstream_tokens_total", "Tokens the upstream API reported as used.", ("model", "type")
+)
+upstream_characters = metrics.counter(
+    "upstream_characters_total", "Characters sent for speech synthesis (what TTS is billed by).", ("model",)
+)
+upstream_queue_wait = metrics.histogram(
+    "upstream_queue_wait_seconds",
+    "Time requests waited in the upstream scheduler for their turn.",
+    ("priority",),
+    UPSTREAM_BUCKETS,
+)
+
+
+# --- HTTP ---
+
+def _route_template(scope: Scope) -> str:
+    """
+    The path template of the route that handled a request (e.g.
+    /api/v1/conversations/{conversation_id}), so that ids do not end up in label values.
+    Read after routing, from the route the router stored in the scope.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Depending on the FastAPI version, routes of an included router know their full path
+    # or only the part after the router's prefix; the prefix is recovered from the real path
+    rendered = template
+    for name, value in scope.get("path_params", {}).items():
+        rendered = rendered.replace("{" + name + "}", str(value))
+    path = scope.get("path", "")
+    if rendered != path and path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Records per-route latency and status codes, and the requests in flight. A plain ASGI
+    middleware, so that streamed responses are timed until their last byte.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # By method only: the route is not known until the request has been routed
+        http_requests_in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_template(scope)
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=str(status_code))
+            http_requests_in_flight.dec(method=method)
+
+
+# --- Database ---
+
+def _statement_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in _DB_OPERATIONS else "OTHER"
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Times every statement run on this engine (pass async_engine.sync_engine for async engines).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_started"].pop()
+        db_query_duration.observe(time.perf_counter() - started, operation=_statement_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        db_query_errors.inc(operation=_statement_operation(context.statement or ""))
+        if context.connection is not None and context.connection.info.get("metrics_query_started"):
+            context.connection.info["metrics_query_started"].pop()
@@ -0,0 +1,26 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.db import models
+
+def get_version(db: Session, name: str) -> int:
+    """
+    Returns the current version of a cached dataset, or 0 if it was never bumped.
+    """
+    version = db.query(models.CacheVersion.version).filter(models.CacheVersion.name == name).scalar()
+    return version or 0
+
+def bump_version(db: Session, name: str) -> int:
+    """
+    Increments the version of a cached dataset inside the caller's transaction
+    and returns the new value. The caller is responsible for committing.
+    """
+    result = db.execute(
+        update(models.CacheVersion)
+        .where(models.CacheVersion.name == name)
+        .values(version=models.CacheVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(models.CacheVersion(name=name, version=1))
+        db.flush()
+        return 1
+    return get_version(db, name)
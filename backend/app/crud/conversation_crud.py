@@ -1,11 +1,18 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.sql import func # **إضافة**: لاستخدام دالة func.now()
 from app.db import models
 from app.schemas import conversation as conversation_schemas
-from typing import List, Optional
+from app.services import token_counter
+from typing import Iterator, List, Optional, Tuple
 
 from . import settings_crud
 from . import prompt_crud
+from . import translation_memory_crud
+from .pagination import MAX_PAGE_SIZE, paginate
+
+# Length of the last-message preview stored on each conversation
+PREVIEW_LENGTH = 120
 
 # --- **دالة مساعدة جديدة** ---
 def touch_conversation(db: Session, conversation_id: int):
@@ -19,6 +26,47 @@ def touch_conversation(db: Session, conversation_id: int):
         db.commit()
     return db_conversation
 
+def _latest_message_preview():
+    """
+    Correlated subquery returning the preview of a conversation's most recent message.
+    """
+    return select(func.substr(models.Message.original_text, 1, PREVIEW_LENGTH))\
+        .where(models.Message.conversation_id == models.Conversation.id)\
+        .order_by(models.Message.created_at.desc(), models.Message.id.desc())\
+        .limit(1)\
+        .scalar_subquery()
+
+def _record_messages_added(db: Session, conversation_id: int, count: int, last_original_text: str):
+    """
+    Bumps the denormalized stats and 'updated_at' of a conversation in a single UPDATE, then commits.
+    """
+    db.execute(
+        update(models.Conversation)
+        .where(models.Conversation.id == conversation_id)
+        .values(
+            updated_at=func.now(),
+            message_count=models.Conversation.message_count + count,
+            last_message_preview=last_original_text[:PREVIEW_LENGTH],
+        )
+    )
+    db.commit()
+
+def _record_messages_changed(db: Session, conversation_id: int, count_delta: int = 0):
+    """
+    Recomputes the preview (the latest message may have been edited or deleted),
+    adjusts the message count and touches 'updated_at', then commits.
+    """
+    db.execute(
+        update(models.Conversation)
+        .where(models.Conversation.id == conversation_id)
+        .values(
+            updated_at=func.now(),
+            message_count=models.Conversation.message_count + count_delta,
+            last_message_preview=_latest_message_preview(),
+        )
+    )
+    db.commit()
+
 # --- Conversation CRUD ---
 def get_conversations(db: Session, skip: int = 0, limit: int = 100) -> List[models.Conversation]:
     """
@@ -36,15 +84,35 @@ def get_archived_conversations(db: Session, skip: int = 0, limit: int = 100) ->
              .filter(models.Conversation.is_archived == True)\
              .order_by(models.Conversation.updated_at.desc()).offset(skip).limit(limit).all()
 
+def get_conversation_summaries_page(db: Session, archived: bool = False, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[models.Conversation], Optional[str]]:
+    """
+    Lightweight listing for the sidebar: reads only the conversations table (no messages),
+    most recently updated first, using the (is_archived, updated_at, id) index.
+    Cursor-paginated on (updated_at, id): a conversation that gets a new message while
+    the client is scrolling moves to the top of the list instead of shifting every later page.
+    """
+    query = db.query(models.Conversation)\
+              .options(load_only(
+                  models.Conversation.title,
+                  models.Conversation.created_at,
+                  models.Conversation.updated_at,
+                  models.Conversation.is_archived,
+                  models.Conversation.message_count,
+                  models.Conversation.last_message_preview,
+              ))\
+              .filter(models.Conversation.is_archived == archived)
+    sort_keys = [(models.Conversation.updated_at, True), (models.Conversation.id, True)]
+    return paginate(query, sort_keys, cursor, limit)
+
 def get_conversation(db: Session, conversation_id: int) -> Optional[models.Conversation]:
     return db.query(models.Conversation).filter(models.Conversation.id == conversation_id).first()
 
 def create_conversation(db: Session, conversation: conversation_schemas.ConversationCreate) -> models.Conversation:
     default_prompt_content = None
-    default_prompt_id_setting = settings_crud.get_setting(db, "default_prompt_id")
-    if default_prompt_id_setting and default_prompt_id_setting.value:
+    default_prompt_id = settings_crud.get_settings_snapshot(db).get("default_prompt_id")
+    if default_prompt_id:
         try:
-            prompt_id = int(default_prompt_id_setting.value)
+            prompt_id = int(default_prompt_id)
             default_prompt = prompt_crud.get_prompt(db, prompt_id)
             if default_prompt:
                 default_prompt_content = default_prompt.content
@@ -94,6 +162,7 @@ def rename_conversation(db: Session, conversation_id: int, title: str) -> Option
 def delete_conversation(db: Session, conversation_id: int) -> Optional[models.Conversation]:
     db_conversation = get_conversation(db, conversation_id)
     if db_conversation:
+        translation_memory_crud.unindex_conversation(db, conversation_id)
         db.delete(db_conversation)
         db.commit()
     return db_conversation
@@ -106,25 +175,154 @@ def get_message(db: Session, message_id: int) -> Optional[models.Message]:
 def get_last_messages(db: Session, conversation_id: int, limit: int = 4) -> List[models.Message]:
     return db.query(models.Message)\
              .filter(models.Message.conversation_id == conversation_id)\
-             .order_by(models.Message.created_at.desc())\
+             .order_by(models.Message.created_at.desc(), models.Message.id.desc())\
              .limit(limit)\
              .all()[::-1]
 
+def _truncated_context_message(message: models.Message, token_budget: int) -> Optional[models.Message]:
+    """
+    A transient (never saved) copy of message cut down to token_budget. The end of both
+    texts is kept, as the part closest to the text being translated, and the budget is
+    split between them in proportion to their lengths. None if the budget is too small.
+    """
+    available = token_budget - 2 * token_counter.MESSAGE_OVERHEAD_TOKENS
+    original_tokens = token_counter.count_tokens(message.original_text)
+    translated_tokens = token_counter.count_tokens(message.translated_text)
+    if available < 2 or not original_tokens or not translated_tokens:
+        return None
+    original_budget = min(max(available * original_tokens // (original_tokens + translated_tokens), 1), available - 1)
+    return models.Message(
+        id=message.id,
+        conversation_id=message.conversation_id,
+        original_text=token_counter.truncate_to_last_tokens(message.original_text, original_budget),
+        translated_text=token_counter.truncate_to_last_tokens(message.translated_text, available - original_budget),
+        target_language=message.target_language,
+        created_at=message.created_at,
+    )
+
+def get_context_messages(db: Session, conversation_id: int, token_budget: int, max_messages: int = 20) -> List[models.Message]:
+    """
+    Returns the most recent messages whose combined token count fits token_budget, oldest first.
+    Messages are taken whole and without gaps: selection stops at the first one that does not fit.
+    If even the newest message does not fit, a copy of it cut down to the budget is returned
+    instead (see _truncated_context_message), so the model still gets some context. That
+    copy is not attached to the session and must not be saved.
+    """
+    selected = []
+    used_tokens = 0
+    for message in reversed(get_last_messages(db, conversation_id, max_messages)):
+        tokens = message.token_count
+        if tokens is None:
+            tokens = token_counter.count_message_tokens(message.original_text, message.translated_text)
+        if used_tokens + tokens > token_budget:
+            if not selected:
+                truncated = _truncated_context_message(message, token_budget)
+                if truncated is not None:
+                    selected.append(truncated)
+            break
+        used_tokens += tokens
+        selected.append(message)
+    return selected[::-1]
+
+def iter_conversation_messages(db: Session, conversation_id: int, batch_size: int = 500) -> Iterator[models.Message]:
+    """
+    Streams a conversation's messages in chronological order, fetching them in batches.
+    """
+    query = db.query(models.Message)\
+              .filter(models.Message.conversation_id == conversation_id)\
+              .order_by(models.Message.created_at.asc(), models.Message.id.asc())\
+              .yield_per(batch_size)
+    for message in query:
+        yield message
+
+def get_messages_window(db: Session, conversation_id: int, limit: int = 50, before_id: Optional[int] = None, after_id: Optional[int] = None) -> Tuple[List[models.Message], bool]:
+    """
+    Returns up to 'limit' messages in chronological order, plus whether more exist in that direction:
+    the latest messages by default, older than before_id, or newer than after_id.
+    """
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    query = db.query(models.Message).filter(models.Message.conversation_id == conversation_id)
+
+    anchor_id = before_id if before_id is not None else after_id
+    if anchor_id is not None:
+        # Compared in SQL so the anchor's timestamp never round-trips through Python
+        anchor_created_at = select(models.Message.created_at)\
+                            .where(models.Message.id == anchor_id, models.Message.conversation_id == conversation_id)\
+                            .scalar_subquery()
+        if before_id is not None:
+            query = query.filter(or_(
+                models.Message.created_at < anchor_created_at,
+                and_(models.Message.created_at == anchor_created_at, models.Message.id < anchor_id),
+            ))
+        else:
+            query = query.filter(or_(
+                models.Message.created_at > anchor_created_at,
+                and_(models.Message.created_at == anchor_created_at, models.Message.id > anchor_id),
+            ))
+
+    newer_first = after_id is None
+    if newer_first:
+        query = query.order_by(models.Message.created_at.desc(), models.Message.id.desc())
+    else:
+        query = query.order_by(models.Message.created_at.asc(), models.Message.id.asc())
+
+    messages = query.limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if newer_first:
+        messages.reverse()
+    return messages, has_more
+
 def create_conversation_message(db: Session, message: conversation_schemas.MessageCreate, conversation_id: int) -> models.Message:
-    db_message = models.Message(**message.model_dump(), conversation_id=conversation_id)
+    db_message = models.Message(
+        **message.model_dump(),
+        conversation_id=conversation_id,
+        token_count=token_counter.count_message_tokens(message.original_text, message.translated_text),
+    )
     db.add(db_message)
+    db.flush()
+    translation_memory_crud.index_messages(db, [db_message])
     # **التعديل**: تحديث المحادثة الأم بعد إضافة رسالة
-    touch_conversation(db, conversation_id)
+    _record_messages_added(db, conversation_id, 1, message.original_text)
     db.refresh(db_message)
     return db_message
 
-def update_message(db: Session, message_id: int, original_text: str, translated_text: str) -> Optional[models.Message]:
+def create_conversation_messages(db: Session, messages: List[conversation_schemas.MessageCreate], conversation_id: int) -> List[models.Message]:
+    """
+    Inserts many messages with a single bulk INSERT ... RETURNING and one commit,
+    instead of one round trip and commit per message. Returned in input order.
+    """
+    if not messages:
+        return []
+    rows = db.scalars(
+        insert(models.Message).returning(models.Message, sort_by_parameter_order=True),
+        [
+            dict(
+                **message.model_dump(),
+                conversation_id=conversation_id,
+                token_count=token_counter.count_message_tokens(message.original_text, message.translated_text),
+            )
+            for message in messages
+        ],
+    ).all()
+    message_ids = [row.id for row in rows]
+    translation_memory_crud.index_messages(db, rows)
+    _record_messages_added(db, conversation_id, len(messages), messages[-1].original_text)
+    # Reload everything the commit expired with one query rather than one refresh per row
+    db.query(models.Message).filter(models.Message.id.in_(message_ids)).all()
+    return rows
+
+def update_message(db: Session, message_id: int, original_text: str, translated_text: str, reuse_key: Optional[str] = None) -> Optional[models.Message]:
     db_message = get_message(db, message_id)
     if db_message:
         db_message.original_text = original_text
         db_message.translated_text = translated_text
+        db_message.reuse_key = reuse_key
+        db_message.token_count = token_counter.count_message_tokens(original_text, translated_text)
+        db.flush()
+        translation_memory_crud.index_messages(db, [db_message])
         # **التعديل**: تحديث المحادثة الأم بعد تعديل رسالة
-        touch_conversation(db, db_message.conversation_id)
+        _record_messages_changed(db, db_message.conversation_id)
         db.refresh(db_message)
     return db_message
 
@@ -133,6 +331,8 @@ def delete_message(db: Session, message_id: int) -> Optional[models.Message]:
     if db_message:
         conversation_id = db_message.conversation_id
         db.delete(db_message)
+        db.flush()
+        translation_memory_crud.unindex_message(db, message_id)
         # **التعديل**: تحديث المحادثة الأم بعد حذف رسالة
-        touch_conversation(db, conversation_id)
+        _record_messages_changed(db, conversation_id, count_delta=-1)
     return db_message
\ No newline at end of file
@@ -1,8 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from app.db import models
 from app.schemas import dictionary as dictionary_schemas
+from app.services import dictionary_service
+from . import cache_version_crud
+from .pagination import paginate
 
 def get_dictionary_entry(db: Session, entry_id: int) -> Optional[models.DictionaryEntry]:
     """
@@ -16,6 +20,82 @@ def get_dictionary_entries(db: Session, skip: int = 0, limit: int = 100) -> List
     """
     return db.query(models.DictionaryEntry).order_by(models.DictionaryEntry.source_text).offset(skip).limit(limit).all()
 
+def get_dictionary_entries_page(db: Session, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[models.DictionaryEntry], Optional[str]]:
+    """
+    Cursor-paginated list of dictionary entries in source_text order (served by its unique index).
+    """
+    # source_text is unique, so it is a complete sort key on its own
+    sort_keys = [(models.DictionaryEntry.source_text, False)]
+    return paginate(db.query(models.DictionaryEntry), sort_keys, cursor, limit)
+
+def iter_all_dictionary_entries(db: Session, batch_size: int = 1000) -> Iterator[Tuple[int, str, str]]:
+    """
+    Streams every dictionary entry as (id, source_text, target_text), without a limit.
+    """
+    query = db.query(models.DictionaryEntry.id, models.DictionaryEntry.source_text, models.DictionaryEntry.target_text)\
+              .order_by(models.DictionaryEntry.id)\
+              .yield_per(batch_size)
+    for entry_id, source_text, target_text in query:
+        yield entry_id, source_text, target_text
+
+def _upsert_statement(db: Session):
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(models.DictionaryEntry)
+    return statement.on_conflict_do_update(
+        index_elements=[models.DictionaryEntry.source_text],
+        set_={"target_text": statement.excluded.target_text},
+    ).returning(models.DictionaryEntry.id, models.DictionaryEntry.source_text, models.DictionaryEntry.target_text)
+
+def upsert_dictionary_entries(db: Session, pairs: Iterable[Tuple[str, str]], batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Inserts or updates (source_text, target_text) pairs in batches, with one
+    INSERT ... ON CONFLICT statement and one commit per batch.
+    Returns inserted/updated/skipped counts; skipped covers empty terms, unchanged
+    entries and duplicates within the input (the last occurrence wins).
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    def flush_batch(batch: Dict[str, str]) -> None:
+        existing = dict(
+            db.query(models.DictionaryEntry.source_text, models.DictionaryEntry.target_text)
+              .filter(models.DictionaryEntry.source_text.in_(list(batch)))
+              .all()
+        )
+        rows = []
+        for source_text, target_text in batch.items():
+            if source_text not in existing:
+                counts["inserted"] += 1
+            elif existing[source_text] != target_text:
+                counts["updated"] += 1
+            else:
+                counts["skipped"] += 1
+                continue
+            rows.append({"source_text": source_text, "target_text": target_text})
+        if not rows:
+            return
+        saved = [tuple(row) for row in db.execute(_upsert_statement(db), rows)]
+        version = cache_version_crud.bump_version(db, dictionary_service.GLOSSARY_VERSION_KEY)
+        db.commit()
+        dictionary_service.on_entries_saved(saved, version)
+
+    batch: Dict[str, str] = {}
+    for source_text, target_text in pairs:
+        source_text, target_text = (source_text or "").strip(), (target_text or "").strip()
+        if not source_text or not target_text:
+            counts["skipped"] += 1
+            continue
+        if source_text in batch:
+            # Superseded by a later row of the same batch
+            counts["skipped"] += 1
+            del batch[source_text]
+        batch[source_text] = target_text
+        if len(batch) >= batch_size:
+            flush_batch(batch)
+            batch = {}
+    if batch:
+        flush_batch(batch)
+    return counts
+
 def create_dictionary_entry(db: Session, entry: dictionary_schemas.DictionaryEntryCreate) -> models.DictionaryEntry:
     """
     Creates a new dictionary entry.
@@ -25,8 +105,10 @@ def create_dictionary_entry(db: Session, entry: dictionary_schemas.DictionaryEnt
         target_text=entry.target_text
     )
     db.add(db_entry)
+    version = cache_version_crud.bump_version(db, dictionary_service.GLOSSARY_VERSION_KEY)
     db.commit()
     db.refresh(db_entry)
+    dictionary_service.on_entry_saved(db_entry.id, db_entry.source_text, db_entry.target_text, version)
     return db_entry
 
 def update_dictionary_entry(db: Session, entry_id: int, entry_data: dictionary_schemas.DictionaryEntryUpdate) -> Optional[models.DictionaryEntry]:
@@ -41,8 +123,10 @@ def update_dictionary_entry(db: Session, entry_id: int, entry_data: dictionary_s
     for key, value in update_data.items():
         setattr(db_entry, key, value)
 
+    version = cache_version_crud.bump_version(db, dictionary_service.GLOSSARY_VERSION_KEY)
     db.commit()
     db.refresh(db_entry)
+    dictionary_service.on_entry_saved(db_entry.id, db_entry.source_text, db_entry.target_text, version)
     return db_entry
 
 def delete_dictionary_entry(db: Session, entry_id: int) -> Optional[models.DictionaryEntry]:
@@ -52,5 +136,7 @@ def delete_dictionary_entry(db: Session, entry_id: int) -> Optional[models.Dicti
     db_entry = get_dictionary_entry(db, entry_id)
     if db_entry:
         db.delete(db_entry)
+        version = cache_version_crud.bump_version(db, dictionary_service.GLOSSARY_VERSION_KEY)
         db.commit()
+        dictionary_service.on_entry_deleted(entry_id, version)
     return db_entry
\ No newline at end of file
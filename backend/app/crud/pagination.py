@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, and_, literal, or_, type_coerce
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+MAX_PAGE_SIZE = 200
+
+# (column, descending)
+SortKey = Tuple[ColumnElement, bool]
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded.
+    """
+
+
+def _encode_value(value: Any) -> list:
+    if isinstance(value, datetime):
+        return ["d", value.isoformat()]
+    if isinstance(value, bool) or value is None:
+        raise TypeError(f"Unsupported cursor value: {value!r}")
+    if isinstance(value, int):
+        return ["i", value]
+    if isinstance(value, float):
+        return ["f", value]
+    return ["s", str(value)]
+
+def _decode_value(item: list) -> Any:
+    kind, value = item
+    if kind == "d":
+        return datetime.fromisoformat(value)
+    if kind == "i":
+        return int(value)
+    if kind == "f":
+        return float(value)
+    if kind == "s":
+        return str(value)
+    raise InvalidCursorError(f"Unknown cursor value type '{kind}'.")
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Packs the sort-key values of the last row of a page into an opaque, URL-safe token.
+    """
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, expected_length: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        items = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [_decode_value(item) for item in items]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Invalid pagination cursor.") from e
+    if len(values) != expected_length:
+        raise InvalidCursorError("Invalid pagination cursor.")
+    return values
+
+def _bind(value: Any):
+    # Values read back raw from SQLite are strings in the exact stored format, so they
+    # are compared as text; re-binding them as datetimes would change their format.
+    if isinstance(value, str):
+        return literal(value, String())
+    return literal(value)
+
+def _after(sort_keys: Sequence[SortKey], values: Sequence[Any]):
+    """
+    Builds the keyset predicate "row comes after (values)" for a mixed-direction sort.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(sort_keys):
+        equal_prefix = [sort_keys[j][0] == _bind(values[j]) for j in range(i)]
+        step = column < _bind(values[i]) if descending else column > _bind(values[i])
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+def paginate(query: Query, sort_keys: Sequence[SortKey], cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    """
+    Returns one page of a single-entity query using keyset pagination, and the cursor
+    for the next page (None on the last page). The sort keys must be unique together,
+    so the last one is normally the primary key.
+
+    The cursor stores the raw database values of the last row, so every page is a
+    constant-time index range scan no matter how deep the client has scrolled.
+    """
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    raw_columns = [type_coerce(column, String()).label(f"_cursor_{i}") for i, (column, _) in enumerate(sort_keys)]
+    query = query.add_columns(*raw_columns)
+    if cursor:
+        query = query.filter(_after(sort_keys, decode_cursor(cursor, len(sort_keys))))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in sort_keys])
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1:])
+    return [row[0] for row in rows], next_cursor
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from app.db import models
 from app.schemas import prompt as prompt_schemas
+from .pagination import paginate
 
 def get_prompt(db: Session, prompt_id: int) -> Optional[models.Prompt]:
     """
@@ -16,6 +17,13 @@ def get_prompts(db: Session, skip: int = 0, limit: int = 100) -> List[models.Pro
     """
     return db.query(models.Prompt).order_by(models.Prompt.created_at.desc()).offset(skip).limit(limit).all()
 
+def get_prompts_page(db: Session, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[models.Prompt], Optional[str]]:
+    """
+    Cursor-paginated list of prompts, newest first, on (created_at, id).
+    """
+    sort_keys = [(models.Prompt.created_at, True), (models.Prompt.id, True)]
+    return paginate(db.query(models.Prompt), sort_keys, cursor, limit)
+
 def create_prompt(db: Session, prompt: prompt_schemas.PromptCreate) -> models.Prompt:
     """
     Creates a new prompt in the database.
@@ -0,0 +1,258 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from .pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+# Arabic harakat, superscript alef and tatweel. They are stripped from indexed text and
+# queries alike, so a search matches with or without vowel marks.
+ARABIC_MARKS = "".join(chr(code) for code in range(0x064B, 0x0660)) + "\u0670\u0640"
+_ARABIC_MARKS_TABLE = str.maketrans("", "", ARABIC_MARKS)
+
+SEARCH_KINDS = ("message", "note")
+
+# SQLite: one FTS5 table for messages and notes, kept up to date by triggers, so every
+# writer (the app, scripts, benchmarks) maintains it. Row ids are derived from the source
+# row (2 * id for a message, 2 * id + 1 for a note), so every write is a primary-key operation.
+_FTS_TABLE = "search_index"
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5("
+    "body, translation, kind UNINDEXED, conversation_id UNINDEXED, "
+    "tokenize = \"unicode61 remove_diacritics 2 categories 'L* N* Co M*'\")"
+)
+
+_SNIPPET_OPEN, _SNIPPET_CLOSE, _SNIPPET_ELLIPSIS = "<mark>", "</mark>", "…"
+
+# Set once the search structures exist; searches fail while it is False
+# (e.g. an SQLite build without FTS5).
+_search_available = False
+
+
+class SearchUnavailableError(RuntimeError):
+    """
+    Raised when full-text search is not available on this database.
+    """
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").translate(_ARABIC_MARKS_TABLE)
+
+def _pg_message_document() -> str:
+    return f"to_tsvector('{settings.SEARCH_TEXT_CONFIG}', translate(original_text || ' ' || translated_text, '{ARABIC_MARKS}', ''))"
+
+def _pg_note_document() -> str:
+    return f"to_tsvector('{settings.SEARCH_TEXT_CONFIG}', translate(content, '{ARABIC_MARKS}', ''))"
+
+def _sql_normalize(expression: str) -> str:
+    """
+    SQL counterpart of _normalize, for use in the SQLite triggers.
+    """
+    expression = f"coalesce({expression}, '')"
+    for mark in ARABIC_MARKS:
+        expression = f"replace({expression}, char({ord(mark)}), '')"
+    return expression
+
+def _sqlite_message_values(row: str) -> str:
+    return (f"{row}.id * 2, {_sql_normalize(f'{row}.original_text')}, "
+            f"{_sql_normalize(f'{row}.translated_text')}, 'message', {row}.conversation_id")
+
+def _sqlite_note_values(row: str) -> str:
+    return f"{row}.id * 2 + 1, {_sql_normalize(f'{row}.content')}, '', 'note', {row}.conversation_id"
+
+_FTS_INSERT = f"INSERT INTO {_FTS_TABLE} (rowid, body, translation, kind, conversation_id)"
+_FTS_TRIGGERS = {
+    f"{_FTS_TABLE}_message_insert": (
+        f"AFTER INSERT ON messages BEGIN {_FTS_INSERT} VALUES ({_sqlite_message_values('new')}); END"
+    ),
+    f"{_FTS_TABLE}_message_update": (
+        "AFTER UPDATE OF original_text, translated_text, conversation_id ON messages BEGIN "
+        f"DELETE FROM {_FTS_TABLE} WHERE rowid = old.id * 2; "
+        f"{_FTS_INSERT} VALUES ({_sqlite_message_values('new')}); END"
+    ),
+    f"{_FTS_TABLE}_message_delete": (
+        f"AFTER DELETE ON messages BEGIN DELETE FROM {_FTS_TABLE} WHERE rowid = old.id * 2; END"
+    ),
+    f"{_FTS_TABLE}_note_insert": (
+        f"AFTER INSERT ON notes BEGIN {_FTS_INSERT} VALUES ({_sqlite_note_values('new')}); END"
+    ),
+    f"{_FTS_TABLE}_note_update": (
+        "AFTER UPDATE OF content, conversation_id ON notes BEGIN "
+        f"DELETE FROM {_FTS_TABLE} WHERE rowid = old.id * 2 + 1; "
+        f"{_FTS_INSERT} VALUES ({_sqlite_note_values('new')}); END"
+    ),
+    f"{_FTS_TABLE}_note_delete": (
+        f"AFTER DELETE ON notes BEGIN DELETE FROM {_FTS_TABLE} WHERE rowid = old.id * 2 + 1; END"
+    ),
+}
+
+def _sqlite_objects(db: Session) -> Set[str]:
+    """
+    Which of the FTS table and its triggers exist.
+    """
+    query = text("SELECT name FROM sqlite_master WHERE name IN :names").bindparams(bindparam("names", expanding=True))
+    return {row.name for row in db.execute(query, {"names": [_FTS_TABLE, *_FTS_TRIGGERS]})}
+
+def is_search_available() -> bool:
+    return _search_available
+
+def ensure_search_index(db: Session) -> None:
+    """
+    Creates the full-text index if it does not exist yet, filling it from the existing
+    messages and notes. SQLite gets an FTS5 table maintained by triggers; it is rebuilt
+    whenever a trigger was missing, which repairs an index that writes once bypassed.
+    PostgreSQL gets GIN expression indexes, which it maintains by itself.
+    """
+    global _search_available
+    if not re.fullmatch(r"[a-z_]+", settings.SEARCH_TEXT_CONFIG):
+        raise ValueError(f"Invalid SEARCH_TEXT_CONFIG: {settings.SEARCH_TEXT_CONFIG!r}")
+
+    dialect = _dialect(db)
+    try:
+        if dialect == "sqlite":
+            existing = _sqlite_objects(db)
+            if len(existing) < 1 + len(_FTS_TRIGGERS):
+                print("Creating the full-text search index...")
+                db.execute(text(_FTS_DDL))
+                for name, definition in _FTS_TRIGGERS.items():
+                    db.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {definition}"))
+                rebuild_search_index(db)
+        elif dialect == "postgresql":
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_messages_search ON messages USING GIN ({_pg_message_document()})"))
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_notes_search ON notes USING GIN ({_pg_note_document()})"))
+        else:
+            return
+        db.commit()
+        _search_available = True
+    except Exception as e:
+        db.rollback()
+        _search_available = False
+        print(f"Full-text search is disabled: {e}")
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Re-fills the SQLite FTS table from scratch, if there is one. The caller commits.
+    """
+    if _dialect(db) != "sqlite" or _FTS_TABLE not in _sqlite_objects(db):
+        return
+    db.execute(text(f"DELETE FROM {_FTS_TABLE}"))
+    db.execute(text(f"{_FTS_INSERT} SELECT {_sqlite_message_values('messages')} FROM messages"))
+    db.execute(text(f"{_FTS_INSERT} SELECT {_sqlite_note_values('notes')} FROM notes"))
+
+def _fts_query(query: str) -> str:
+    """
+    Turns free text into an FTS5 query: every word must match, a trailing '*' is a prefix search.
+    """
+    terms = []
+    for word in _normalize(query).split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not word:
+            continue
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search(
+    db: Session,
+    query: str,
+    kind: Optional[str] = None,
+    conversation_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Ranked full-text search over message texts and note contents, best matches first.
+    Returns the hits (kind, id, conversation_id, snippet, rank) and the next-page cursor.
+    Snippets mark matches with <mark> tags; the surrounding text is not HTML-escaped.
+    """
+    if not _search_available:
+        raise SearchUnavailableError("Full-text search is not available on this database.")
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    if _dialect(db) == "sqlite":
+        rows = _search_sqlite(db, query, kind, conversation_id, cursor, limit + 1)
+    else:
+        rows = _search_postgresql(db, query, kind, conversation_id, cursor, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["rank"], last["kind"], last["_key"]])
+    for row in rows:
+        del row["_key"]
+    return rows, next_cursor
+
+def _search_sqlite(db: Session, query: str, kind: Optional[str], conversation_id: Optional[int], cursor: Optional[str], limit: int) -> List[dict]:
+    match = _fts_query(query)
+    if not match:
+        return []
+    # bm25() is lower-is-better; it is negated so rank is higher-is-better on both databases
+    filters = [f"{_FTS_TABLE} MATCH :match"]
+    params = {"match": match, "limit": limit}
+    if kind:
+        filters.append("kind = :kind")
+        params["kind"] = kind
+    if conversation_id is not None:
+        filters.append("conversation_id = :cid")
+        params["cid"] = conversation_id
+    if cursor:
+        rank, _, rowid = decode_cursor(cursor, 3)
+        filters.append(f"(-bm25({_FTS_TABLE}) < :rank OR (-bm25({_FTS_TABLE}) = :rank AND rowid > :rowid))")
+        params.update({"rank": float(rank), "rowid": rowid})
+
+    result = db.execute(text(
+        f"SELECT rowid, kind, conversation_id, -bm25({_FTS_TABLE}) AS rank, "
+        f"snippet({_FTS_TABLE}, -1, '{_SNIPPET_OPEN}', '{_SNIPPET_CLOSE}', '{_SNIPPET_ELLIPSIS}', 16) AS snippet "
+        f"FROM {_FTS_TABLE} WHERE {' AND '.join(filters)} "
+        "ORDER BY rank DESC, rowid LIMIT :limit"
+    ), params)
+    return [
+        {
+            "kind": row.kind,
+            "id": row.rowid // 2,
+            "conversation_id": int(row.conversation_id),
+            "snippet": row.snippet,
+            "rank": row.rank,
+            # The cursor keys on the FTS row id, which is unique across both kinds
+            "_key": row.rowid,
+        }
+        for row in result
+    ]
+
+def _search_postgresql(db: Session, query: str, kind: Optional[str], conversation_id: Optional[int], cursor: Optional[str], limit: int) -> List[dict]:
+    config = settings.SEARCH_TEXT_CONFIG
+    headline_options = f"StartSel={_SNIPPET_OPEN}, StopSel={_SNIPPET_CLOSE}, MaxWords=24, MinWords=8, MaxFragments=2, FragmentDelimiter=\" {_SNIPPET_ELLIPSIS} \""
+    parts = []
+    if kind in (None, "message"):
+        parts.append(
+            f"SELECT 'message' AS kind, id, conversation_id, ts_rank({_pg_message_document()}, q)::float8 AS rank, "
+            f"ts_headline('{config}', original_text || ' ' || translated_text, q, :headline) AS snippet "
+            f"FROM messages, websearch_to_tsquery('{config}', :query) AS q WHERE {_pg_message_document()} @@ q"
+            + (" AND conversation_id = :cid" if conversation_id is not None else "")
+        )
+    if kind in (None, "note"):
+        parts.append(
+            f"SELECT 'note' AS kind, id, conversation_id, ts_rank({_pg_note_document()}, q)::float8 AS rank, "
+            f"ts_headline('{config}', content, q, :headline) AS snippet "
+            f"FROM notes, websearch_to_tsquery('{config}', :query) AS q WHERE {_pg_note_document()} @@ q"
+            + (" AND conversation_id = :cid" if conversation_id is not None else "")
+        )
+    params = {"query": _normalize(query), "headline": headline_options, "cid": conversation_id, "limit": limit}
+    where = ""
+    if cursor:
+        rank, last_kind, item_id = decode_cursor(cursor, 3)
+        where = "WHERE rank < :rank OR (rank = :rank AND (kind, id) > (:kind, :id))"
+        params.update({"rank": float(rank), "kind": last_kind, "id": item_id})
+
+    result = db.execute(text(
+        f"SELECT * FROM ({' UNION ALL '.join(parts)}) AS hits {where} ORDER BY rank DESC, kind, id LIMIT :limit"
+    ), params)
+    return [
+        {"kind": row.kind, "id": row.id, "conversation_id": row.conversation_id, "snippet": row.snippet, "rank": row.rank, "_key": row.id}
+        for row in result
+    ]
@@ -1,5 +1,20 @@
+import threading
+import time
+from types import MappingProxyType
+from typing import Mapping, Optional
+
 from sqlalchemy.orm import Session
 from app.db import models
+from app.core.config import settings as app_settings
+from . import cache_version_crud
+
+SETTINGS_VERSION_KEY = "settings"
+
+# In-memory snapshot of the whole settings table, shared by all requests in this worker
+_snapshot: Optional[Mapping[str, Optional[str]]] = None
+_snapshot_version = 0
+_last_version_check = 0.0
+_snapshot_lock = threading.Lock()
 
 def get_setting(db: Session, key: str) -> models.Setting:
     """
@@ -7,6 +22,39 @@ def get_setting(db: Session, key: str) -> models.Setting:
     """
     return db.query(models.Setting).filter(models.Setting.key == key).first()
 
+def get_settings_snapshot(db: Session) -> Mapping[str, Optional[str]]:
+    """
+    Returns every setting as a read-only {key: value} mapping.
+    The table is loaded with a single query and kept in memory until a write invalidates it.
+    Writes from other workers are detected through a version row, checked at most once per
+    SETTINGS_VERSION_CHECK_INTERVAL_SECONDS.
+    """
+    global _snapshot, _snapshot_version, _last_version_check
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None:
+        if not app_settings.SETTINGS_CACHE_CROSS_WORKER:
+            return snapshot
+        if now - _last_version_check < app_settings.SETTINGS_VERSION_CHECK_INTERVAL_SECONDS:
+            return snapshot
+
+    version = cache_version_crud.get_version(db, SETTINGS_VERSION_KEY) if app_settings.SETTINGS_CACHE_CROSS_WORKER else 0
+    with _snapshot_lock:
+        _last_version_check = now
+        if _snapshot is None or version != _snapshot_version:
+            rows = db.query(models.Setting.key, models.Setting.value).all()
+            _snapshot = MappingProxyType({key: value for key, value in rows})
+            _snapshot_version = version
+        return _snapshot
+
+def invalidate_settings_snapshot() -> None:
+    """
+    Drops the in-memory snapshot so the next read reloads it.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
 def upsert_setting(db: Session, key: str, value: str) -> models.Setting:
     """
     Updates a setting if it exists, or creates it if it does not.
@@ -21,6 +69,9 @@ def upsert_setting(db: Session, key: str, value: str) -> models.Setting:
         db_setting = models.Setting(key=key, value=value)
         db.add(db_setting)
     
+    # Lets other workers know their snapshot is stale
+    cache_version_crud.bump_version(db, SETTINGS_VERSION_KEY)
     db.commit()
+    invalidate_settings_snapshot()
     db.refresh(db_setting)
-    return db_setting
\ No newline at end of file
+    return db_setting
@@ -0,0 +1,82 @@
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.db import models
+
+def _key_filter(audio_sha256: str, language: str, model: str):
+    entry = models.TranscriptionCacheEntry
+    return (entry.audio_sha256 == audio_sha256) & (entry.language == language) & (entry.model == model)
+
+def get_transcript(db: Session, audio_sha256: str, language: str, model: str) -> Optional[str]:
+    """
+    Returns the cached transcript for an audio hash, language and model, or None.
+    A hit is counted and marks the entry as recently used.
+    """
+    transcript = db.execute(
+        select(models.TranscriptionCacheEntry.transcript).where(_key_filter(audio_sha256, language, model))
+    ).scalar()
+    if transcript is None:
+        return None
+    db.execute(
+        update(models.TranscriptionCacheEntry)
+        .where(_key_filter(audio_sha256, language, model))
+        .values(hit_count=models.TranscriptionCacheEntry.hit_count + 1, last_used_at=func.now())
+    )
+    db.commit()
+    return transcript
+
+def save_transcript(db: Session, audio_sha256: str, language: str, model: str, transcript: str, audio_bytes: int, max_entries: int) -> None:
+    """
+    Stores a transcript (replacing one saved concurrently for the same key), then
+    prunes the least recently used entries beyond max_entries. Entries sharing the
+    cutoff timestamp are kept, so the table may briefly exceed the cap.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(models.TranscriptionCacheEntry).values(
+        audio_sha256=audio_sha256,
+        language=language,
+        model=model,
+        transcript=transcript,
+        audio_bytes=audio_bytes,
+        hit_count=0,
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["audio_sha256", "language", "model"],
+        set_={"transcript": statement.excluded.transcript, "last_used_at": func.now()},
+    ))
+
+    # The oldest timestamp still kept; compared in SQL, so SQLite never sees a
+    # re-bound (differently formatted) timestamp
+    cutoff = (
+        select(models.TranscriptionCacheEntry.last_used_at)
+        .order_by(models.TranscriptionCacheEntry.last_used_at.desc())
+        .offset(max(max_entries - 1, 0))
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(delete(models.TranscriptionCacheEntry).where(models.TranscriptionCacheEntry.last_used_at < cutoff))
+    db.commit()
+
+def clear_transcripts(db: Session) -> int:
+    """
+    Deletes every cached transcript and returns how many were removed.
+    """
+    result = db.execute(delete(models.TranscriptionCacheEntry))
+    db.commit()
+    return result.rowcount
+
+def get_cache_summary(db: Session) -> Dict[str, int]:
+    """
+    Returns the number of cached transcripts, the audio bytes they cover and the
+    hits they have served since they were stored.
+    """
+    entries, audio_bytes, hits = db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(models.TranscriptionCacheEntry.audio_bytes), 0),
+            func.coalesce(func.sum(models.TranscriptionCacheEntry.hit_count), 0),
+        ).select_from(models.TranscriptionCacheEntry)
+    ).one()
+    return {"entries": entries, "audio_bytes": audio_bytes, "stored_hits": hits}
@@ -0,0 +1,212 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, delete, exists, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.db import models
+from .search_crud import ARABIC_MARKS
+
+_NORMALIZE_TABLE = str.maketrans("", "", ARABIC_MARKS)
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+# SQLite allows at most 500 SELECTs in one UNION ALL
+_TRIGRAMS_PER_STATEMENT = 200
+
+
+@dataclass
+class TranslationMemoryMatch:
+    message_id: int
+    original_text: str
+    translated_text: str
+    # 1.0 only for the same text after normalization, otherwise the Dice coefficient of the trigram sets
+    similarity: float
+
+
+def normalize_segment(value: str) -> str:
+    """
+    Case-folds, strips Arabic vowel marks and tatweel, and reduces punctuation
+    and runs of whitespace to single spaces.
+    """
+    return _NON_WORD.sub(" ", value.translate(_NORMALIZE_TABLE).casefold()).strip()
+
+def trigrams(normalized: str) -> Set[str]:
+    """
+    Character trigrams of a normalized segment, padded so that short words still count.
+    """
+    if not normalized:
+        return set()
+    padded = f"  {normalized} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+def _dice(first: Set[str], second: Set[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return 2 * len(first & second) / (len(first) + len(second))
+
+def _rows_for(message_id: int, original_text: str, target_language: Optional[str]) -> List[dict]:
+    if not target_language:
+        return []
+    return [
+        {"target_language": target_language, "trigram": trigram, "message_id": message_id}
+        for trigram in trigrams(normalize_segment(original_text))
+    ]
+
+def _insert_rows(db: Session, rows: List[dict]) -> None:
+    if rows:
+        db.execute(insert(models.TranslationMemoryTrigram), rows)
+
+def index_messages(db: Session, messages: Iterable[models.Message]) -> None:
+    """
+    Adds or refreshes messages in the translation memory, inside the caller's transaction.
+    Messages without a target language are not indexed: they can never be matched.
+    """
+    messages = list(messages)
+    if not messages:
+        return
+    db.execute(
+        delete(models.TranslationMemoryTrigram)
+        .where(models.TranslationMemoryTrigram.message_id.in_([message.id for message in messages]))
+    )
+    rows = []
+    for message in messages:
+        rows.extend(_rows_for(message.id, message.original_text, message.target_language))
+    _insert_rows(db, rows)
+
+def unindex_message(db: Session, message_id: int) -> None:
+    db.execute(delete(models.TranslationMemoryTrigram).where(models.TranslationMemoryTrigram.message_id == message_id))
+
+def unindex_conversation(db: Session, conversation_id: int) -> None:
+    """
+    Removes every message of a conversation. Must run before the messages are deleted.
+    """
+    message_ids = select(models.Message.id).where(models.Message.conversation_id == conversation_id)
+    db.execute(delete(models.TranslationMemoryTrigram).where(models.TranslationMemoryTrigram.message_id.in_(message_ids)))
+
+def rebuild_translation_memory(db: Session, batch_size: int = 1000) -> None:
+    """
+    Re-fills the translation memory from scratch (after bulk loads such as a backup restore).
+    The caller commits.
+    """
+    db.execute(delete(models.TranslationMemoryTrigram))
+    messages = (
+        select(models.Message.id, models.Message.original_text, models.Message.target_language)
+        .where(models.Message.target_language.is_not(None))
+    )
+    for batch in db.execute(messages).yield_per(batch_size).partitions():
+        rows = []
+        for message_id, original_text, target_language in batch:
+            rows.extend(_rows_for(message_id, original_text, target_language))
+        _insert_rows(db, rows)
+
+def ensure_translation_memory(db: Session) -> None:
+    """
+    Fills the translation memory from the existing messages if it is empty while there
+    are messages it should hold, e.g. in a database that predates it.
+    """
+    memory_is_empty = not db.execute(select(exists().select_from(models.TranslationMemoryTrigram))).scalar()
+    indexable = db.execute(select(exists().where(models.Message.target_language.is_not(None)))).scalar()
+    if memory_is_empty and indexable:
+        print("Filling the translation memory...")
+        rebuild_translation_memory(db)
+        db.commit()
+
+def find_reusable_translation(db: Session, reuse_key: str) -> Optional[str]:
+    """
+    Returns the most recent translation saved under reuse_key, if any.
+    """
+    return db.execute(
+        select(models.Message.translated_text)
+        .where(models.Message.reuse_key == reuse_key)
+        .order_by(models.Message.id.desc())
+        .limit(1)
+    ).scalar()
+
+def _common_trigrams(db: Session, query_trigrams: List[str], target_language: str, max_postings: int) -> Set[str]:
+    """
+    Returns the trigrams that occur in more than max_postings messages. Each trigram's
+    postings are only counted up to that limit, so this reads a bounded number of index rows.
+    """
+    memory = models.TranslationMemoryTrigram
+    common = set()
+    for start in range(0, len(query_trigrams), _TRIGRAMS_PER_STATEMENT):
+        counts = [
+            select(literal(trigram).label("trigram"), func.count().label("postings")).select_from(
+                select(memory.message_id)
+                .where(memory.target_language == target_language, memory.trigram == trigram)
+                .limit(max_postings + 1)
+                .subquery()
+            )
+            for trigram in query_trigrams[start:start + _TRIGRAMS_PER_STATEMENT]
+        ]
+        for trigram, postings in db.execute(union_all(*counts)):
+            if postings > max_postings:
+                common.add(trigram)
+    return common
+
+def find_matches(
+    db: Session,
+    text: str,
+    target_language: str,
+    min_similarity: float,
+    limit: int = 3,
+    candidates: int = 20,
+    max_chars: int = 2000,
+    max_postings: int = 1000,
+) -> List[TranslationMemoryMatch]:
+    """
+    Returns up to `limit` earlier translations into target_language whose source text
+    is at least min_similarity similar to `text`, best first.
+
+    Trigrams in more than max_postings messages are skipped: they say little about which
+    messages are similar, and reading their postings would get slower as the memory grows.
+    Candidates are the messages sharing the most of the remaining trigrams, restricted in
+    SQL to those that could still reach min_similarity; the exact score is then computed
+    for at most `candidates` rows. A text made only of common trigrams gets no matches.
+    """
+    normalized = normalize_segment(text)
+    if not normalized or len(normalized) > max_chars or min_similarity > 1.0:
+        return []
+    query_trigrams = trigrams(normalized)
+    common = _common_trigrams(db, sorted(query_trigrams), target_language, max_postings)
+    rare = sorted(query_trigrams - common)
+    if not rare:
+        return []
+
+    # Dice >= t with s shared trigrams requires s >= t * |A| / (2 - t); each skipped
+    # trigram may be one of them
+    min_shared = math.ceil(min_similarity * len(query_trigrams) / (2 - min_similarity) - 1e-9)
+    min_shared = max(min_shared - len(common), 1)
+    memory = models.TranslationMemoryTrigram
+    shared = func.count().label("shared")
+    candidate_ids = (
+        select(memory.message_id, shared)
+        .where(memory.target_language == target_language)
+        .where(memory.trigram.in_(bindparam("trigrams", expanding=True)))
+        .group_by(memory.message_id)
+        .having(func.count() >= min_shared)
+        .order_by(shared.desc(), memory.message_id.desc())
+        .limit(candidates)
+    )
+    ids = [row.message_id for row in db.execute(candidate_ids, {"trigrams": rare})]
+    if not ids:
+        return []
+
+    rows = db.execute(
+        select(models.Message.id, models.Message.original_text, models.Message.translated_text)
+        .where(models.Message.id.in_(ids))
+    ).all()
+    matches = []
+    for message_id, original_text, translated_text in rows:
+        candidate = normalize_segment(original_text)
+        if candidate == normalized:
+            similarity = 1.0
+        else:
+            # Different texts can share every trigram; only identical ones score 1.0
+            similarity = min(_dice(query_trigrams, trigrams(candidate)), 0.999)
+        if similarity >= min_similarity:
+            matches.append(TranslationMemoryMatch(message_id, original_text, translated_text, similarity))
+    # Most similar first, the most recent translation among equals
+    matches.sort(key=lambda match: (match.similarity, match.message_id), reverse=True)
+    return matches[:limit]
@@ -1,6 +1,15 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import instrument_engine
 from .models import Base
 
 # --- هذا هو الكود الصحيح الذي يتحقق من وجود قاعدة بيانات خارجية ---
@@ -25,9 +34,177 @@ else:
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Statements that populate a column the first time it is added to an existing table
+COLUMN_BACKFILLS = {
+    ("conversations", "message_count"): (
+        "UPDATE conversations SET message_count = "
+        "(SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id)"
+    ),
+    ("conversations", "last_message_preview"): (
+        "UPDATE conversations SET last_message_preview = "
+        "(SELECT substr(messages.original_text, 1, 120) FROM messages "
+        "WHERE messages.conversation_id = conversations.id "
+        "ORDER BY messages.created_at DESC, messages.id DESC LIMIT 1)"
+    ),
+}
+
+# Key of the PostgreSQL advisory lock held while the schema is created or changed
+_SCHEMA_LOCK_KEY = 72_911_408
+# How long a worker waits for another one's schema changes on SQLite
+_SQLITE_SCHEMA_LOCK_TIMEOUT_MS = 10 * 60 * 1000
+
+@contextmanager
+def _schema_lock() -> Iterator[Connection]:
+    """
+    Yields a connection inside a transaction that no other worker can be in at the same
+    time: PostgreSQL takes a transaction-level advisory lock, SQLite takes the write lock
+    up front with BEGIN IMMEDIATE. Workers starting together then apply schema changes one
+    after the other, and the later ones find them done.
+    """
+    if engine.dialect.name == "sqlite":
+        # Autocommit stops the driver from starting (deferred) transactions of its own
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            busy_timeout = connection.exec_driver_sql("PRAGMA busy_timeout").scalar()
+            connection.exec_driver_sql(f"PRAGMA busy_timeout = {_SQLITE_SCHEMA_LOCK_TIMEOUT_MS}")
+            try:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                try:
+                    yield connection
+                except BaseException:
+                    connection.exec_driver_sql("ROLLBACK")
+                    raise
+                connection.exec_driver_sql("COMMIT")
+            finally:
+                connection.exec_driver_sql(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+    else:
+        with engine.begin() as connection:
+            if engine.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+            yield connection
+
+def _add_missing_columns_and_indexes(connection: Connection):
+    """
+    create_all() only creates missing tables. This adds columns and indexes that were
+    introduced after a table was first created, and backfills them where needed.
+    Must run under _schema_lock(), so that the schema it inspects cannot change under it.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            print(f"Adding missing column {table.name}.{column.name}...")
+            column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+            if backfill:
+                connection.execute(text(backfill))
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
 def create_db_and_tables():
     print("Attempting to create database and tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database and tables creation process finished.")
\ No newline at end of file
+    # Every worker runs this at startup; the lock keeps them from racing each other
+    with _schema_lock() as connection:
+        Base.metadata.create_all(bind=connection)
+        _add_missing_columns_and_indexes(connection)
+    print("Database and tables creation process finished.")
+
+
+# --- Async database access ---
+# Async endpoints must never run blocking queries on the event loop. They get an
+# AsyncDBSession, which runs the regular (sync) CRUD functions either on a native
+# async engine or in a worker thread, depending on DATABASE_SESSION_MODE.
+
+T = TypeVar("T")
+
+_async_engine = None
+_async_session_factory = None
+
+def _async_database_url(url: str) -> str:
+    """
+    Maps the sync database URL onto its async driver.
+    """
+    parsed = make_url(url)
+    if parsed.drivername.startswith("sqlite"):
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if parsed.drivername.startswith("postgresql"):
+        query = dict(parsed.query)
+        # asyncpg spells libpq's "sslmode" as "ssl"
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    raise ValueError(f"No async driver is configured for '{parsed.drivername}' databases.")
+
+def get_async_session_factory():
+    """
+    Lazily creates the async engine, so its drivers are only needed in "async" mode.
+    """
+    global _async_engine, _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        _async_engine = create_async_engine(_async_database_url(SQLALCHEMY_DATABASE_URL))
+        if settings.METRICS_ENABLED:
+            instrument_engine(_async_engine.sync_engine)
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
+
+
+class AsyncDBSession:
+    """
+    A database session for async code. Use run_sync() with any CRUD function:
+
+        conversation = await db.run_sync(conversation_crud.get_conversation, conversation_id)
+
+    In "async" mode this delegates to AsyncSession.run_sync (aiosqlite / asyncpg).
+    In "threadpool" mode the function runs on a plain Session in a worker thread.
+    Calls are serialized, so one session can be shared by concurrent tasks.
+    Objects are not expired on commit, so they stay readable outside run_sync().
+    """
+
+    def __init__(self, mode: Optional[str] = None):
+        self.mode = mode or settings.DATABASE_SESSION_MODE
+        self._lock = asyncio.Lock()
+        self._async_session = None
+        self._sync_session: Optional[Session] = None
+        if self.mode == "async":
+            self._async_session = get_async_session_factory()()
+        elif self.mode == "threadpool":
+            self._sync_session = SessionLocal(expire_on_commit=False)
+        else:
+            raise ValueError(f"Unknown DATABASE_SESSION_MODE '{self.mode}'.")
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        async with self._lock:
+            if self._async_session is not None:
+                return await self._async_session.run_sync(fn, *args, **kwargs)
+            return await run_in_threadpool(fn, self._sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+        else:
+            await run_in_threadpool(self._sync_session.close)
+
+@asynccontextmanager
+async def open_async_db() -> AsyncIterator[AsyncDBSession]:
+    db = AsyncDBSession()
+    try:
+        yield db
+    finally:
+        await db.close()
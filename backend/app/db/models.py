@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column, DeclarativeBase
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -30,9 +30,19 @@ class Conversation(Base):
     tts_model_override: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     tts_voice_override: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
+    # Denormalized stats, maintained on every message write so listing conversations
+    # never has to touch the messages table
+    message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    last_message_preview: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
     messages: Mapped[List["Message"]] = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     notes: Mapped[List["Note"]] = relationship("Note", back_populates="conversation", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Serves the sidebar listing: WHERE is_archived = ? ORDER BY updated_at DESC, id DESC
+        Index("ix_conversations_archived_updated_id", "is_archived", "updated_at", "id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -41,10 +51,41 @@ class Message(Base):
     conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id"))
     original_text: Mapped[str] = mapped_column(Text, nullable=False)
     translated_text: Mapped[str] = mapped_column(Text, nullable=False)
+    # Language the text was translated into; unknown (NULL) for messages saved before it was recorded
+    target_language: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Prompt tokens the message costs as context, computed on write; NULL for older rows
+    token_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Hash of the raw text and every translation input but the context (see
+    # translation_service.make_reuse_keys); NULL when the translation may not be reused
+    reuse_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     conversation: Mapped["Conversation"] = relationship("Conversation", back_populates="messages")
 
+    __table_args__ = (
+        # Serves message windows and get_last_messages: WHERE conversation_id = ? ORDER BY created_at, id
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+        # Serves translation memory reuse: WHERE reuse_key = ?
+        Index("ix_messages_reuse_key", "reuse_key"),
+    )
+
+
+class TranslationMemoryTrigram(Base):
+    """
+    Inverted trigram index over the normalized source text of translated messages,
+    per target language. Maintained by the CRUD layer on every message write.
+    """
+    __tablename__ = "translation_memory_trigrams"
+
+    target_language: Mapped[str] = mapped_column(String, primary_key=True)
+    trigram: Mapped[str] = mapped_column(String, primary_key=True)
+    message_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    __table_args__ = (
+        # Serves re-indexing and deleting a message's trigrams
+        Index("ix_translation_memory_trigrams_message", "message_id"),
+    )
+
 
 class Setting(Base):
     __tablename__ = "settings"
@@ -71,6 +112,11 @@ class Prompt(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Serves the cursor-paginated listing: ORDER BY created_at DESC, id DESC
+        Index("ix_prompts_created_id", "created_at", "id"),
+    )
+
 
 class DictionaryEntry(Base):
     __tablename__ = "dictionary_entries"
@@ -81,6 +127,40 @@ class DictionaryEntry(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class CacheVersion(Base):
+    """
+    A monotonically increasing version per cached dataset (e.g. the glossary).
+    Writers bump it in the same transaction as their change, so every worker
+    can detect that its in-memory copy is stale with a single primary-key lookup.
+    """
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class TranscriptionCacheEntry(Base):
+    """
+    A finished transcript, keyed by the SHA-256 of the uploaded audio bytes
+    together with the language hint and model that produced it.
+    """
+    __tablename__ = "transcription_cache"
+
+    audio_sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    language: Mapped[str] = mapped_column(String, primary_key=True)
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    transcript: Mapped[str] = mapped_column(Text, nullable=False)
+    audio_bytes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Serves pruning of the least recently used entries
+        Index("ix_transcription_cache_last_used", "last_used_at"),
+    )
+
+
 class Note(Base):
     __tablename__ = "notes"
 
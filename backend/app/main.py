@@ -8,18 +8,30 @@ load_dotenv()
 # --- نهاية التعديل ---
 
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.v1 import endpoints as v1_endpoints
-from app.db.database import create_db_and_tables
+from app.db.database import create_db_and_tables, SessionLocal, dispose_async_engine
+from app.services import dictionary_service
+from app.crud import search_crud, translation_memory_crud
+from app.services.upstream_clients import upstream_clients
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application startup...")
     create_db_and_tables()
+    # Compile the glossary matcher up front so the first translation doesn't pay for it
+    with SessionLocal() as db:
+        search_crud.ensure_search_index(db)
+        translation_memory_crud.ensure_translation_memory(db)
+        dictionary_service.get_glossary_matcher(db)
     yield
     print("Application shutdown...")
+    await upstream_clients.aclose()
+    await dispose_async_engine()
 
 app = FastAPI(title="Intelligent Translator API", lifespan=lifespan)
 
@@ -37,8 +49,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is the outermost middleware and times everything below it
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(v1_endpoints.router, prefix="/api/v1")
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Welcome to the Intelligent Translator Backend!"}
\ No newline at end of file
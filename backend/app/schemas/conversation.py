@@ -7,16 +7,19 @@ class MessageBase(BaseModel):
     translated_text: str
 
 class MessageCreate(MessageBase):
-    pass
+    target_language: Optional[str] = None
+    reuse_key: Optional[str] = None
 
 class MessageUpdate(BaseModel):
     """
     NEW: Schema for updating the original_text of a message.
     """
     original_text: str
+    bypass_cache: bool = False
 
 class Message(MessageBase):
     id: int
+    target_language: Optional[str] = None
     created_at: datetime
     conversation_id: int
 
@@ -37,12 +40,43 @@ class ConversationSettingsUpdate(BaseModel):
 class ConversationTitleUpdate(BaseModel):
     title: str
 
-class Conversation(ConversationBase):
+class ConversationInfo(ConversationBase):
     id: int
     created_at: datetime
     use_context: bool
     custom_prompt: Optional[str] = None
-    messages: List[Message] = []
+    message_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class Conversation(ConversationInfo):
+    # None when the messages were not requested (load them from the messages endpoint)
+    messages: Optional[List[Message]] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MessageWindow(BaseModel):
+    """
+    A window of a conversation's messages, oldest first.
+    'has_more' tells whether further messages exist in the direction that was paged.
+    """
+    messages: List[Message]
+    has_more: bool
+
+
+class ConversationSummary(BaseModel):
+    """
+    Sidebar view of a conversation: no messages, just the denormalized stats.
+    """
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    is_archived: bool
+    message_count: int
+    last_message_preview: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """
+    One page of a cursor-paginated listing.
+    Pass 'next_cursor' back as the 'cursor' query parameter to get the following page;
+    it is null on the last page.
+    """
+    items: List[T]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+class SearchHit(BaseModel):
+    """
+    One full-text search result. 'kind' is "message" or "note" and 'id' is the id of
+    that message or note. Matches in the snippet are wrapped in <mark> tags (the rest
+    of the snippet is raw text, not HTML-escaped). Higher 'rank' means a better match.
+    """
+    kind: str
+    id: int
+    conversation_id: int
+    snippet: str
+    rank: float
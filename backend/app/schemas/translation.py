@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.schemas import conversation as conversation_schemas
 
 class NewTranslationRequest(BaseModel):
     """
@@ -6,6 +9,7 @@ class NewTranslationRequest(BaseModel):
     """
     text_to_translate: str
     target_language: str = "English"
+    bypass_cache: bool = False
 
 class TranslationResponse(BaseModel):
     """
@@ -14,4 +18,29 @@ class TranslationResponse(BaseModel):
     """
     original_text: str
     translated_text: str
-    detected_language: str
\ No newline at end of file
+    detected_language: str
+
+class BatchTranslationRequest(BaseModel):
+    """
+    Translates many texts into the same conversation in one call.
+    'concurrency' caps how many upstream requests run at once (server defaults apply when omitted).
+    """
+    texts: List[str] = Field(..., min_length=1)
+    target_language: str = "English"
+    bypass_cache: bool = False
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+class BatchTranslationItem(BaseModel):
+    """
+    The outcome for one input text, in the same position as the request.
+    Exactly one of 'message' and 'error' is set.
+    """
+    index: int
+    original_text: str
+    message: Optional[conversation_schemas.Message] = None
+    error: Optional[str] = None
+
+class BatchTranslationResponse(BaseModel):
+    items: List[BatchTranslationItem]
+    succeeded: int
+    failed: int
@@ -5,4 +5,6 @@ class TTSRequest(BaseModel):
     Defines the structure for a Text-to-Speech request.
     """
     text: str
+    # Synthesize sentence by sentence and stream each part as soon as it is ready
+    chunked: bool = False
     # We can add more options later like voice, speed, etc.
\ No newline at end of file
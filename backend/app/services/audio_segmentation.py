@@ -0,0 +1,132 @@
+import array
+import math
+import os
+import sys
+import wave
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Length of the windows compared when looking for a quiet spot to cut at
+_ENERGY_WINDOW_SECONDS = 0.02
+# Frames copied per read when writing a segment
+_COPY_SECONDS = 10
+# Size of the header the wave module writes
+WAV_HEADER_BYTES = 44
+
+
+@dataclass
+class AudioSegment:
+    path: str
+    start_seconds: float
+    end_seconds: float
+
+
+def is_pcm_wav(path: str) -> bool:
+    """
+    True if the file is a WAV file the standard library can read (uncompressed PCM).
+    """
+    try:
+        with wave.open(path, "rb"):
+            return True
+    except (wave.Error, EOFError):
+        return False
+
+def wav_duration_seconds(path: str) -> float:
+    with wave.open(path, "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+def _mean_amplitude(frames: bytes, sample_width: int) -> Optional[float]:
+    """
+    Mean absolute sample value of a block of PCM frames (all channels together),
+    or None for sample widths that are not analysed.
+    """
+    if sample_width == 2:
+        samples = array.array("h")
+        samples.frombytes(frames[:len(frames) - len(frames) % 2])
+        if sys.byteorder == "big":
+            samples.byteswap()
+    elif sample_width == 1:
+        # 8-bit WAV is unsigned, centred on 128
+        samples = [value - 128 for value in frames]
+    else:
+        return None
+    if not samples:
+        return None
+    return sum(map(abs, samples)) / len(samples)
+
+def _find_quiet_frame(wav: wave.Wave_read, start_frame: int, end_frame: int) -> int:
+    """
+    Returns the middle of the quietest short window in [start_frame, end_frame),
+    preferring later windows on ties, or end_frame if the audio cannot be analysed.
+    """
+    window = max(int(wav.getframerate() * _ENERGY_WINDOW_SECONDS), 1)
+    best_frame, best_energy = end_frame, math.inf
+    wav.setpos(start_frame)
+    position = start_frame
+    while position + window <= end_frame:
+        energy = _mean_amplitude(wav.readframes(window), wav.getsampwidth())
+        if energy is None:
+            return end_frame
+        if energy <= best_energy:
+            best_frame, best_energy = position + window // 2, energy
+        position += window
+    return best_frame
+
+def split_wav(
+    path: str,
+    output_dir: str,
+    segment_seconds: float,
+    overlap_seconds: float,
+    search_seconds: float,
+    max_segment_bytes: Optional[int] = None,
+) -> List[AudioSegment]:
+    """
+    Splits a PCM WAV file into segments of about segment_seconds, written to output_dir.
+    Each cut is placed at the quietest point of the search_seconds before the nominal
+    boundary, so words are rarely cut in half; every segment after the first also starts
+    overlap_seconds early, for the cases where no pause was found.
+    With max_segment_bytes, segments are made shorter where needed so that no segment
+    file (overlap included) is larger than that.
+    Returns an empty list if the audio is short and small enough to be sent in one piece.
+    """
+    with wave.open(path, "rb") as wav:
+        params = wav.getparams()
+        rate, total_frames = params.framerate, params.nframes
+        segment_frames = int(segment_seconds * rate)
+        overlap_frames = int(overlap_seconds * rate)
+        if max_segment_bytes is not None:
+            frame_bytes = params.nchannels * params.sampwidth
+            room = (max_segment_bytes - WAV_HEADER_BYTES) // frame_bytes - overlap_frames
+            # A segment may also run up to search_frames (at most half a segment) past its
+            # nominal length: the largest length s with s + min(search, s // 2) <= room
+            max_segment_frames = max(room - int(search_seconds * rate), room * 2 // 3)
+            if max_segment_frames < rate:
+                raise ValueError(f"max_segment_bytes={max_segment_bytes} does not leave room for a second of audio")
+            segment_frames = min(segment_frames, max_segment_frames)
+        search_frames = min(int(search_seconds * rate), segment_frames // 2)
+        if total_frames <= segment_frames + search_frames:
+            return []
+
+        cuts = []
+        position = 0
+        while total_frames - position > segment_frames + search_frames:
+            boundary = position + segment_frames
+            cut = _find_quiet_frame(wav, boundary - search_frames, boundary)
+            cuts.append(cut)
+            position = cut
+
+        segments = []
+        boundaries = [0] + cuts + [total_frames]
+        for index, (start, end) in enumerate(zip(boundaries, boundaries[1:])):
+            segment_start = max(start - overlap_frames, 0) if index else 0
+            segment_path = os.path.join(output_dir, f"segment_{index:04d}.wav")
+            with wave.open(segment_path, "wb") as segment:
+                segment.setparams(params)
+                wav.setpos(segment_start)
+                remaining = end - segment_start
+                while remaining > 0:
+                    frames_to_copy = min(remaining, int(_COPY_SECONDS * rate))
+                    segment.writeframes(wav.readframes(frames_to_copy))
+                    remaining -= frames_to_copy
+            segments.append(AudioSegment(segment_path, segment_start / rate, end / rate))
+        return segments
@@ -0,0 +1,220 @@
+import io
+import json
+import zipfile
+from datetime import date, datetime, timezone
+from typing import BinaryIO, Dict, Iterator, List
+
+from sqlalchemy import DateTime, Table, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.crud import cache_version_crud
+from app.crud import settings_crud
+from app.crud import translation_memory_crud
+from app.db import models
+from app.db.database import SessionLocal
+from app.services import dictionary_service
+
+BACKUP_FORMAT_VERSION = 1
+
+# Rows read from the database (and inserted on restore) per batch
+BACKUP_BATCH_SIZE = 1000
+
+# Parents before children, so a restore never violates a foreign key.
+# User accounts are deliberately left out: they hold credentials.
+BACKUP_TABLES: List[Table] = [
+    models.Setting.__table__,
+    models.UserProfile.__table__,
+    models.Prompt.__table__,
+    models.DictionaryEntry.__table__,
+    models.Conversation.__table__,
+    models.Message.__table__,
+    models.Note.__table__,
+]
+
+
+class BackupError(ValueError):
+    """
+    Raised when an archive cannot be restored.
+    """
+
+
+class BackupConflictError(BackupError):
+    """
+    Raised when restoring without replace=True into tables that already hold data.
+    """
+
+
+class _StreamSink:
+    """
+    A write-only file object that hands whatever has been written so far to the caller.
+    zipfile writes into it without seeking (it falls back to data descriptors when the
+    target has no tell()), so the archive can be streamed as it is produced.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _primary_key_order(table: Table):
+    return [column.asc() for column in table.primary_key.columns]
+
+def _begin_snapshot(db: Session) -> None:
+    """
+    Starts the read-only transaction that every table is dumped in, so that writes
+    made while the archive downloads cannot leave rows pointing at missing parents.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+    elif dialect == "sqlite":
+        # pysqlite only opens transactions before writes. The read lock taken by the
+        # first SELECT is then held until the end, so writers wait for the backup.
+        db.connection().exec_driver_sql("BEGIN")
+
+def iter_backup_archive(batch_size: int = BACKUP_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yields a zip archive holding one NDJSON file per table plus a manifest.json.
+    Rows are streamed in batches and the archive is emitted as it is compressed,
+    so memory use does not depend on the size of the database. All tables are
+    read in one transaction, so the archive is a consistent snapshot.
+    """
+    sink = _StreamSink()
+    row_counts: Dict[str, int] = {}
+    db = SessionLocal()
+    try:
+        _begin_snapshot(db)
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for table in BACKUP_TABLES:
+                count = 0
+                with archive.open(f"{table.name}.ndjson", mode="w", force_zip64=True) as entry:
+                    result = db.execute(select(table).order_by(*_primary_key_order(table))).yield_per(batch_size)
+                    for rows in result.mappings().partitions():
+                        lines = "".join(json.dumps(dict(row), ensure_ascii=False, default=_json_default) + "\n" for row in rows)
+                        entry.write(lines.encode("utf-8"))
+                        count += len(rows)
+                        yield sink.drain()
+                row_counts[table.name] = count
+
+            manifest = {
+                "format_version": BACKUP_FORMAT_VERSION,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "tables": row_counts,
+            }
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        yield sink.drain()
+    finally:
+        db.close()
+
+def _read_rows(archive: zipfile.ZipFile, table: Table) -> Iterator[dict]:
+    datetime_columns = [column.name for column in table.columns if isinstance(column.type, DateTime)]
+    column_names = set(table.columns.keys())
+    with archive.open(f"{table.name}.ndjson") as entry:
+        for line_number, line in enumerate(io.TextIOWrapper(entry, encoding="utf-8"), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                # Columns that no longer exist are dropped; missing ones get their defaults
+                row = {key: value for key, value in row.items() if key in column_names}
+                for name in datetime_columns:
+                    if row.get(name):
+                        row[name] = datetime.fromisoformat(row[name])
+            except (ValueError, TypeError, AttributeError) as e:
+                raise BackupError(f"{table.name}.ndjson line {line_number}: {e}") from e
+            yield row
+
+def _insert_in_batches(db: Session, table: Table, rows: Iterator[dict], batch_size: int) -> int:
+    count = 0
+    batch: List[dict] = []
+    for row in rows:
+        # A multi-row INSERT needs the same keys in every row of the batch
+        if batch and row.keys() != batch[0].keys():
+            db.execute(insert(table), batch)
+            batch = []
+        batch.append(row)
+        count += 1
+        if len(batch) >= batch_size:
+            db.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+    return count
+
+def _reset_sequences(db: Session) -> None:
+    """
+    PostgreSQL does not advance a serial sequence when ids are inserted explicitly.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for table in BACKUP_TABLES:
+        if "id" not in table.columns or not table.c.id.autoincrement:
+            continue
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table.name}"
+        ))
+
+def restore_backup_archive(db: Session, archive_file: BinaryIO, replace: bool = False, batch_size: int = BACKUP_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Loads an archive produced by iter_backup_archive in a single transaction, using
+    batched multi-row inserts. The tables must be empty unless replace=True, in which
+    case their current contents are deleted first. Returns the restored row counts.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile as e:
+        raise BackupError("The file is not a valid backup archive.") from e
+
+    with archive:
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except (KeyError, ValueError) as e:
+            raise BackupError("The archive has no valid manifest.json.") from e
+        if manifest.get("format_version") != BACKUP_FORMAT_VERSION:
+            raise BackupError(f"Unsupported backup format version: {manifest.get('format_version')}.")
+        archived_files = set(archive.namelist())
+
+        try:
+            if replace:
+                for table in reversed(BACKUP_TABLES):
+                    db.execute(delete(table))
+            else:
+                for table in BACKUP_TABLES:
+                    if db.execute(select(func.count()).select_from(table)).scalar():
+                        raise BackupConflictError(f"Table '{table.name}' is not empty. Restore with replace=true to overwrite it.")
+
+            row_counts = {}
+            for table in BACKUP_TABLES:
+                if f"{table.name}.ndjson" not in archived_files:
+                    row_counts[table.name] = 0
+                    continue
+                row_counts[table.name] = _insert_in_batches(db, table, _read_rows(archive, table), batch_size)
+
+            _reset_sequences(db)
+            translation_memory_crud.rebuild_translation_memory(db)
+            cache_version_crud.bump_version(db, dictionary_service.GLOSSARY_VERSION_KEY)
+            cache_version_crud.bump_version(db, settings_crud.SETTINGS_VERSION_KEY)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    settings_crud.invalidate_settings_snapshot()
+    return row_counts
@@ -0,0 +1,254 @@
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import cache_version_crud
+from app.crud import dictionary_crud
+
+GLOSSARY_VERSION_KEY = "glossary"
+
+# Arabic prefixes written attached to the word: a conjunction (و، ف), then a preposition
+# (ب، ك، ل) and/or the article (ال, which follows ل as لل)
+_ARABIC_PROCLITICS = re.compile(r"[وف]?(?:[بك]?ال|لل|[بكل])?")
+
+
+class GlossaryMatcher:
+    """
+    An Aho-Corasick automaton over the dictionary's source terms.
+
+    A single pass over the input text finds every term that occurs in it,
+    regardless of how many terms the dictionary holds. Matching is
+    case-insensitive. With whole_words (the default) a term only matches where
+    it is not preceded or followed by another letter or digit, so "art" is not
+    found in "start", except that Arabic terms may carry attached prefixes
+    (الكتاب, وبالمحكمة); without it, terms also match inside words, for scripts
+    that do not separate words with spaces. Adding or removing a term only
+    touches the trie; the failure links are recomputed lazily (in linear time)
+    on the next scan.
+    """
+
+    def __init__(self, version: int = 0, whole_words: bool = True):
+        self.version = version
+        self.whole_words = whole_words
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Nearest node on the failure chain that ends a live pattern (or -1)
+        self._output_link: List[int] = [-1]
+        self._pattern_at: Dict[int, str] = {}
+        self._node_for_pattern: Dict[str, int] = {}
+        self._ids_for_pattern: Dict[str, Set[int]] = {}
+        self._entries: Dict[int, Tuple[str, str]] = {}
+        self._dead_nodes = 0
+        self._dirty = False
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return text.strip().lower()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._goto)
+
+    def add(self, entry_id: int, source_text: str, target_text: str) -> None:
+        """
+        Adds or replaces a dictionary entry.
+        """
+        with self._lock:
+            if entry_id in self._entries:
+                self._remove_locked(entry_id)
+            self._entries[entry_id] = (source_text, target_text)
+            pattern = self._normalize(source_text)
+            if not pattern:
+                return
+            node = self._node_for_pattern.get(pattern)
+            if node is None:
+                node = 0
+                for char in pattern:
+                    next_node = self._goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(self._goto)
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output_link.append(-1)
+                        self._goto[node][char] = next_node
+                    node = next_node
+                self._node_for_pattern[pattern] = node
+            self._pattern_at[node] = pattern
+            self._ids_for_pattern.setdefault(pattern, set()).add(entry_id)
+            self._dirty = True
+
+    def remove(self, entry_id: int) -> None:
+        """
+        Removes a dictionary entry if present.
+        """
+        with self._lock:
+            self._remove_locked(entry_id)
+
+    def _remove_locked(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        pattern = self._normalize(entry[0])
+        ids = self._ids_for_pattern.get(pattern)
+        if not ids:
+            return
+        ids.discard(entry_id)
+        if not ids:
+            del self._ids_for_pattern[pattern]
+            node = self._node_for_pattern.pop(pattern)
+            self._pattern_at.pop(node, None)
+            # The trie path is kept; it is reclaimed by the next compaction.
+            self._dead_nodes += len(pattern)
+            self._dirty = True
+
+    def _compact_locked(self) -> None:
+        entries = list(self._entries.items())
+        self._reset()
+        for entry_id, (source_text, target_text) in entries:
+            self.add(entry_id, source_text, target_text)
+
+    def _build_links_locked(self) -> None:
+        if self._dead_nodes > len(self._goto) // 2:
+            self._compact_locked()
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output_link[child] = -1
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                failed_to = self._goto[fallback].get(char, 0)
+                self._fail[child] = failed_to
+                self._output_link[child] = failed_to if failed_to in self._pattern_at else self._output_link[failed_to]
+                queue.append(child)
+        self._dirty = False
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Returns the (source_text, target_text) pairs whose source term occurs in
+        the text, in order of first occurrence.
+        """
+        with self._lock:
+            if not self._entries:
+                return []
+            if self._dirty:
+                self._build_links_locked()
+
+            goto, fail, output_link, pattern_at = self._goto, self._fail, self._output_link, self._pattern_at
+            seen: Dict[str, None] = {}
+            node = 0
+            lowered = text.lower()
+            for end, char in enumerate(lowered):
+                while node and char not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(char, 0)
+                hit = node if node in pattern_at else output_link[node]
+                while hit > 0:
+                    pattern = pattern_at[hit]
+                    if not self.whole_words or _on_word_boundaries(lowered, pattern, end):
+                        seen.setdefault(pattern, None)
+                    hit = output_link[hit]
+
+            matches = []
+            for pattern in seen:
+                for entry_id in sorted(self._ids_for_pattern[pattern]):
+                    matches.append(self._entries[entry_id])
+            return matches
+
+
+def _is_arabic(char: str) -> bool:
+    return "\u0600" <= char <= "\u06ff"
+
+def _on_word_boundaries(text: str, pattern: str, end: int) -> bool:
+    """
+    True unless the occurrence of pattern ending at text[end] continues a word on
+    either side. Edges of the term that are not letters or digits need no boundary.
+    An Arabic term may be preceded by attached prefixes such as ال or و (والكتاب).
+    """
+    start = end - len(pattern) + 1
+    if start > 0 and pattern[0].isalnum() and text[start - 1].isalnum():
+        word_start = start - 1
+        while word_start > 0 and text[word_start - 1].isalnum():
+            word_start -= 1
+        if not (_is_arabic(pattern[0]) and _ARABIC_PROCLITICS.fullmatch(text, word_start, start)):
+            return False
+    if end + 1 < len(text) and pattern[-1].isalnum() and text[end + 1].isalnum():
+        return False
+    return True
+
+
+_matcher: Optional[GlossaryMatcher] = None
+_matcher_lock = threading.Lock()
+
+def build_glossary_matcher(entries: Iterable[Tuple[int, str, str]], version: int = 0) -> GlossaryMatcher:
+    """
+    Compiles a matcher from (id, source_text, target_text) rows.
+    """
+    matcher = GlossaryMatcher(version, whole_words=settings.GLOSSARY_WHOLE_WORDS)
+    for entry_id, source_text, target_text in entries:
+        matcher.add(entry_id, source_text, target_text)
+    return matcher
+
+def get_glossary_matcher(db: Session) -> GlossaryMatcher:
+    """
+    Returns the process-wide matcher, reloading it from the database only when
+    another worker (or a bulk operation) has changed the glossary.
+    """
+    global _matcher
+    version = cache_version_crud.get_version(db, GLOSSARY_VERSION_KEY)
+    matcher = _matcher
+    if matcher is not None and matcher.version == version:
+        return matcher
+    with _matcher_lock:
+        if _matcher is None or _matcher.version != version:
+            _matcher = build_glossary_matcher(dictionary_crud.iter_all_dictionary_entries(db), version)
+        return _matcher
+
+def get_glossary_version(db: Session) -> int:
+    """
+    Returns the current version of the custom dictionary.
+    """
+    return get_glossary_matcher(db).version
+
+def on_entry_saved(entry_id: int, source_text: str, target_text: str, version: int) -> None:
+    """
+    Applies a committed create/update to the in-memory matcher.
+    """
+    with _matcher_lock:
+        if _matcher is not None and _matcher.version == version - 1:
+            _matcher.add(entry_id, source_text, target_text)
+            _matcher.version = version
+
+def on_entries_saved(entries: List[Tuple[int, str, str]], version: int) -> None:
+    """
+    Applies a committed batch of creates/updates (one version bump) to the in-memory matcher.
+    """
+    with _matcher_lock:
+        if _matcher is not None and _matcher.version == version - 1:
+            for entry_id, source_text, target_text in entries:
+                _matcher.add(entry_id, source_text, target_text)
+            _matcher.version = version
+
+def on_entry_deleted(entry_id: int, version: int) -> None:
+    """
+    Applies a committed delete to the in-memory matcher.
+    """
+    with _matcher_lock:
+        if _matcher is not None and _matcher.version == version - 1:
+            _matcher.remove(entry_id)
+            _matcher.version = version
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from app.crud import conversation_crud
+from app.db import models
+from app.db.database import SessionLocal
+
+# Messages fetched from the database (and written out) per chunk
+EXPORT_BATCH_SIZE = 500
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "txt": ("text/plain; charset=utf-8", "txt"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "tmx": ("application/x-tmx+xml; charset=utf-8", "tmx"),
+}
+
+
+# Characters that are not allowed anywhere in an XML 1.0 document
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def xml_text(value: str) -> str:
+    """
+    Escapes text for an XML document, dropping the characters XML 1.0 cannot represent.
+    """
+    return escape(_INVALID_XML_CHARS.sub("", value))
+
+def _batched(messages: Iterable[models.Message], size: int) -> Iterator[List[models.Message]]:
+    batch = []
+    for message in messages:
+        batch.append(message)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _format_timestamp(value: datetime) -> str:
+    return value.isoformat() if value else ""
+
+def _txt_header(title: str, **_) -> str:
+    header = f"Conversation Title: {title}\n"
+    header += f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    header += "=" * 40 + "\n\n"
+    return header
+
+def _txt_batch(messages: List[models.Message], **_) -> str:
+    return "".join(
+        f"[User]: {message.original_text}\n[Assistant]: {message.translated_text}\n---\n"
+        for message in messages
+    )
+
+def _jsonl_batch(messages: List[models.Message], **_) -> str:
+    return "".join(
+        json.dumps({
+            "id": message.id,
+            "created_at": _format_timestamp(message.created_at),
+            "original_text": message.original_text,
+            "translated_text": message.translated_text,
+        }, ensure_ascii=False) + "\n"
+        for message in messages
+    )
+
+def _csv_rows(rows: Iterable[Iterable]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _csv_header(**_) -> str:
+    # The BOM lets spreadsheet applications detect UTF-8 (needed for Arabic text)
+    return "\ufeff" + _csv_rows([["id", "created_at", "original_text", "translated_text"]])
+
+def _csv_batch(messages: List[models.Message], **_) -> str:
+    return _csv_rows(
+        [message.id, _format_timestamp(message.created_at), message.original_text, message.translated_text]
+        for message in messages
+    )
+
+def _tmx_header(title: str, source_language: str, **_) -> str:
+    creation_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<tmx version="1.4">\n'
+        f'  <header creationtool="intelligent-translator" creationtoolversion="1.0" datatype="plaintext" '
+        f'segtype="sentence" adminlang="en" srclang={quoteattr(source_language)} o-tmf="intelligent-translator" '
+        f'creationdate="{creation_date}">\n'
+        f'    <prop type="x-conversation-title">{xml_text(title)}</prop>\n'
+        '  </header>\n'
+        '  <body>\n'
+    )
+
+def _tmx_batch(messages: List[models.Message], source_language: str, target_language: str, **_) -> str:
+    source_lang, target_lang = quoteattr(source_language), quoteattr(target_language)
+    return "".join(
+        f'    <tu tuid="{message.id}">\n'
+        f'      <tuv xml:lang={source_lang}><seg>{xml_text(message.original_text)}</seg></tuv>\n'
+        f'      <tuv xml:lang={target_lang}><seg>{xml_text(message.translated_text)}</seg></tuv>\n'
+        '    </tu>\n'
+        for message in messages
+    )
+
+def _tmx_footer(**_) -> str:
+    return "  </body>\n</tmx>\n"
+
+def _empty(**_) -> str:
+    return ""
+
+# format -> (header, batch, footer) writers
+_WRITERS: Dict[str, Tuple[Callable[..., str], Callable[..., str], Callable[..., str]]] = {
+    "txt": (_txt_header, _txt_batch, _empty),
+    "jsonl": (_empty, _jsonl_batch, _empty),
+    "csv": (_csv_header, _csv_batch, _empty),
+    "tmx": (_tmx_header, _tmx_batch, _tmx_footer),
+}
+
+def iter_conversation_export(
+    conversation_id: int,
+    title: str,
+    export_format: str,
+    source_language: str = "ar",
+    target_language: str = "en",
+) -> Iterator[str]:
+    """
+    Yields a conversation export chunk by chunk, one chunk per batch of messages,
+    so memory use stays flat no matter how long the conversation is.
+    It opens its own session because the response body is streamed after the request's
+    session has been closed. The language codes are only used by TMX.
+    """
+    write_header, write_batch, write_footer = _WRITERS[export_format]
+    options = {"title": title, "source_language": source_language, "target_language": target_language}
+
+    yield write_header(**options)
+    db = SessionLocal()
+    try:
+        messages = conversation_crud.iter_conversation_messages(db, conversation_id, batch_size=EXPORT_BATCH_SIZE)
+        for batch in _batched(messages, EXPORT_BATCH_SIZE):
+            yield write_batch(batch, **options)
+    finally:
+        db.close()
+    yield write_footer(**options)
@@ -0,0 +1,172 @@
+import csv
+import io
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from sqlalchemy.orm import Session
+
+from app.crud import dictionary_crud
+from app.db.database import SessionLocal
+from app.services.export_service import xml_text
+
+# Terms parsed (and upserted) per batch
+IMPORT_BATCH_SIZE = 1000
+
+# format -> (media type, file extension)
+GLOSSARY_FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "tsv": ("text/tab-separated-values; charset=utf-8", "tsv"),
+    "tbx": ("application/x-tbx+xml; charset=utf-8", "tbx"),
+}
+
+# Header names recognised in the first row of a CSV/TSV file
+_SOURCE_HEADERS = {"source", "source_text", "source term", "term", "original"}
+_TARGET_HEADERS = {"target", "target_text", "target term", "translation", "translated"}
+
+_XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+class GlossaryImportError(ValueError):
+    """
+    Raised when an uploaded glossary cannot be parsed.
+    """
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "tsv": "tsv", "tab": "tsv", "txt": "tsv", "tbx": "tbx", "xml": "tbx"}.get(extension)
+
+def _iter_delimited(file: BinaryIO, delimiter: str) -> Iterator[Tuple[str, str]]:
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""), delimiter=delimiter)
+    source_index, target_index = 0, 1
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    header = [cell.strip().lower() for cell in first_row]
+    if any(cell in _SOURCE_HEADERS for cell in header) and any(cell in _TARGET_HEADERS for cell in header):
+        source_index = next(i for i, cell in enumerate(header) if cell in _SOURCE_HEADERS)
+        target_index = next(i for i, cell in enumerate(header) if cell in _TARGET_HEADERS)
+        rows = reader
+    else:
+        rows = _prepend(first_row, reader)
+    for row in rows:
+        if len(row) <= max(source_index, target_index):
+            yield "", ""
+            continue
+        yield row[source_index], row[target_index]
+
+def _prepend(first_row: List[str], rows: Iterator[List[str]]) -> Iterator[List[str]]:
+    yield first_row
+    yield from rows
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _iter_tbx(file: BinaryIO, source_language: Optional[str], target_language: Optional[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Reads TBX v2 (termEntry/langSet/tig) and v3 (conceptEntry/langSec/termSec) files
+    incrementally. Without explicit languages, the first language of each entry is the
+    source and the second one the target; language codes match on their primary subtag.
+    """
+    def matches(language: str, wanted: str) -> bool:
+        language, wanted = language.lower(), wanted.lower()
+        return language == wanted or language.split("-")[0] == wanted.split("-")[0]
+
+    for _, element in ET.iterparse(file, events=("end",)):
+        if _local_name(element.tag) not in ("termEntry", "conceptEntry"):
+            continue
+        terms: List[Tuple[str, str]] = []
+        for language_section in element:
+            if _local_name(language_section.tag) not in ("langSet", "langSec"):
+                continue
+            language = language_section.get(_XML_LANG, "")
+            term = next((node.text for node in language_section.iter() if _local_name(node.tag) == "term" and node.text), None)
+            if term:
+                terms.append((language, term))
+        element.clear()
+
+        if source_language and target_language:
+            source = next((term for language, term in terms if matches(language, source_language)), "")
+            target = next((term for language, term in terms if matches(language, target_language)), "")
+        else:
+            source = terms[0][1] if len(terms) > 0 else ""
+            target = terms[1][1] if len(terms) > 1 else ""
+        yield source, target
+
+def iter_glossary_terms(file: BinaryIO, glossary_format: str, source_language: Optional[str] = None, target_language: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (source_text, target_text) pairs from an uploaded glossary without reading it into memory.
+    """
+    if glossary_format == "csv":
+        return _iter_delimited(file, ",")
+    if glossary_format == "tsv":
+        return _iter_delimited(file, "\t")
+    if glossary_format == "tbx":
+        return _iter_tbx(file, source_language, target_language)
+    raise GlossaryImportError(f"Unsupported glossary format '{glossary_format}'.")
+
+def import_glossary(db: Session, file: BinaryIO, glossary_format: str, source_language: Optional[str] = None, target_language: Optional[str] = None) -> Dict[str, int]:
+    """
+    Streams a glossary file into the dictionary with batched upserts.
+    Each batch is committed on its own, so a parse error keeps the batches before it.
+    """
+    terms = iter_glossary_terms(file, glossary_format, source_language, target_language)
+    try:
+        return dictionary_crud.upsert_dictionary_entries(db, terms, batch_size=IMPORT_BATCH_SIZE)
+    except (csv.Error, ET.ParseError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise GlossaryImportError(f"Could not parse the {glossary_format.upper()} file: {e}") from e
+
+def _delimited_rows(rows: List[List[str]], delimiter: str) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=delimiter).writerows(rows)
+    return buffer.getvalue()
+
+def iter_glossary_export(glossary_format: str, source_language: str = "ar", target_language: str = "en") -> Iterator[str]:
+    """
+    Yields the whole dictionary in the requested format, one chunk per batch of entries.
+    It opens its own session because the response body is streamed after the request's
+    session has been closed.
+    """
+    delimiter = "\t" if glossary_format == "tsv" else ","
+    if glossary_format == "tbx":
+        yield (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<martif type="TBX" xml:lang={quoteattr(source_language)}>\n'
+            '  <martifHeader><fileDesc><sourceDesc><p>intelligent-translator glossary</p></sourceDesc></fileDesc></martifHeader>\n'
+            '  <text>\n'
+            '    <body>\n'
+        )
+    else:
+        yield _delimited_rows([["source_text", "target_text"]], delimiter)
+
+    source_lang, target_lang = quoteattr(source_language), quoteattr(target_language)
+    db = SessionLocal()
+    try:
+        batch: List[Tuple[int, str, str]] = []
+        entries = dictionary_crud.iter_all_dictionary_entries(db, batch_size=IMPORT_BATCH_SIZE)
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) < IMPORT_BATCH_SIZE:
+                continue
+            yield _format_entries(batch, glossary_format, delimiter, source_lang, target_lang)
+            batch = []
+        if batch:
+            yield _format_entries(batch, glossary_format, delimiter, source_lang, target_lang)
+    finally:
+        db.close()
+
+    if glossary_format == "tbx":
+        yield "    </body>\n  </text>\n</martif>\n"
+
+def _format_entries(entries: List[Tuple[int, str, str]], glossary_format: str, delimiter: str, source_lang: str, target_lang: str) -> str:
+    if glossary_format != "tbx":
+        return _delimited_rows([[source_text, target_text] for _, source_text, target_text in entries], delimiter)
+    return "".join(
+        f'      <termEntry id="e{entry_id}">\n'
+        f'        <langSet xml:lang={source_lang}><tig><term>{xml_text(source_text)}</term></tig></langSet>\n'
+        f'        <langSet xml:lang={target_lang}><tig><term>{xml_text(target_text)}</term></tig></langSet>\n'
+        '      </termEntry>\n'
+        for entry_id, source_text, target_text in entries
+    )
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+C = TypeVar("C")
+
+
+def make_flight_key(api_key: str, payload: dict) -> str:
+    """
+    Builds a key identifying an upstream request: the account it is billed to and
+    every parameter sent. Identical keys may share one upstream call.
+    """
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{api_key}\n{body}".encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        # Resolved once the upstream stream is open (or failed to open)
+        self.opened: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self.chunks: List[object] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.readers = 0
+
+
+class _StreamReader:
+    """
+    One caller's iterator over a shared stream. Gives its reader reference back exactly
+    once, however it ends; unlike an async generator, also when it is closed (or dropped)
+    before it was ever iterated.
+    """
+
+    def __init__(self, flights: "SingleFlight", key: Hashable, flight: _StreamFlight):
+        self._flights = flights
+        self._key = key
+        self._flight = flight
+        self._position = 0
+        self._released = False
+        self._loop = asyncio.get_running_loop()
+
+    def __aiter__(self) -> "_StreamReader":
+        return self
+
+    async def __anext__(self):
+        flight = self._flight
+        if self._released:
+            raise StopAsyncIteration
+        try:
+            if self._position >= len(flight.chunks) and not flight.finished:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: self._position < len(flight.chunks) or flight.finished)
+        except BaseException:
+            self._release()
+            raise
+        if self._position < len(flight.chunks):
+            chunk = flight.chunks[self._position]
+            self._position += 1
+            return chunk
+        self._release()
+        if flight.error is not None:
+            raise flight.error
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._flights._release_reader(self._key, self._flight)
+
+    def __del__(self):
+        if not self._released:
+            try:
+                self._loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # The loop is closed; so is everything the flight was doing
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent upstream calls within this worker: the first caller for
+    a key starts the call, later callers with the same key wait for the same result.
+
+    The shared call runs as its own task, so a caller that is cancelled (e.g. its client
+    disconnected) does not cancel it for the others. It is reference counted: when the
+    last waiter goes away before it completes, it is cancelled. Nothing is kept after
+    completion; caching results is left to the caches.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Flight] = {}
+        self._streams: Dict[Hashable, _StreamFlight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _forget(self, registry: dict, key: Hashable, flight) -> None:
+        if registry.get(key) is flight:
+            del registry[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the result of fn(), shared with every concurrent call for the same key.
+        Exceptions raised by fn() are raised to every waiter.
+        """
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting for the result any more
+                flight.task.cancel()
+                self._forget(self._calls, key, flight)
+
+    async def stream(self, key: Hashable, open_stream: Callable[[], Awaitable[AsyncIterator[C]]]) -> AsyncIterator[C]:
+        """
+        Shares one upstream stream (audio bytes, text deltas) between concurrent calls for
+        the same key. Returns once open_stream() has returned; exceptions it raises are
+        raised here, to every waiter. Each returned iterator replays the chunks received so
+        far, then follows the stream live; errors during the stream are raised from every
+        iterator, after the chunks that came before them. A stream that only connects when
+        first iterated (e.g. an async generator) reports connection errors that way too,
+        from the first __anext__().
+
+        Every returned iterator counts as a reader until it is exhausted, fails, is closed
+        with aclose(), or is garbage collected, whether or not it was ever iterated.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._pump(flight, open_stream))
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.readers += 1
+        reader = None
+        try:
+            await asyncio.shield(flight.opened)
+            reader = _StreamReader(self, key, flight)
+        finally:
+            if reader is None:
+                self._release_reader(key, flight)
+        return reader
+
+    async def _pump(self, flight: _StreamFlight, open_stream: Callable[[], Awaitable[AsyncIterator]]) -> None:
+        try:
+            iterator = await open_stream()
+        except asyncio.CancelledError:
+            flight.opened.cancel()
+            raise
+        except Exception as e:
+            flight.opened.set_exception(e)
+            # Marks the exception as retrieved, in case every waiter is already gone
+            flight.opened.exception()
+            return
+        flight.opened.set_result(None)
+        try:
+            async for chunk in iterator:
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            await iterator.aclose()
+            async with flight.changed:
+                flight.finished = True
+                flight.changed.notify_all()
+
+    def _release_reader(self, key: Hashable, flight: _StreamFlight) -> None:
+        flight.readers -= 1
+        if flight.readers == 0 and not flight.task.done():
+            # The last reader went away: stop the upstream download
+            flight.task.cancel()
+            self._forget(self._streams, key, flight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# One registry per upstream service, shared by all requests in this worker
+translation_flights = SingleFlight("translation")
+tts_flights = SingleFlight("tts")
+transcription_flights = SingleFlight("transcription")
+for _flights in (translation_flights, tts_flights, transcription_flights):
+    metrics.register_stats(
+        "request_coalescing", _flights.stats, counters=("leaders", "coalesced"), labels={"service": _flights.name}
+    )
@@ -0,0 +1,121 @@
+import math
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:
+    # Optional: without it token counts are estimated from the UTF-8 length
+    tiktoken = None
+
+# Tokens the chat format adds around every message (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Rough bytes per token for the fallback estimate: about four characters of English,
+# about two of Arabic (two bytes per character in UTF-8)
+_ESTIMATE_BYTES_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(settings.TOKEN_COUNT_ENCODING)
+    except (KeyError, ValueError, OSError) as e:
+        # Unknown encoding, or the BPE files cannot be downloaded
+        print(f"Token counting falls back to estimates: {e}")
+        return None
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text.encode("utf-8")) / _ESTIMATE_BYTES_PER_TOKEN)
+
+def truncate_to_last_tokens(text: str, max_tokens: int) -> str:
+    """
+    Returns the end of text that fits in max_tokens tokens (estimated without tiktoken).
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        # A cut inside a multi-byte character decodes to a replacement character
+        return encoding.decode(tokens[-max_tokens:]).lstrip("\ufffd")
+    encoded = text.encode("utf-8")
+    max_bytes = max_tokens * _ESTIMATE_BYTES_PER_TOKEN
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[-max_bytes:].decode("utf-8", errors="ignore")
+
+def count_message_tokens(original_text: str, translated_text: str) -> int:
+    """
+    Prompt tokens a stored message costs when it is sent as context
+    (a user turn and an assistant turn).
+    """
+    return count_tokens(original_text) + count_tokens(translated_text) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+def count_chat_tokens(messages: Iterable[dict]) -> int:
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def context_token_budget(model_name: str) -> int:
+    """
+    Token budget for conversation context sent with a translation to this model.
+    """
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model_name, settings.CONTEXT_TOKEN_BUDGET)
+
+
+class PromptTokenStats:
+    """
+    Running totals of the prompts sent for translations in this worker. The estimate
+    is counted locally; upstream totals are the usage the API reported (non-streaming calls).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.context_messages = 0
+        self.estimated_prompt_tokens = 0
+        self.upstream_reports = 0
+        self.upstream_prompt_tokens = 0
+
+    def record(self, context_messages: int, estimated_prompt_tokens: int, upstream_prompt_tokens: Optional[int] = None) -> None:
+        with self._lock:
+            self.prompts += 1
+            self.context_messages += context_messages
+            self.estimated_prompt_tokens += estimated_prompt_tokens
+            if upstream_prompt_tokens is not None:
+                self.upstream_reports += 1
+                self.upstream_prompt_tokens += upstream_prompt_tokens
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            prompts, reports = self.prompts, self.upstream_reports
+            return {
+                "prompts": prompts,
+                "context_messages": self.context_messages,
+                "estimated_prompt_tokens": self.estimated_prompt_tokens,
+                "upstream_prompt_tokens": self.upstream_prompt_tokens,
+                "avg_context_messages": (self.context_messages / prompts) if prompts else 0.0,
+                "avg_estimated_prompt_tokens": (self.estimated_prompt_tokens / prompts) if prompts else 0.0,
+                "avg_upstream_prompt_tokens": (self.upstream_prompt_tokens / reports) if reports else 0.0,
+                "exact_token_counts": _encoding() is not None,
+            }
+
+
+# Process-wide counters shared by all requests
+prompt_token_stats = PromptTokenStats()
+metrics.register_stats(
+    "prompt_tokens",
+    prompt_token_stats.stats,
+    counters=("prompts", "context_messages", "estimated_prompt_tokens", "upstream_prompt_tokens"),
+)
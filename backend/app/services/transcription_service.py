@@ -1,38 +1,279 @@
-from openai import AsyncOpenAI
-from typing import IO, Optional # <-- NEW: Import Optional
+import asyncio
+import difflib
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple # <-- NEW: Import Optional
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud import transcription_cache_crud
+from app.db.database import AsyncDBSession, open_async_db
+from app.services.singleflight import make_flight_key, transcription_flights
+from app.services import audio_segmentation
+from app.services.upstream_clients import upstream_clients
+from app.services.upstream_scheduler import upstream_scheduler
+
+# Bytes copied per read when spooling an upload to disk
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Words compared at each seam when removing text transcribed twice in an overlap
+_STITCH_WINDOW_WORDS = 40
+_STITCH_MIN_MATCH_WORDS = 2
+_WORD_CHARS = re.compile(r"\w+", re.UNICODE)
+
+
+class TranscriptionCacheStats:
+    """
+    Lookup counters of the transcription cache for this worker. The entries
+    themselves live in the database and are shared by all workers.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Process-wide counters shared by all requests
+transcription_cache_stats = TranscriptionCacheStats()
+metrics.register_stats("transcription_cache", transcription_cache_stats.stats, counters=("hits", "misses", "stores"))
+
+def _write_chunk(spooled_file, digest, chunk: bytes) -> None:
+    spooled_file.write(chunk)
+    digest.update(chunk)
+
+async def spool_upload(audio_file: UploadFile) -> Tuple[str, str, int]:
+    """
+    Copies an upload to a temporary file on disk, hashing it on the way.
+    Returns the file's path, the SHA-256 hex digest of its content and its size.
+    The caller is responsible for deleting the file.
+    """
+    suffix = os.path.splitext(audio_file.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spooled_file:
+            while True:
+                chunk = await audio_file.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                await run_in_threadpool(_write_chunk, spooled_file, digest, chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), size
+
+def _normalize_word(word: str) -> str:
+    return "".join(_WORD_CHARS.findall(word.lower()))
+
+def stitch_transcripts(texts: Sequence[str]) -> str:
+    """
+    Joins the transcripts of consecutive, overlapping segments. At each seam, the longest
+    run of words shared by the end of one part and the start of the next is kept once.
+    """
+    words: List[str] = []
+    for text in texts:
+        next_words = text.split()
+        if not words:
+            words = next_words
+            continue
+        tail_start = max(len(words) - _STITCH_WINDOW_WORDS, 0)
+        tail = [_normalize_word(word) for word in words[tail_start:]]
+        head = [_normalize_word(word) for word in next_words[:_STITCH_WINDOW_WORDS]]
+        match = difflib.SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        if match.size >= _STITCH_MIN_MATCH_WORDS:
+            words = words[:tail_start + match.a + match.size] + next_words[match.b + match.size:]
+        else:
+            words = words + next_words
+    return " ".join(words)
+
+async def _convert_to_wav(path: str, output_dir: str) -> Optional[str]:
+    """
+    Converts any audio file to 16 kHz mono PCM WAV with ffmpeg, if it is installed.
+    """
+    ffmpeg = shutil.which(settings.TRANSCRIPTION_FFMPEG_PATH) if settings.TRANSCRIPTION_FFMPEG_PATH else None
+    if ffmpeg is None:
+        return None
+    wav_path = os.path.join(output_dir, "converted.wav")
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", path, "-ac", "1", "-ar", "16000", "-f", "wav", wav_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        print(f"ffmpeg could not convert the upload: {stderr.decode(errors='replace').strip()}")
+        return None
+    return wav_path
+
+async def _transcribe_file(client, path: str, filename: str, content_type: Optional[str], language: Optional[str], model_name: str) -> str:
+    async def send():
+        # Re-opened on every attempt, since a retry has to upload the file again
+        with open(path, "rb") as audio:
+            # Prepare parameters for the API call
+            transcription_params = {
+                "model": model_name,
+                "file": (filename, audio, content_type)
+            }
+
+            # If a language is specified (and it's not 'auto'), add it to the request
+            if language and language != "auto":
+                transcription_params["language"] = language
+
+            return await client.audio.transcriptions.create(**transcription_params)
+
+    transcription = await upstream_scheduler.run(client.api_key, send, endpoint="transcription", model=model_name)
+    return transcription.text
+
+async def _transcribe_segments(client, segments: List[audio_segmentation.AudioSegment], language: Optional[str], model_name: str) -> str:
+    semaphore = asyncio.Semaphore(max(settings.TRANSCRIPTION_CONCURRENCY, 1))
+
+    async def transcribe_segment(segment: audio_segmentation.AudioSegment) -> str:
+        async with semaphore:
+            return await _transcribe_file(client, segment.path, os.path.basename(segment.path), "audio/wav", language, model_name)
+
+    tasks = [asyncio.create_task(transcribe_segment(segment)) for segment in segments]
+    try:
+        texts = await asyncio.gather(*tasks)
+    finally:
+        # On the first failure, stop the segments that are still queued or running
+        for task in tasks:
+            task.cancel()
+    return stitch_transcripts(texts)
+
+async def _transcribe_spooled_file(client, spooled_path: str, audio_file: UploadFile, language: Optional[str], model_name: str) -> str:
+    with tempfile.TemporaryDirectory(prefix="transcribe-") as work_dir:
+        size = os.path.getsize(spooled_path)
+        wav_path = spooled_path if await run_in_threadpool(audio_segmentation.is_pcm_wav, spooled_path) else None
+        if wav_path is None and size >= settings.TRANSCRIPTION_CONVERT_MIN_BYTES:
+            wav_path = await _convert_to_wav(spooled_path, work_dir)
+        elif wav_path is not None and size > settings.TRANSCRIPTION_MAX_UPLOAD_BYTES:
+            # 16 kHz mono is what the model works with anyway, and far fewer bytes to upload
+            wav_path = await _convert_to_wav(spooled_path, work_dir) or wav_path
+
+        segments = []
+        if wav_path is not None:
+            segments = await run_in_threadpool(
+                audio_segmentation.split_wav,
+                wav_path,
+                work_dir,
+                settings.TRANSCRIPTION_SEGMENT_SECONDS,
+                settings.TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS,
+                settings.TRANSCRIPTION_SILENCE_SEARCH_SECONDS,
+                settings.TRANSCRIPTION_MAX_UPLOAD_BYTES,
+            )
+
+        if segments:
+            return await _transcribe_segments(client, segments, language, model_name)
+        if size <= settings.TRANSCRIPTION_MAX_UPLOAD_BYTES:
+            return await _transcribe_file(client, spooled_path, audio_file.filename, audio_file.content_type, language, model_name)
+        if wav_path is not None and wav_path != spooled_path:
+            # The conversion made it small enough for one upload
+            return await _transcribe_file(client, wav_path, "audio.wav", "audio/wav", language, model_name)
+        raise ValueError(
+            f"The audio is larger than the {settings.TRANSCRIPTION_MAX_UPLOAD_BYTES} byte upload limit "
+            "and could not be split (upload PCM WAV, or install ffmpeg to convert other formats)."
+        )
+
+async def _save_transcript(audio_sha256: str, language: str, model_name: str, transcribed_text: str, audio_bytes: int) -> None:
+    """
+    Stores a transcript in the cache with a session of its own: the requests that share
+    a transcription may have finished (and closed theirs) by the time it completes.
+    """
+    try:
+        async with open_async_db() as db:
+            await db.run_sync(
+                transcription_cache_crud.save_transcript,
+                audio_sha256,
+                language,
+                model_name,
+                transcribed_text,
+                audio_bytes,
+                settings.TRANSCRIPTION_CACHE_MAX_ENTRIES,
+            )
+        transcription_cache_stats.stores += 1
+    except Exception as e:
+        # The transcript is still good; it just won't be served from the cache
+        print(f"Could not cache the transcript: {e}")
 
 async def transcribe_audio(
-    api_key: str, 
+    api_key: str,
     audio_file: UploadFile,
-    language: Optional[str] = None # <-- NEW: Accept an optional language parameter
+    language: Optional[str] = None, # <-- NEW: Accept an optional language parameter
+    model_name: str = "whisper-1",
+    db: Optional[AsyncDBSession] = None,
+    use_cache: bool = True
 ) -> str:
     """
     Calls the OpenAI Whisper API to transcribe an audio file.
     UPDATED: Now accepts an optional language code to improve accuracy.
+    The upload is spooled to disk first. Long or large PCM WAV recordings (and, when ffmpeg
+    is available, large files in other formats) are split into overlapping segments near
+    pauses, each under the upstream upload limit, transcribed concurrently and stitched
+    back together.
+    When a db session is given, transcripts are cached by the hash of the audio content,
+    the language and the model; pass use_cache=False to force a fresh upstream call.
+    Concurrent uploads of the same audio share one transcription.
     """
     if not api_key:
         return "Error: OpenAI API key was not provided to the transcription service."
 
-    client = AsyncOpenAI(api_key=api_key)
+    client = upstream_clients.get_client(api_key)
 
     try:
-        audio_data_tuple = (audio_file.filename, audio_file.file, audio_file.content_type)
-        
-        # Prepare parameters for the API call
-        transcription_params = {
-            "model": "whisper-1",
-            "file": audio_data_tuple
-        }
-        
-        # If a language is specified (and it's not 'auto'), add it to the request
-        if language and language != "auto":
-            transcription_params["language"] = language
-            
-        transcription = await client.audio.transcriptions.create(**transcription_params)
-        
-        return transcription.text
+        spooled_path, audio_sha256, audio_bytes = await spool_upload(audio_file)
+    except OSError as e:
+        print(f"Could not spool the uploaded audio: {e}")
+        return f"Error: Could not read the uploaded audio. Details: {e}"
+
+    cache_language = language if language and language != "auto" else "auto"
+    spool_taken_over = False
+    use_cache = use_cache and db is not None and settings.TRANSCRIPTION_CACHE_ENABLED
+
+    try:
+        if use_cache:
+            cached_transcript = await db.run_sync(transcription_cache_crud.get_transcript, audio_sha256, cache_language, model_name)
+            if cached_transcript is not None:
+                transcription_cache_stats.hits += 1
+                return cached_transcript
+            transcription_cache_stats.misses += 1
+
+        async def transcribe() -> str:
+            transcribed_text = await _transcribe_spooled_file(client, spooled_path, audio_file, language, model_name)
+            if db is not None and settings.TRANSCRIPTION_CACHE_ENABLED:
+                await _save_transcript(audio_sha256, cache_language, model_name, transcribed_text, audio_bytes)
+            return transcribed_text
+
+        def start_transcription() -> "asyncio.Task[str]":
+            # Only called for the first of several identical uploads. Its spooled file now
+            # belongs to the shared task, which may outlive this request.
+            nonlocal spool_taken_over
+            spool_taken_over = True
+            task = asyncio.ensure_future(transcribe())
+            task.add_done_callback(lambda _: os.unlink(spooled_path))
+            return task
+
+        # Identical uploads that are already being transcribed share one upstream call
+        flight_key = make_flight_key(api_key, {"audio_sha256": audio_sha256, "language": cache_language, "model": model_name})
+        return await transcription_flights.do(flight_key, start_transcription)
 
     except Exception as e:
         print(f"An error occurred while calling the Whisper API: {e}")
-        return f"Error: Could not transcribe audio. Details: {e}"
\ No newline at end of file
+        return f"Error: Could not transcribe audio. Details: {e}"
+    finally:
+        if not spool_taken_over:
+            os.unlink(spooled_path)
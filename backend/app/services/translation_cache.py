@@ -0,0 +1,105 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+def make_cache_key(
+    text: str,
+    target_language: str,
+    model_name: str,
+    custom_prompt: Optional[str],
+    glossary_version: int,
+    context: Sequence[Tuple[str, str]] = (),
+) -> str:
+    """
+    Builds a content-addressed key from every input that affects a translation.
+    The context is the list of (original, translated) pairs sent to the model.
+    """
+    payload = json.dumps(
+        {
+            "text": text,
+            "target_language": target_language,
+            "model": model_name,
+            "custom_prompt": custom_prompt or "",
+            "glossary_version": glossary_version,
+            "context": [list(pair) for pair in context],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    A small in-memory LRU cache with a per-entry TTL.
+    Only successful translations are stored.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Process-wide cache instance shared by all requests
+translation_cache = TranslationCache(
+    max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TRANSLATION_CACHE_TTL_SECONDS,
+)
+metrics.register_stats("translation_cache", translation_cache.stats, counters=("hits", "misses", "evictions"))
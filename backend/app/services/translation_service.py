@@ -1,42 +1,127 @@
-from openai import AsyncOpenAI
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Tuple
 from sqlalchemy.orm import Session # <-- NEW IMPORT
+from app.crud import translation_memory_crud
 from app.db import models
-from app.crud import dictionary_crud # <-- NEW IMPORT
+from app.db.database import AsyncDBSession
+from app.core.config import settings
+from app.core.metrics import upstream_tokens
+from app.services import dictionary_service
+from app.services import token_counter
+from app.services.singleflight import make_flight_key, translation_flights
+from app.services.upstream_scheduler import PRIORITY_INTERACTIVE, upstream_scheduler
+from app.services.translation_cache import translation_cache, make_cache_key
+from app.services.upstream_clients import upstream_clients
 
-def _build_dictionary_prompt_segment(db: Session) -> str:
+# Completion length limit of every translation request (counted against the TPM budget)
+MAX_TRANSLATION_TOKENS = 2000
+
+def _build_dictionary_prompt_segment(matcher: dictionary_service.GlossaryMatcher, text: str) -> str:
     """
     Helper function to build the dictionary part of the system prompt.
+    Only the entries whose source term actually occurs in the text are included.
     """
-    entries = dictionary_crud.get_dictionary_entries(db)
+    entries = matcher.find(text)
     if not entries:
         return ""
 
     rules = "\n\n--- STRICT TRANSLATION RULES ---\nYou MUST translate the following terms exactly as specified, without any deviation:\n"
-    for entry in entries:
-        rules += f"- '{entry.source_text}' MUST BE TRANSLATED AS '{entry.target_text}'\n"
+    for source_text, target_text in entries:
+        rules += f"- '{source_text}' MUST BE TRANSLATED AS '{target_text}'\n"
     rules += "--- END OF STRICT RULES ---\n"
     return rules
 
-async def get_ai_translation(
-    db: Session, # <-- NEW: Pass the db session
-    text: str, 
-    target_language: str, 
-    api_key: str, 
-    past_messages: List[models.Message], 
-    custom_prompt: Optional[str] = None,
-    model_name: str = "gpt-4o-mini"
-) -> str:
+def _build_memory_prompt_segment(matches: List[translation_memory_crud.TranslationMemoryMatch]) -> str:
     """
-    Calls the OpenAI API to perform a translation, using a specific model and custom dictionary.
+    Helper function to build the translation memory part of the system prompt.
     """
-    if not api_key:
-        return "Error: OpenAI API key was not provided to the service."
+    if not matches:
+        return ""
+
+    hints = "\n\n--- TRANSLATION MEMORY ---\nSimilar sentences were translated before. Reuse their wording and terminology wherever the meaning is the same:\n"
+    for match in matches:
+        hints += f"- Source: '{match.original_text}'\n  Translation: '{match.translated_text}'\n"
+    hints += "--- END OF TRANSLATION MEMORY ---\n"
+    return hints
+
+def _reuse_key(text: str, target_language: str, custom_prompt: Optional[str], model_name: str, glossary_version: int) -> str:
+    return make_cache_key(
+        text=text,
+        target_language=target_language,
+        model_name=model_name,
+        custom_prompt=custom_prompt,
+        glossary_version=glossary_version,
+    )
+
+def make_reuse_keys(
+    db: Session,
+    texts: List[str],
+    target_language: str,
+    custom_prompt: Optional[str],
+    model_name: str,
+) -> List[str]:
+    """
+    The keys to save translations of `texts` under. A saved translation is only reused
+    for the same raw text, target language, custom prompt, glossary version and model.
+    The conversation context is left out, as the translation memory ignores it anyway.
+    """
+    glossary_version = dictionary_service.get_glossary_version(db)
+    return [_reuse_key(text, target_language, custom_prompt, model_name, glossary_version) for text in texts]
+
+def _prepare_translation(
+    db: Session,
+    text: str,
+    target_language: str,
+    past_messages: List[models.Message],
+    custom_prompt: Optional[str],
+    model_name: str,
+    use_cache: bool = True,
+) -> Tuple[Optional[str], List[dict], Optional[str]]:
+    """
+    Builds the cache key (None when caching is disabled) and the chat messages for a translation.
+    The third value is a finished translation, when use_cache is set and either the
+    translation cache has one or TRANSLATION_MEMORY_REUSE_ENABLED is set and the same text
+    was translated before with the same inputs (see make_reuse_keys); the messages are
+    then not built. Similar earlier translations down to TRANSLATION_MEMORY_HINT_THRESHOLD
+    are added to the prompt as hints.
+    """
+    glossary_matcher = dictionary_service.get_glossary_matcher(db)
+
+    cache_key = None
+    if settings.TRANSLATION_CACHE_ENABLED:
+        cache_key = make_cache_key(
+            text=text,
+            target_language=target_language,
+            model_name=model_name,
+            custom_prompt=custom_prompt,
+            glossary_version=glossary_matcher.version,
+            context=[(msg.original_text, msg.translated_text) for msg in past_messages],
+        )
+        # Checked before the translation memory, whose lookups cost far more
+        if use_cache:
+            cached_translation = translation_cache.get(cache_key)
+            if cached_translation is not None:
+                return cache_key, [], cached_translation
+
+    memory_matches = []
+    if settings.TRANSLATION_MEMORY_ENABLED:
+        if settings.TRANSLATION_MEMORY_REUSE_ENABLED and use_cache:
+            reuse_key = _reuse_key(text, target_language, custom_prompt, model_name, glossary_matcher.version)
+            reused_translation = translation_memory_crud.find_reusable_translation(db, reuse_key)
+            if reused_translation is not None:
+                return cache_key, [], reused_translation
+        memory_matches = translation_memory_crud.find_matches(
+            db,
+            text,
+            target_language,
+            min_similarity=settings.TRANSLATION_MEMORY_HINT_THRESHOLD,
+            limit=settings.TRANSLATION_MEMORY_MAX_HINTS,
+            candidates=settings.TRANSLATION_MEMORY_CANDIDATES,
+            max_chars=settings.TRANSLATION_MEMORY_MAX_CHARS,
+            max_postings=settings.TRANSLATION_MEMORY_MAX_POSTINGS,
+        )
 
-    client = AsyncOpenAI(api_key=api_key)
-    
     # Build the dictionary rules segment
-    dictionary_rules = _build_dictionary_prompt_segment(db)
+    dictionary_rules = _build_dictionary_prompt_segment(glossary_matcher, text)
 
     default_system_prompt = f"""
 You are an expert, professional translator. Your task is to translate the user's text into {target_language}.
@@ -47,6 +132,7 @@ Do not add any commentary or explanations. Your response must only be the final,
 """
 
     system_prompt = custom_prompt if custom_prompt else default_system_prompt
+    system_prompt += _build_memory_prompt_segment(memory_matches)
     
     messages_for_ai = [{"role": "system", "content": system_prompt}]
     
@@ -55,16 +141,162 @@ Do not add any commentary or explanations. Your response must only be the final,
         messages_for_ai.append({"role": "assistant", "content": msg.translated_text})
         
     messages_for_ai.append({"role": "user", "content": text})
+    return cache_key, messages_for_ai, None
+
+async def get_ai_translation(
+    db: AsyncDBSession, # <-- NEW: Pass the db session
+    text: str, 
+    target_language: str, 
+    api_key: str, 
+    past_messages: List[models.Message], 
+    custom_prompt: Optional[str] = None,
+    model_name: str = "gpt-4o-mini",
+    use_cache: bool = True,
+    priority: str = PRIORITY_INTERACTIVE
+) -> str:
+    """
+    Calls the OpenAI API to perform a translation, using a specific model and custom dictionary.
+    Results are served from the translation cache when the same inputs were seen recently,
+    or from the translation memory when reuse is enabled and the same text was translated
+    before with the same prompt, glossary and model;
+    pass use_cache=False to force a fresh upstream call. Concurrent identical requests
+    share a single upstream call. The call waits for its turn in the upstream scheduler
+    under the given priority class.
+    """
+    if not api_key:
+        return "Error: OpenAI API key was not provided to the service."
+
+    cache_key, messages_for_ai, finished_translation = await db.run_sync(
+        _prepare_translation, text, target_language, past_messages, custom_prompt, model_name, use_cache
+    )
+    if finished_translation is not None:
+        return finished_translation
+
+    # Identical requests that are already in flight share one upstream call
+    flight_key = make_flight_key(api_key, {"model": model_name, "messages": messages_for_ai})
+    return await translation_flights.do(
+        flight_key, lambda: _complete_translation(api_key, model_name, messages_for_ai, cache_key, len(past_messages), priority)
+    )
+
+async def _complete_translation(
+    api_key: str,
+    model_name: str,
+    messages_for_ai: List[dict],
+    cache_key: Optional[str],
+    context_messages: int,
+    priority: str = PRIORITY_INTERACTIVE,
+) -> str:
+    client = upstream_clients.get_client(api_key)
+    estimated_prompt_tokens = token_counter.count_chat_tokens(messages_for_ai)
 
     try:
-        response = await client.chat.completions.create(
+        response = await upstream_scheduler.run(
+            api_key,
+            lambda: client.chat.completions.create(
+                model=model_name,
+                messages=messages_for_ai,
+                temperature=0.2,
+                max_tokens=MAX_TRANSLATION_TOKENS,
+            ),
+            priority=priority,
+            tokens=estimated_prompt_tokens + MAX_TRANSLATION_TOKENS,
+            endpoint="chat",
             model=model_name,
-            messages=messages_for_ai,
-            temperature=0.2,
-            max_tokens=2000,
         )
-        return response.choices[0].message.content.strip()
+        _record_usage(model_name, response.usage)
+        translated_text = response.choices[0].message.content.strip()
+        token_counter.prompt_token_stats.record(
+            context_messages=context_messages,
+            estimated_prompt_tokens=estimated_prompt_tokens,
+            upstream_prompt_tokens=response.usage.prompt_tokens if response.usage else None,
+        )
+        # An empty answer is not cached: it would be served again until evicted
+        if cache_key is not None and translated_text:
+            translation_cache.set(cache_key, translated_text)
+        return translated_text
 
     except Exception as e:
         print(f"An error occurred while calling the OpenAI API: {e}")
-        return f"Error: Could not get translation from AI. Details: {e}"
\ No newline at end of file
+        return f"Error: Could not get translation from AI. Details: {e}"
+
+async def stream_ai_translation(
+    db: AsyncDBSession,
+    text: str,
+    target_language: str,
+    api_key: str,
+    past_messages: List[models.Message],
+    custom_prompt: Optional[str] = None,
+    model_name: str = "gpt-4o-mini",
+    use_cache: bool = True
+) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of get_ai_translation. The prompt is built right away (while
+    the caller's db session is still open) and an async iterator of text deltas is returned.
+    Concurrent identical requests share one upstream stream, which is closed once the last
+    of their iterators is closed, so an abandoned stream never keeps an upstream connection
+    busy. Upstream errors are raised from the iterator.
+    """
+    cache_key, messages_for_ai, finished_translation = await db.run_sync(
+        _prepare_translation, text, target_language, past_messages, custom_prompt, model_name, use_cache
+    )
+    if finished_translation is not None:
+        return _replay_cached_translation(finished_translation)
+
+    async def open_stream() -> AsyncIterator[str]:
+        token_counter.prompt_token_stats.record(
+            context_messages=len(past_messages),
+            estimated_prompt_tokens=token_counter.count_chat_tokens(messages_for_ai),
+        )
+        return _stream_completion(api_key, model_name, messages_for_ai, cache_key)
+
+    # Identical streams that are already in flight share one upstream call
+    flight_key = make_flight_key(api_key, {"model": model_name, "messages": messages_for_ai, "stream": True})
+    return await translation_flights.stream(flight_key, open_stream)
+
+def _record_usage(model_name: str, usage) -> None:
+    if usage is not None:
+        upstream_tokens.inc(usage.prompt_tokens or 0, model=model_name, type="prompt")
+        upstream_tokens.inc(usage.completion_tokens or 0, model=model_name, type="completion")
+
+async def _replay_cached_translation(translated_text: str) -> AsyncIterator[str]:
+    yield translated_text
+
+async def _stream_completion(
+    api_key: str,
+    model_name: str,
+    messages_for_ai: List[dict],
+    cache_key: Optional[str],
+) -> AsyncIterator[str]:
+    client = upstream_clients.get_client(api_key)
+    stream = await upstream_scheduler.run(
+        api_key,
+        lambda: client.chat.completions.create(
+            model=model_name,
+            messages=messages_for_ai,
+            temperature=0.2,
+            max_tokens=MAX_TRANSLATION_TOKENS,
+            stream=True,
+            # The last chunk then carries the token usage
+            stream_options={"include_usage": True},
+        ),
+        tokens=token_counter.count_chat_tokens(messages_for_ai) + MAX_TRANSLATION_TOKENS,
+        endpoint="chat",
+        model=model_name,
+    )
+    parts = []
+    try:
+        async for chunk in stream:
+            _record_usage(model_name, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        # Releases the upstream connection even when the consumer stops early
+        await stream.close()
+
+    translated_text = "".join(parts).strip()
+    if cache_key is not None and translated_text:
+        translation_cache.set(cache_key, translated_text)
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Temp files untouched for this long are leftovers of an interrupted write
+_STALE_TEMP_FILE_SECONDS = 3600
+
+
+def make_tts_cache_key(text: str, model_name: str, voice_name: str, audio_format: str) -> str:
+    """
+    Builds a content-addressed key from every input that affects the synthesized audio.
+    """
+    payload = json.dumps(
+        {"text": text, "model": model_name, "voice": voice_name, "format": audio_format},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_PATTERN.fullmatch(key))
+
+
+class TTSCacheWriter:
+    """
+    Writes one cache entry to a temporary file in the cache directory. commit() moves it
+    into place atomically, so readers never see a partially written file; abort() removes it.
+    """
+
+    def __init__(self, cache: "TTSAudioCache", key: str):
+        self._cache = cache
+        self.key = key
+        self.size = 0
+        directory = os.path.dirname(cache.path_for(key))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> None:
+        self._file.close()
+        if self.size == 0:
+            self.abort()
+            return
+        os.replace(self._temp_path, self._cache.path_for(self.key))
+        self._temp_path = None
+        self._cache._add(self.key, self.size)
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if self._temp_path is not None:
+            try:
+                os.unlink(self._temp_path)
+            except FileNotFoundError:
+                pass
+            self._temp_path = None
+
+
+class TTSAudioCache:
+    """
+    Synthesized audio on local disk, one file per content key, capped at max_bytes with
+    least-recently-used eviction. Recency is kept in memory and mirrored to the files'
+    modification times, so the order survives restarts.
+
+    Each worker keeps its own index; files written or evicted by another worker are
+    picked up (or dropped) the next time they are looked up, so the size cap is per worker.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, file_extension: str = "mp3"):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.file_extension = file_extension
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{self.file_extension}")
+
+    def _load_locked(self) -> None:
+        """
+        Indexes the files already on disk, oldest first, and removes temp files left
+        behind by a crash (old enough not to belong to a write in progress).
+        """
+        self._loaded = True
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(".tmp-"):
+                    try:
+                        if entry.stat().st_mtime < time.time() - _STALE_TEMP_FILE_SECONDS:
+                            os.unlink(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                key = entry.name.rsplit(".", 1)[0]
+                if is_valid_key(key):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict_locked()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the path of a cached file and marks it as recently used, or None on a miss.
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if not self._loaded:
+                self._load_locked()
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                self._forget_locked(key)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Written by another worker
+                self._total_bytes += size
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def open_writer(self, key: str) -> TTSCacheWriter:
+        with self._lock:
+            if not self._loaded:
+                self._load_locked()
+        return TTSCacheWriter(self, key)
+
+    def _add(self, key: str, size: int) -> None:
+        with self._lock:
+            self._forget_locked(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict_locked()
+
+    def _forget_locked(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.unlink(self.path_for(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, total_bytes = len(self._entries), self._total_bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Process-wide cache instance shared by all requests
+tts_cache = TTSAudioCache(
+    directory=settings.TTS_CACHE_DIR,
+    max_bytes=settings.TTS_CACHE_MAX_BYTES,
+)
+metrics.register_stats("tts_cache", tts_cache.stats, counters=("hits", "misses", "evictions"))
@@ -1,30 +1,236 @@
-from openai import AsyncOpenAI
-from typing import Optional
+import asyncio
+import re
+from typing import AsyncIterator, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.metrics import upstream_characters
+from app.services.singleflight import make_flight_key, tts_flights
+from app.services.tts_cache import TTSCacheWriter, tts_cache, make_tts_cache_key
+from app.services.upstream_clients import upstream_clients
+from app.services.upstream_scheduler import upstream_scheduler
+
+# Sentence ends (Latin and Arabic punctuation, line breaks), kept with the preceding text
+_SENTENCE_END = re.compile(r"(?<=[.!?؟…])\s+|\s*\n\s*")
+# Clause breaks, used to split sentences that are still too long
+_CLAUSE_BREAK = re.compile(r"(?<=[,;:،؛])\s+")
+# Short first chunk so playback can start as early as possible
+_FIRST_CHUNK_MAX_CHARS = 60
 
 async def generate_speech_from_text(
     text: str, 
     api_key: str,
     model_name: str = "tts-1", # Added model_name parameter
-    voice_name: str = "alloy"  # Added voice_name parameter
-):
+    voice_name: str = "alloy",  # Added voice_name parameter
+    cache_key: Optional[str] = None
+) -> Optional[AsyncIterator[bytes]]:
     """
     Calls the OpenAI TTS API, using a specific model and voice.
+    The audio is streamed through as it arrives. With a cache_key, it is also written to
+    the TTS cache, and the entry is only kept if the whole stream was received.
+    Concurrent identical requests share one upstream stream.
     """
     if not api_key:
         print("Error: OpenAI API key was not provided to the TTS service.")
         return None
 
-    client = AsyncOpenAI(api_key=api_key)
+    client = upstream_clients.get_client(api_key)
 
-    try:
-        response = await client.audio.speech.create(
+    async def open_response():
+        response_context = client.audio.speech.with_streaming_response.create(
             model=model_name,
             voice=voice_name,
             input=text,
             response_format="mp3"
         )
-        return response.iter_bytes()
+        return response_context, await response_context.__aenter__()
+
+    async def open_stream() -> AsyncIterator[bytes]:
+        response_context, response = await upstream_scheduler.run(api_key, open_response, endpoint="speech", model=model_name)
+        try:
+            upstream_characters.inc(len(text), model=model_name)
+            cache_writer = await run_in_threadpool(_open_cache_writer, cache_key) if cache_key else None
+        except BaseException:
+            await response_context.__aexit__(None, None, None)
+            raise
+        return _stream_audio(response_context, response, cache_writer)
+
+    # Identical requests that are already in flight share one upstream stream
+    flight_key = make_flight_key(api_key, {"model": model_name, "voice": voice_name, "input": text, "format": "mp3"})
+    try:
+        # Opened here so that upstream errors surface before the response has started
+        return await tts_flights.stream(flight_key, open_stream)
+    except Exception as e:
+        print(f"An error occurred while calling OpenAI TTS API: {e}")
+        return None
+
+async def _stream_audio(response_context, response, cache_writer: Optional[TTSCacheWriter]) -> AsyncIterator[bytes]:
+    # Cache file I/O runs in the threadpool so a slow disk does not stall the event loop.
+    # Caching is best-effort: after a disk error the audio is still streamed, just not kept.
+    try:
+        async for chunk in response.iter_bytes():
+            if cache_writer is not None:
+                cache_writer = await run_in_threadpool(_write_cache_chunk, cache_writer, chunk)
+            yield chunk
+        if cache_writer is not None:
+            await run_in_threadpool(_commit_cache_entry, cache_writer)
+            cache_writer = None
+    finally:
+        if cache_writer is not None:
+            await run_in_threadpool(_abort_cache_entry, cache_writer)
+        await response_context.__aexit__(None, None, None)
+
+def _open_cache_writer(cache_key: str) -> Optional[TTSCacheWriter]:
+    try:
+        return tts_cache.open_writer(cache_key)
+    except OSError as e:
+        print(f"Could not write TTS cache entry: {e}")
+        return None
+
+def _abort_cache_entry(cache_writer: TTSCacheWriter) -> None:
+    try:
+        cache_writer.abort()
+    except OSError as e:
+        print(f"Could not remove a partial TTS cache entry: {e}")
+
+def _write_cache_chunk(cache_writer: TTSCacheWriter, chunk: bytes) -> Optional[TTSCacheWriter]:
+    """
+    Returns the writer, or None once the entry has been dropped after a write error.
+    """
+    try:
+        cache_writer.write(chunk)
+        return cache_writer
+    except OSError as e:
+        print(f"Could not write TTS cache entry: {e}")
+        _abort_cache_entry(cache_writer)
+        return None
+
+def _commit_cache_entry(cache_writer: TTSCacheWriter) -> None:
+    try:
+        cache_writer.commit()
+    except OSError as e:
+        print(f"Could not write TTS cache entry: {e}")
+        _abort_cache_entry(cache_writer)
+
+def _split_long(piece: str, max_chars: int) -> List[str]:
+    if len(piece) <= max_chars:
+        return [piece]
+    parts = []
+    for clause in _CLAUSE_BREAK.split(piece):
+        while len(clause) > max_chars:
+            # No punctuation left: cut at the last space that fits
+            cut = clause.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            parts.append(clause[:cut])
+            clause = clause[cut:].lstrip()
+        if clause:
+            parts.append(clause)
+    return parts
+
+def split_text_for_speech(text: str, max_chars: int = 300) -> List[str]:
+    """
+    Splits text into sentence-sized chunks for synthesis. Sentences longer than max_chars
+    are split at clause breaks; short neighbouring sentences are merged so that a
+    paragraph does not turn into dozens of tiny requests. The first chunk is kept short
+    so that playback can start early.
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    chunks: List[str] = []
+    for piece in pieces:
+        if chunks:
+            limit = min(max_chars, _FIRST_CHUNK_MAX_CHARS) if len(chunks) == 1 else max_chars
+            if len(chunks[-1]) + 1 + len(piece) <= limit:
+                chunks[-1] = f"{chunks[-1]} {piece}"
+                continue
+        chunks.append(piece)
+    return chunks
+
+def _write_cache_entry(cache_key: str, audio: bytes) -> None:
+    cache_writer = _open_cache_writer(cache_key)
+    if cache_writer is not None and _write_cache_chunk(cache_writer, audio) is not None:
+        _commit_cache_entry(cache_writer)
+
+async def _synthesize_chunk(client, text: str, model_name: str, voice_name: str, use_cache: bool) -> bytes:
+    cache_key = make_tts_cache_key(text, model_name, voice_name, "mp3") if use_cache else None
+    if cache_key is not None:
+        cached_path = await run_in_threadpool(tts_cache.get, cache_key)
+        if cached_path is not None:
+            try:
+                with open(cached_path, "rb") as cached_file:
+                    return await run_in_threadpool(cached_file.read)
+            except FileNotFoundError:
+                pass  # Evicted in the meantime
+
+    async def synthesize() -> bytes:
+        response = await upstream_scheduler.run(
+            client.api_key,
+            lambda: client.audio.speech.create(
+                model=model_name,
+                voice=voice_name,
+                input=text,
+                response_format="mp3"
+            ),
+            endpoint="speech",
+            model=model_name,
+        )
+        upstream_characters.inc(len(text), model=model_name)
+        audio = response.content
+        if cache_key is not None:
+            await run_in_threadpool(_write_cache_entry, cache_key, audio)
+        return audio
+
+    flight_key = make_flight_key(client.api_key, {"model": model_name, "voice": voice_name, "input": text, "format": "mp3"})
+    return await tts_flights.do(flight_key, synthesize)
+
+async def stream_chunked_speech(
+    text: str,
+    api_key: str,
+    model_name: str = "tts-1",
+    voice_name: str = "alloy",
+    max_chars: int = 300,
+    concurrency: int = 4,
+    use_cache: bool = True
+) -> Optional[AsyncIterator[bytes]]:
+    """
+    Synthesizes the text sentence by sentence, with up to 'concurrency' upstream requests
+    in flight, and streams the MP3 segments back in order as soon as each one (and all
+    before it) is ready. Each segment is cached on its own.
+    Returns None if the first segment cannot be synthesized; later failures end the stream.
+    """
+    if not api_key:
+        print("Error: OpenAI API key was not provided to the TTS service.")
+        return None
+
+    chunks = split_text_for_speech(text, max_chars)
+    if not chunks:
+        return None
 
+    client = upstream_clients.get_client(api_key)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def synthesize(chunk: str) -> bytes:
+        async with semaphore:
+            return await _synthesize_chunk(client, chunk, model_name, voice_name, use_cache)
+
+    tasks = [asyncio.create_task(synthesize(chunk)) for chunk in chunks]
+    try:
+        first_segment = await tasks[0]
     except Exception as e:
+        for task in tasks:
+            task.cancel()
         print(f"An error occurred while calling OpenAI TTS API: {e}")
-        return None
\ No newline at end of file
+        return None
+    return _stream_segments(first_segment, tasks[1:])
+
+async def _stream_segments(first_segment: bytes, pending: List[asyncio.Task]) -> AsyncIterator[bytes]:
+    try:
+        yield first_segment
+        for task in pending:
+            yield await task
+    finally:
+        # The client went away or a segment failed: stop the remaining requests
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class UpstreamClientRegistry:
+    """
+    Process-wide registry of AsyncOpenAI clients, keyed by (api_key, base_url).
+
+    All clients for the same base URL share one pooled httpx.AsyncClient, so
+    TLS sessions and keep-alive connections are reused across requests instead
+    of being re-established for every call.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.client_reuses = 0
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = httpx.Timeout(settings.UPSTREAM_TIMEOUT_SECONDS, connect=settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS)
+        return httpx.AsyncClient(limits=limits, timeout=timeout, event_hooks={"request": [self._on_request]})
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.requests_sent += 1
+        request.extensions["trace"] = self._on_trace
+
+    async def _on_trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def get_client(self, api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+        """
+        Returns the shared client for this API key and base URL, creating it on first use.
+        """
+        base_url = base_url or settings.OPENAI_BASE_URL or ""
+        key = (api_key, base_url)
+        client = self._clients.get(key)
+        if client is not None:
+            self.client_reuses += 1
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                http_client = self._http_clients.get(base_url)
+                if http_client is None:
+                    http_client = self._build_http_client()
+                    self._http_clients[base_url] = http_client
+                # Retries are left to the upstream scheduler, which also honours the rate limits
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url or None, http_client=http_client, max_retries=0)
+                self._clients[key] = client
+                self.clients_created += 1
+            else:
+                self.client_reuses += 1
+            return client
+
+    async def aclose(self) -> None:
+        """
+        Closes every pooled connection. Called once on application shutdown.
+        """
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            self._http_clients.clear()
+            self._clients.clear()
+        for http_client in http_clients:
+            await http_client.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        reused = max(self.requests_sent - self.connections_opened, 0)
+        return {
+            "clients": len(self._clients),
+            "clients_created": self.clients_created,
+            "client_reuses": self.client_reuses,
+            "requests_sent": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "connections_reused": reused,
+        }
+
+
+# Process-wide registry, closed in the FastAPI lifespan
+upstream_clients = UpstreamClientRegistry()
+metrics.register_stats(
+    "upstream_clients",
+    upstream_clients.stats,
+    counters=("clients_created", "client_reuses", "requests_sent", "connections_opened", "connections_reused"),
+)
@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import openai
+
+from app.core.config import settings
+from app.core.metrics import metrics, upstream_queue_wait, upstream_request_duration, upstream_requests
+
+T = TypeVar("T")
+
+# Priority classes, most urgent first. Interactive requests (a user waiting on a
+# translation, speech or transcript) are always dispatched before batch work.
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+# Status codes worth retrying (the same set the OpenAI SDK retries by default)
+_RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class UpstreamQueueTimeoutError(RuntimeError):
+    """
+    Raised when a request waited longer than UPSTREAM_QUEUE_TIMEOUT_SECONDS for its turn.
+    """
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, refilled continuously, with bursts up to one
+    minute's worth.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available (amounts above the capacity are capped).
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing / self.rate, 0.0) if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, priority: int, tokens: int, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _KeyScheduler:
+    """
+    The queue and budgets of one API key. A single dispatcher task hands out turns in
+    priority order (first come, first served within a class) as the budgets allow.
+    """
+
+    def __init__(self, owner: "UpstreamScheduler"):
+        self._owner = owner
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._changed = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.requests = TokenBucket(settings.UPSTREAM_RPM_LIMIT) if settings.UPSTREAM_RPM_LIMIT > 0 else None
+        self.tokens = TokenBucket(settings.UPSTREAM_TPM_LIMIT) if settings.UPSTREAM_TPM_LIMIT > 0 else None
+        # Set after a 429: nothing is sent for this key until then
+        self.blocked_until = 0.0
+
+    def queued(self) -> Dict[str, int]:
+        depths = {name: 0 for name in PRIORITIES}
+        for _, _, waiter in self._queue:
+            if not waiter.future.done():
+                depths[PRIORITIES[waiter.priority]] += 1
+        return depths
+
+    def enqueue(self, priority: int, tokens: int) -> "asyncio.Future[None]":
+        waiter = _Waiter(priority, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return waiter.future
+
+    def block_until(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+        self._changed.set()
+
+    def _wait_time(self, waiter: _Waiter, now: float) -> float:
+        # Batch work leaves a share of each budget to interactive requests
+        reserve = settings.UPSTREAM_INTERACTIVE_RESERVE if waiter.priority > 0 else 0.0
+        wait = self.blocked_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1 + reserve * self.requests.capacity, now))
+        if self.tokens is not None and waiter.tokens:
+            wait = max(wait, self.tokens.wait_time(waiter.tokens + reserve * self.tokens.capacity, now))
+        return wait
+
+    async def _dispatch(self) -> None:
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                # Cancelled or timed out while queued
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            wait = self._wait_time(waiter, now)
+            if wait > 0:
+                # Woken early when a more urgent request arrives or the key gets blocked
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._queue)
+            if self.requests is not None:
+                self.requests.take(1, now)
+            if self.tokens is not None and waiter.tokens:
+                self.tokens.take(waiter.tokens, now)
+            self._owner._record_grant(waiter, now)
+            waiter.future.set_result(None)
+
+
+class UpstreamScheduler:
+    """
+    Central admission control for every OpenAI call in this worker.
+
+    Each API key gets request-per-minute and token-per-minute budgets (token buckets,
+    UPSTREAM_RPM_LIMIT / UPSTREAM_TPM_LIMIT, 0 for no local limit) and a priority queue.
+    Calls made through run() wait for their turn, and are retried with jittered
+    exponential backoff on 429s, timeouts, connection errors and 5xx responses.
+    A 429 pauses the whole key for its Retry-After, so queued requests do not pile onto it.
+    The SDK's own retries are disabled so that retries go through the queue as well.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, _KeyScheduler] = {}
+        self.granted = {name: 0 for name in PRIORITIES}
+        self.wait_seconds = {name: 0.0 for name in PRIORITIES}
+        self.rate_limited = 0
+        self.retries = 0
+        self.failures = 0
+        self.queue_timeouts = 0
+
+    def _key(self, api_key: str) -> _KeyScheduler:
+        scheduler = self._keys.get(api_key)
+        if scheduler is None:
+            scheduler = self._keys[api_key] = _KeyScheduler(self)
+        return scheduler
+
+    def _record_grant(self, waiter: _Waiter, now: float) -> None:
+        name = PRIORITIES[waiter.priority]
+        self.granted[name] += 1
+        self.wait_seconds[name] += now - waiter.enqueued_at
+        upstream_queue_wait.observe(now - waiter.enqueued_at, priority=name)
+
+    async def acquire(self, api_key: str, priority: str = PRIORITY_INTERACTIVE, tokens: int = 0) -> None:
+        """
+        Waits until a request for this key may be sent. `tokens` is the estimated token
+        cost (prompt plus max_tokens, as the API counts it), 0 for endpoints without a token budget.
+        """
+        future = self._key(api_key).enqueue(PRIORITIES.index(priority), tokens)
+        try:
+            await asyncio.wait_for(future, timeout=settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            raise UpstreamQueueTimeoutError("Timed out waiting for upstream capacity.") from None
+
+    async def run(
+        self,
+        api_key: str,
+        call: Callable[[], Awaitable[T]],
+        priority: str = PRIORITY_INTERACTIVE,
+        tokens: int = 0,
+        endpoint: str = "other",
+        model: str = "",
+    ) -> T:
+        """
+        Runs call() once it is this request's turn, retrying transient failures.
+        call must start a fresh upstream request every time it is invoked.
+        `endpoint` and `model` only label the upstream metrics.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(api_key, priority, tokens)
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except Exception as e:
+                self._record_attempt(started, endpoint, model, _outcome(e))
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt >= settings.UPSTREAM_MAX_RETRIES:
+                    if delay is not None:
+                        self.failures += 1
+                    raise
+                if isinstance(e, openai.RateLimitError):
+                    self.rate_limited += 1
+                    # The turn itself waits for the pause, together with everything queued behind it
+                    self._key(api_key).block_until(time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
+                attempt += 1
+                self.retries += 1
+            else:
+                self._record_attempt(started, endpoint, model, "ok")
+                return result
+
+    def _record_attempt(self, started: float, endpoint: str, model: str, outcome: str) -> None:
+        upstream_request_duration.observe(time.perf_counter() - started, endpoint=endpoint, model=model)
+        upstream_requests.inc(endpoint=endpoint, model=model, outcome=outcome)
+
+    def stats(self) -> Dict[str, object]:
+        queued = {name: 0 for name in PRIORITIES}
+        blocked_keys = 0
+        now = time.monotonic()
+        for scheduler in self._keys.values():
+            for name, depth in scheduler.queued().items():
+                queued[name] += depth
+            if scheduler.blocked_until > now:
+                blocked_keys += 1
+        return {
+            "keys": len(self._keys),
+            "blocked_keys": blocked_keys,
+            "queued": queued,
+            "granted": dict(self.granted),
+            "avg_wait_seconds": {
+                name: (self.wait_seconds[name] / self.granted[name]) if self.granted[name] else 0.0
+                for name in PRIORITIES
+            },
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "failures": self.failures,
+            "queue_timeouts": self.queue_timeouts,
+        }
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _outcome(error: Exception) -> str:
+    """
+    Short error class for the upstream metrics.
+    """
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection_error"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, openai.APIStatusError):
+        return "server_error" if error.status_code >= 500 else "client_error"
+    return "error"
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying after `error`, or None if it should not be retried.
+    Retry-After is honoured (plus a little jitter, so waiting requests do not all return
+    at once); otherwise the delay is exponential backoff with full jitter.
+    """
+    if isinstance(error, openai.APIConnectionError):
+        # Includes timeouts
+        pass
+    elif isinstance(error, openai.APIStatusError):
+        if error.status_code not in _RETRYABLE_STATUS_CODES and error.status_code < 500:
+            return None
+        if getattr(error, "code", None) == "insufficient_quota":
+            # Out of credit: waiting will not help
+            return None
+    else:
+        return None
+
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, min(retry_after * 0.1, 1.0))
+    else:
+        backoff = min(settings.UPSTREAM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt), settings.UPSTREAM_RETRY_MAX_DELAY_SECONDS)
+        delay = random.uniform(0, backoff)
+    return min(delay, settings.UPSTREAM_RETRY_MAX_DELAY_SECONDS)
+
+
+# Process-wide scheduler shared by all requests
+upstream_scheduler = UpstreamScheduler()
+metrics.register_stats(
+    "upstream_scheduler",
+    upstream_scheduler.stats,
+    counters=("granted", "rate_limited", "retries", "failures", "queue_timeouts"),
+    nested_label="priority",
+)
@@ -0,0 +1,226 @@
+"""
+Microbenchmarks for the CRUD hot paths at realistic data volumes.
+
+Generates synthetic data (see benchmarks.synthetic_data) if the database is empty,
+then times each operation with a fresh session per call, as a request would get:
+
+  get_conversations                - first sidebar page (100 rows)
+  get_conversation_summaries_page  - first cursor page of the sidebar listing (50 rows)
+  get_last_messages                - 4 most recent messages of a random conversation
+  get_context_messages             - token-budgeted context of a random conversation
+  create_conversation_message      - one new message (with search and memory indexing)
+  delete_conversation              - a random conversation with its messages and notes
+  get_dictionary_entries           - a page of 100 at a random offset
+  get_dictionary_entries_page      - a cursor page of 50
+
+It runs against a throwaway SQLite database in a temp directory by default, at
+--scale 0.01 of the full volumes. Set DATABASE_URL to use PostgreSQL or a persistent
+SQLite file; the data is generated once and reused by later runs. The write benchmarks
+change the data (adding messages, deleting conversations), so compare runs on freshly
+generated databases.
+
+--json writes machine-readable results, and --compare prints the change against such
+a file from an earlier run (e.g. the previous release).
+
+Usage (from the backend directory):
+    python -m benchmarks.crud_bench --scale 0.01 --iterations 200
+    DATABASE_URL=postgresql://localhost/translator_bench python -m benchmarks.crud_bench --scale 1 --json pg.json
+    python -m benchmarks.crud_bench --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# --json and --compare paths are relative to where the benchmark was started
+INVOCATION_DIR = os.getcwd()
+if not os.environ.get("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="translator-bench-"))
+
+import sqlalchemy  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.crud import conversation_crud, dictionary_crud, search_crud  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.database import SessionLocal, create_db_and_tables, engine  # noqa: E402
+from app.schemas import conversation as conversation_schemas  # noqa: E402
+from benchmarks.synthetic_data import add_volume_arguments, generate, volumes_from_args  # noqa: E402
+
+
+class _Targets:
+    """
+    Ids the operations pick from, loaded once so picking is not part of the timing.
+    """
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        with SessionLocal() as db:
+            self.conversation_ids = db.scalars(select(models.Conversation.id)).all()
+            self.dictionary_count = db.query(models.DictionaryEntry).count()
+        # Deleted conversations are drawn without replacement
+        self.deletable = list(self.conversation_ids)
+        rng.shuffle(self.deletable)
+
+    def conversation(self) -> int:
+        return self.rng.choice(self.conversation_ids)
+
+    def conversation_to_delete(self) -> int:
+        conversation_id = self.deletable.pop()
+        self.conversation_ids.remove(conversation_id)
+        return conversation_id
+
+
+def _operations(targets: _Targets) -> Dict[str, Callable]:
+    rng = targets.rng
+
+    def create_message(db):
+        conversation_crud.create_conversation_message(
+            db,
+            conversation_schemas.MessageCreate(
+                original_text=f"Benchmark message {rng.random()}",
+                translated_text="رسالة قياس الأداء",
+                target_language="English",
+            ),
+            targets.conversation(),
+        )
+
+    return {
+        "get_conversations": lambda db: conversation_crud.get_conversations(db, skip=0, limit=100),
+        "get_conversation_summaries_page": lambda db: conversation_crud.get_conversation_summaries_page(db, limit=50),
+        "get_last_messages": lambda db: conversation_crud.get_last_messages(db, targets.conversation(), 4),
+        "get_context_messages": lambda db: conversation_crud.get_context_messages(
+            db, targets.conversation(), settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_MAX_MESSAGES
+        ),
+        "create_conversation_message": create_message,
+        "delete_conversation": lambda db: conversation_crud.delete_conversation(db, targets.conversation_to_delete()),
+        "get_dictionary_entries": lambda db: dictionary_crud.get_dictionary_entries(
+            db, skip=rng.randrange(max(targets.dictionary_count - 100, 1)), limit=100
+        ),
+        "get_dictionary_entries_page": lambda db: dictionary_crud.get_dictionary_entries_page(db, limit=50),
+    }
+
+
+def run_operation(name: str, operation: Callable, iterations: int, warmup: int) -> dict:
+    latencies: List[float] = []
+    for i in range(warmup + iterations):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            operation(db)
+        if i >= warmup:
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": len(latencies) / sum(latencies),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def _print_comparison(results: List[dict], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as source:
+        baseline = {result["name"]: result for result in json.load(source)["results"]}
+    header = f"{'operation':<30} {'base_p50':>9} {'p50_ms':>9} {'change':>8} {'base_p95':>9} {'p95_ms':>9} {'change':>8}"
+    print()
+    print(f"Compared with {baseline_path}:")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        before = baseline.get(result["name"])
+        if before is None:
+            continue
+
+        def change(key: str) -> str:
+            return f"{(result[key] / before[key] - 1) * 100:+.1f}%" if before[key] else "n/a"
+
+        print(
+            f"{result['name']:<30} {before['p50_ms']:>9.2f} {result['p50_ms']:>9.2f} {change('p50_ms'):>8} "
+            f"{before['p95_ms']:>9.2f} {result['p95_ms']:>9.2f} {change('p95_ms'):>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_volume_arguments(parser)
+    parser.set_defaults(scale=0.01)
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls per operation")
+    parser.add_argument("--operations", nargs="+", help="Only run these operations")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file as JSON")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    volumes = volumes_from_args(args)
+    create_db_and_tables()
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        counts = generate(db, volumes, seed=args.seed, translation_memory=args.translation_memory)
+        generate_seconds = time.perf_counter() - started
+        # As at app startup; the writes below keep the search index up to date
+        search_crud.ensure_search_index(db)
+    print(f"{engine.dialect.name}: " + ", ".join(f"{count:,} {name}" for name, count in counts.items()))
+
+    operations = _operations(_Targets(random.Random(args.seed)))
+    names = args.operations or list(operations)
+    unknown = [name for name in names if name not in operations]
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(unknown)} (choose from {', '.join(operations)})")
+    deletions = (args.warmup + args.iterations) if "delete_conversation" in names else 0
+    if deletions > counts["conversations"]:
+        parser.error(f"delete_conversation needs {deletions} conversations; lower --iterations or raise --scale")
+
+    header = f"{'operation':<30} {'ops/s':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for name in names:
+        result = run_operation(name, operations[name], args.iterations, args.warmup)
+        results.append(result)
+        print(
+            f"{result['name']:<30} {result['ops_per_sec']:>9.1f} {result['mean_ms']:>9.2f} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.2f}"
+        )
+
+    if args.json_path:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "dialect": engine.dialect.name,
+                "server_version": ".".join(str(part) for part in engine.dialect.server_version_info or ()),
+                "python": platform.python_version(),
+                "sqlalchemy": sqlalchemy.__version__,
+                "seed": args.seed,
+                "volumes": vars(volumes),
+                "row_counts": counts,
+                "generate_seconds": generate_seconds,
+                "iterations": args.iterations,
+                "warmup": args.warmup,
+            },
+            "results": results,
+        }
+        with open(os.path.join(INVOCATION_DIR, args.json_path), "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        _print_comparison(results, os.path.join(INVOCATION_DIR, args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Load test for database access from async endpoints.
+
+Simulates concurrent translate requests: each one reads the conversation and
+its recent messages (the same CRUD calls as /conversations/{id}/translate)
+and then awaits a simulated upstream call. It compares three ways of running
+the queries:
+
+  blocking    - the old behaviour: a sync Session used directly on the event loop
+  threadpool  - DATABASE_SESSION_MODE=threadpool (AsyncDBSession + worker threads)
+  async       - DATABASE_SESSION_MODE=async (AsyncDBSession + aiosqlite/asyncpg)
+
+It reports throughput, latency percentiles and the worst event-loop stall.
+It runs against a throwaway SQLite database in a temp directory by default. Set
+DATABASE_URL to point it at PostgreSQL; the data it generates is not cleaned up.
+
+Usage (from the backend directory):
+    python -m benchmarks.db_concurrency_bench --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+if not os.environ.get("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="translator-bench-"))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.crud import conversation_crud  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.database import AsyncDBSession, SessionLocal, create_db_and_tables, dispose_async_engine  # noqa: E402
+
+
+def seed(conversations: int, messages_per_conversation: int) -> None:
+    create_db_and_tables()
+    with SessionLocal() as db:
+        if db.query(models.Conversation).count() >= conversations:
+            return
+        db.execute(insert(models.Conversation), [{"title": f"Bench {i}", "use_context": True} for i in range(conversations)])
+        conversation_ids = [row[0] for row in db.query(models.Conversation.id).all()]
+        batch = []
+        for conversation_id in conversation_ids:
+            for n in range(messages_per_conversation):
+                batch.append({"conversation_id": conversation_id, "original_text": f"sentence {n}", "translated_text": f"جملة {n}"})
+            if len(batch) >= 10_000:
+                db.execute(insert(models.Message), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.Message), batch)
+        db.commit()
+
+
+def _translate_queries(db, conversation_id: int):
+    conversation = conversation_crud.get_conversation(db, conversation_id)
+    return conversation_crud.get_last_messages(db, conversation.id, 4)
+
+
+async def _one_request(mode: str, conversation_id: int, upstream_ms: float) -> float:
+    started = time.perf_counter()
+    if mode == "blocking":
+        db = SessionLocal()
+        try:
+            _translate_queries(db, conversation_id)
+        finally:
+            db.close()
+    else:
+        db = AsyncDBSession(mode)
+        try:
+            await db.run_sync(_translate_queries, conversation_id)
+        finally:
+            await db.close()
+    await asyncio.sleep(upstream_ms / 1000)
+    return time.perf_counter() - started
+
+
+async def _loop_monitor(stop: asyncio.Event, interval: float, stalls: list) -> None:
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def run_mode(mode: str, requests: int, concurrency: int, conversations: int, upstream_ms: float) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop, stalls = asyncio.Event(), []
+    monitor = asyncio.create_task(_loop_monitor(stop, 0.005, stalls))
+
+    async def worker(i: int) -> float:
+        async with semaphore:
+            return await _one_request(mode, (i % conversations) + 1, upstream_ms)
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(worker(i) for i in range(requests))))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    if mode == "async":
+        await dispose_async_engine()
+
+    def pct(p: float) -> float:
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+    return {
+        "mode": mode,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_loop_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages-per-conversation", type=int, default=500)
+    parser.add_argument("--upstream-ms", type=float, default=20.0, help="Simulated upstream latency per request")
+    parser.add_argument("--modes", nargs="+", default=["blocking", "threadpool", "async"])
+    args = parser.parse_args()
+
+    seed(args.conversations, args.messages_per_conversation)
+    header = f"{'mode':<11} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_loop_stall_ms':>18}"
+    print(header)
+    print("-" * len(header))
+    for mode in args.modes:
+        result = asyncio.run(run_mode(mode, args.requests, args.concurrency, args.conversations, args.upstream_ms))
+        print(f"{result['mode']:<11} {result['throughput_rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_loop_stall_ms']:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
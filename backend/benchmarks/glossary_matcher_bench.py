@@ -0,0 +1,82 @@
+"""
+Benchmark for the glossary matcher used to build the dictionary prompt segment.
+
+Compares the prompt segment produced by the old approach (every dictionary
+entry is pasted into the system prompt) with the matcher, which only injects
+the entries that occur in the text, and reports build and scan times.
+
+Usage (from the backend directory):
+    python -m benchmarks.glossary_matcher_bench
+    python -m benchmarks.glossary_matcher_bench --sizes 1000 10000 100000 --text-words 200
+"""
+import argparse
+import random
+import string
+import time
+
+from app.services.dictionary_service import build_glossary_matcher
+
+
+def _random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+
+def _make_entries(rng: random.Random, count: int):
+    entries, seen = [], set()
+    while len(entries) < count:
+        source = " ".join(_random_word(rng) for _ in range(rng.randint(1, 3)))
+        if source in seen:
+            continue
+        seen.add(source)
+        entries.append((len(entries) + 1, source, source.upper()))
+    return entries
+
+
+def _make_text(rng: random.Random, entries, words: int, glossary_hits: int) -> str:
+    tokens = [_random_word(rng) for _ in range(words)]
+    for _ in range(glossary_hits):
+        tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(entries)[1])
+    return " ".join(tokens)
+
+
+def _segment_size(pairs) -> int:
+    return sum(len(f"- '{source}' MUST BE TRANSLATED AS '{target}'\n") for source, target in pairs)
+
+
+def run(sizes, text_words: int, glossary_hits: int, scans: int, seed: int) -> None:
+    rng = random.Random(seed)
+    header = f"{'entries':>8} {'build_ms':>10} {'scan_ms':>9} {'matched':>8} {'old_prompt_chars':>17} {'new_prompt_chars':>17}"
+    print(header)
+    print("-" * len(header))
+    for size in sizes:
+        entries = _make_entries(rng, size)
+        text = _make_text(rng, entries, text_words, glossary_hits)
+
+        started = time.perf_counter()
+        matcher = build_glossary_matcher(entries)
+        matcher.find("")  # compile the failure links
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(scans):
+            matches = matcher.find(text)
+        scan_ms = (time.perf_counter() - started) * 1000 / scans
+
+        old_size = _segment_size((source, target) for _, source, target in entries)
+        new_size = _segment_size(matches)
+        print(f"{size:>8} {build_ms:>10.1f} {scan_ms:>9.3f} {len(matches):>8} {old_size:>17} {new_size:>17}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--text-words", type=int, default=120, help="Length of the text to translate, in words")
+    parser.add_argument("--glossary-hits", type=int, default=5, help="Glossary terms planted in the text")
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.text_words, args.glossary_hits, args.scans, args.seed)
+
+
+if __name__ == "__main__":
+    main()
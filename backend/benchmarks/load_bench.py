@@ -0,0 +1,274 @@
+"""
+End-to-end load test for the upstream-bound endpoints.
+
+Drives the real HTTP API with concurrent clients and reports throughput and latency
+percentiles for each scenario and concurrency level:
+
+  translate   - POST /conversations/{id}/translate
+  tts         - POST /text-to-speech (timed until the whole audio stream is read)
+  transcribe  - POST /transcribe with a generated WAV file
+
+By default it starts the mock upstream (benchmarks.mock_upstream) and a backend wired to
+it (OPENAI_BASE_URL) as subprocesses, with a throwaway SQLite database in a temp
+directory, and stores a dummy API key in that database's settings. Set DATABASE_URL to
+run the backend against PostgreSQL instead; the data it creates is not cleaned up.
+Arguments for the mock go in --mock-args.
+
+To measure a backend that is already running, pass --target; it must already be pointed
+at a mock (or at a real upstream you are willing to pay for). --api-key overwrites the
+stored openai_api_key setting of that backend.
+
+Every request sends different text or audio by default, so caches, the translation
+memory and request coalescing do not hide the upstream path; --repeat sends the same
+payload every time to measure those instead.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_bench --concurrency 1 10 50 --requests 200
+    python -m benchmarks.load_bench --scenarios translate --mock-args "--latency lognormal:500:0.6 --rate-limit-rate 0.05"
+    python -m benchmarks.load_bench --target http://127.0.0.1:8000 --json results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import shlex
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("translate", "tts", "transcribe")
+SAMPLE_RATE = 16000
+# Size of the header the wave module writes
+WAV_HEADER_BYTES = 44
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_servers(mock_args: List[str], workdir: str) -> Tuple[str, List[subprocess.Popen]]:
+    """
+    Starts the mock upstream and a backend pointed at it. Returns the backend URL and the processes.
+    """
+    mock_port, app_port = _free_port(), _free_port()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, OPENAI_BASE_URL=f"http://127.0.0.1:{mock_port}/v1")
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_upstream", "--port", str(mock_port), *mock_args],
+        cwd=BACKEND_DIR, env=env,
+    )
+    processes = [mock]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{mock_port}/stats", mock)
+        # Run from the temp directory so the SQLite database and TTS cache land there
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning"],
+            cwd=workdir, env=env,
+        )
+        processes.append(backend)
+        _wait_until_up(f"http://127.0.0.1:{app_port}/", backend)
+    except BaseException:
+        stop_servers(processes)
+        raise
+    return f"http://127.0.0.1:{app_port}", processes
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def make_wav(seconds: float) -> bytes:
+    """
+    A mono 16-bit WAV of a 440 Hz tone.
+    """
+    frames = bytearray()
+    for n in range(int(seconds * SAMPLE_RATE)):
+        frames += struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * n / SAMPLE_RATE)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(SAMPLE_RATE)
+        output.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class Scenario:
+    def __init__(self, name: str, api: str, conversation_ids: List[int], text_words: int, audio: bytes, repeat: bool):
+        self.name = name
+        self.api = api
+        self.conversation_ids = conversation_ids
+        self.text_words = text_words
+        self.audio = audio
+        self.repeat = repeat
+
+    def _text(self, n: int) -> str:
+        words = " ".join(f"word{(n * 7 + i) % 97}" for i in range(self.text_words))
+        return "Benchmark sentence: " + words if self.repeat else f"Benchmark sentence {n}: {words}"
+
+    async def send(self, client: httpx.AsyncClient, n: int) -> httpx.Response:
+        """
+        Sends request number n and reads the whole response body.
+        """
+        if self.name == "translate":
+            conversation_id = self.conversation_ids[n % len(self.conversation_ids)]
+            return await client.post(
+                f"{self.api}/conversations/{conversation_id}/translate",
+                json={"text_to_translate": self._text(n), "target_language": "Arabic"},
+            )
+        if self.name == "tts":
+            async with client.stream("POST", f"{self.api}/text-to-speech", json={"text": self._text(n)}) as response:
+                await response.aread()
+                return response
+        audio = self.audio
+        if not self.repeat:
+            # Overwrites the first samples with the request number, so every upload hashes differently
+            audio = audio[:WAV_HEADER_BYTES] + struct.pack("<i", n) + audio[WAV_HEADER_BYTES + 4:]
+        return await client.post(f"{self.api}/transcribe", files={"audio_file": (f"bench-{n}.wav", audio, "audio/wav")})
+
+
+async def run_level(scenario: Scenario, client: httpx.AsyncClient, requests: int, concurrency: int, offset: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await scenario.send(client, offset + n)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+async def prepare(client: httpx.AsyncClient, api: str, api_key: Optional[str], conversations: int) -> List[int]:
+    if api_key:
+        (await client.post(f"{api}/settings", json={"key": "openai_api_key", "value": api_key})).raise_for_status()
+    conversation_ids = []
+    for i in range(conversations):
+        response = await client.post(f"{api}/conversations/", json={"title": f"Load bench {i}"})
+        response.raise_for_status()
+        conversation_ids.append(response.json()["id"])
+    return conversation_ids
+
+
+async def run(args: argparse.Namespace, base_url: str) -> List[dict]:
+    api = base_url.rstrip("/") + "/api/v1"
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        conversation_ids = await prepare(client, api, args.api_key, args.conversations)
+        audio = make_wav(args.audio_seconds)
+        header = f"{'scenario':<11} {'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}"
+        print(header)
+        print("-" * len(header))
+        offset = 0
+        for name in args.scenarios:
+            scenario = Scenario(name, api, conversation_ids, args.text_words, audio, args.repeat)
+            if args.warmup:
+                await run_level(scenario, client, args.warmup, min(args.warmup, max(args.concurrency)), offset)
+                offset += args.warmup
+            for concurrency in args.concurrency:
+                result = await run_level(scenario, client, args.requests, concurrency, offset)
+                offset += args.requests
+                results.append(result)
+                print(
+                    f"{result['scenario']:<11} {result['concurrency']:>5} {result['requests']:>6} {result['errors']:>6} "
+                    f"{result['throughput_rps']:>8.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}"
+                )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50], help="Concurrency levels to run, in order")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each scenario")
+    parser.add_argument("--conversations", type=int, default=20, help="Conversations the translate requests are spread over")
+    parser.add_argument("--text-words", type=int, default=12, help="Words per text to translate or synthesize")
+    parser.add_argument("--audio-seconds", type=float, default=5.0, help="Length of the WAV files sent for transcription")
+    parser.add_argument("--repeat", action="store_true", help="Send the same payload every time (measures caches and coalescing)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--target", help="Base URL of a running backend; by default one is started against the mock")
+    parser.add_argument("--api-key", help="Stored as openai_api_key before the run (default: a dummy key when starting our own backend)")
+    parser.add_argument("--mock-args", default="", help="Extra arguments for benchmarks.mock_upstream")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file as JSON")
+    args = parser.parse_args()
+
+    processes = []
+    if args.target:
+        base_url = args.target
+    else:
+        args.api_key = args.api_key or "sk-mock-load-bench"
+        base_url, processes = start_servers(shlex.split(args.mock_args), tempfile.mkdtemp(prefix="translator-load-"))
+    try:
+        results = asyncio.run(run(args, base_url))
+    finally:
+        stop_servers(processes)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as output:
+            json.dump({"base_url": base_url, "repeat": args.repeat, "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
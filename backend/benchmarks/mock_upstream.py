@@ -0,0 +1,269 @@
+"""
+Local stand-in for the OpenAI API, for load tests that must not depend on (or pay for)
+the real service.
+
+It emulates the endpoints the backend calls:
+
+  POST /v1/chat/completions      - non-streaming and streaming (server-sent events)
+  POST /v1/audio/speech          - audio bytes, streamed faster than real time
+  POST /v1/audio/transcriptions  - multipart upload, JSON transcript
+
+Latencies are drawn from a configurable distribution, given as "kind:params" in
+milliseconds:
+
+  fixed:200              always 200 ms
+  uniform:100:400        uniformly between 100 and 400 ms
+  normal:300:50          mean 300 ms, standard deviation 50 ms (never below 0)
+  lognormal:300:0.5      median 300 ms, sigma 0.5 (a long right tail, like the real API)
+  exponential:300        mean 300 ms
+
+A fraction of requests can fail with a 429 (with Retry-After) or a 500, so retry and
+backoff paths get exercised too. GET /stats returns request and error counts.
+
+Point the backend at it with OPENAI_BASE_URL, e.g.:
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn app.main:app
+
+Usage (from the backend directory):
+    python -m benchmarks.mock_upstream --port 8765 --latency lognormal:300:0.5 --rate-limit-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Roughly what a 48 kbps MP3 takes per second of speech
+SPEECH_BYTES_PER_SECOND = 6000
+# Speaking rate used to size the audio for a text
+SPEECH_CHARS_PER_SECOND = 15
+# An MPEG audio frame header, so the payload at least looks like MP3
+_MP3_FRAME = b"\xff\xf3\x44\xc4" + bytes(140)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parses a "kind:params" latency spec (milliseconds) into a sampler returning seconds.
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(":")] if params else []
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid latency parameters: {spec!r}")
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+    if kind not in expected or len(values) != expected[kind]:
+        raise argparse.ArgumentTypeError(
+            f"Invalid latency spec {spec!r}; expected one of fixed:MS, uniform:LOW:HIGH, "
+            "normal:MEAN:STD, lognormal:MEDIAN:SIGMA, exponential:MEAN"
+        )
+
+    if kind == "fixed":
+        sample = lambda rng: values[0]
+    elif kind == "uniform":
+        sample = lambda rng: rng.uniform(values[0], values[1])
+    elif kind == "normal":
+        sample = lambda rng: rng.gauss(values[0], values[1])
+    elif kind == "lognormal":
+        sample = lambda rng: rng.lognormvariate(math.log(max(values[0], 1e-3)), values[1])
+    else:
+        sample = lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    return lambda rng: max(sample(rng), 0.0) / 1000
+
+
+@dataclass
+class MockConfig:
+    chat_latency: Callable[[random.Random], float]
+    speech_latency: Callable[[random.Random], float]
+    transcription_latency: Callable[[random.Random], float]
+    token_interval_ms: float = 15.0
+    speech_speedup: float = 10.0
+    transcription_ms_per_mb: float = 200.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_ms: int = 500
+    seed: Optional[int] = None
+
+
+def _error(status_code: int, message: str, error_type: str, code: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    # Same body shape as the real API, so the SDK raises the matching exception type
+    return JSONResponse(
+        {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+def _words(text: str) -> list:
+    return text.split() or ["..."]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(math.ceil(len(text.encode("utf-8")) / 4), 1)
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI upstream")
+    rng = random.Random(config.seed)
+    counts = {"requests": {}, "rate_limited": 0, "errors": 0}
+
+    def injected_failure(endpoint: str) -> Optional[JSONResponse]:
+        counts["requests"][endpoint] = counts["requests"].get(endpoint, 0) + 1
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            counts["rate_limited"] += 1
+            return _error(
+                429, "Rate limit reached (mock).", "requests", "rate_limit_exceeded",
+                headers={"retry-after-ms": str(config.retry_after_ms), "retry-after": str(math.ceil(config.retry_after_ms / 1000))},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            counts["errors"] += 1
+            return _error(500, "The server had an error while processing your request (mock).", "server_error", "server_error")
+        return None
+
+    @app.get("/stats")
+    def stats():
+        return counts
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = injected_failure("chat")
+        await asyncio.sleep(config.chat_latency(rng))
+        if failure is not None:
+            return failure
+
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        last_user = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+        # A stand-in "translation" about as long as the source text
+        reply = f"[mock] {last_user}"
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": _estimate_tokens(reply),
+            "total_tokens": _estimate_tokens(prompt) + _estimate_tokens(reply),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, chunk_usage: Optional[dict] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if chunk_usage is None else [],
+            }
+            if chunk_usage is not None:
+                payload["usage"] = chunk_usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for index, word in enumerate(_words(reply)):
+                await asyncio.sleep(config.token_interval_ms / 1000)
+                yield chunk({"content": word if index == 0 else f" {word}"})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        failure = injected_failure("speech")
+        await asyncio.sleep(config.speech_latency(rng))
+        if failure is not None:
+            return failure
+
+        audio_seconds = max(len(str(body.get("input") or "")) / SPEECH_CHARS_PER_SECOND, 0.5)
+        total_bytes = int(audio_seconds * SPEECH_BYTES_PER_SECOND)
+        # Sent in quarter-second pieces of audio, `speech_speedup` times faster than playback
+        piece = SPEECH_BYTES_PER_SECOND // 4
+        interval = 0.25 / config.speech_speedup if config.speech_speedup > 0 else 0.0
+
+        async def audio():
+            sent = 0
+            while sent < total_bytes:
+                size = min(piece, total_bytes - sent)
+                yield (_MP3_FRAME * (size // len(_MP3_FRAME) + 1))[:size]
+                sent += size
+                if interval:
+                    await asyncio.sleep(interval)
+
+        return StreamingResponse(audio(), media_type="audio/mpeg")
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        size = len(await upload.read()) if upload is not None else 0
+        failure = injected_failure("transcription")
+        # Longer uploads take longer, as they do upstream
+        await asyncio.sleep(config.transcription_latency(rng) + size / 1_000_000 * config.transcription_ms_per_mb / 1000)
+        if failure is not None:
+            return failure
+
+        text = f"mock transcript of {size} bytes"
+        if form.get("response_format") == "text":
+            return Response(text, media_type="text/plain")
+        return {"text": text}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=parse_latency, default="lognormal:300:0.5", help="Default latency for every endpoint")
+    parser.add_argument("--chat-latency", type=parse_latency, help="Time to the first chat completion byte")
+    parser.add_argument("--speech-latency", type=parse_latency, help="Time to the first audio byte")
+    parser.add_argument("--transcription-latency", type=parse_latency, help="Base transcription time")
+    parser.add_argument("--token-interval-ms", type=float, default=15.0, help="Delay between streamed chat tokens")
+    parser.add_argument("--speech-speedup", type=float, default=10.0, help="How much faster than real time audio is streamed")
+    parser.add_argument("--transcription-ms-per-mb", type=float, default=200.0, help="Extra transcription time per MB uploaded")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after-ms", type=int, default=500, help="Retry-After sent with 429s")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible latencies and failures")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        chat_latency=args.chat_latency or args.latency,
+        speech_latency=args.speech_latency or args.latency,
+        transcription_latency=args.transcription_latency or args.latency,
+        token_interval_ms=args.token_interval_ms,
+        speech_speedup=args.speech_speedup,
+        transcription_ms_per_mb=args.transcription_ms_per_mb,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_ms=args.retry_after_ms,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
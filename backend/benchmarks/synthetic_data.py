@@ -0,0 +1,287 @@
+"""
+Reproducible synthetic data for database benchmarks.
+
+Fills the schema with realistic volumes: by default 100k conversations, 10M messages,
+1M notes and 100k dictionary entries, all multiplied by --scale. The same --seed and
+volumes always produce the same rows.
+
+The data is shaped like real use rather than uniform:
+  - messages per conversation follow a heavy-tailed (Pareto) distribution, so most
+    conversations are short and a few are very long
+  - message lengths vary around ten words, in English and (translated) Arabic
+  - timestamps spread over the year 2024, increasing within each conversation
+  - about 10% of conversations are archived
+  - the denormalized conversation stats (message_count, last_message_preview,
+    updated_at) and message token counts are filled in as the CRUD layer would
+
+The full-text search index is built at the end, the same way the app builds it on
+first start. The translation memory (about a hundred rows per message) is only filled
+with --translation-memory.
+
+Tables that already hold conversations are left alone, so a generated database can
+be reused across benchmark runs.
+
+Usage (from the backend directory):
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.synthetic_data --scale 0.1
+    DATABASE_URL=postgresql://localhost/translator_bench python -m benchmarks.synthetic_data
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.crud import search_crud, translation_memory_crud  # noqa: E402
+from app.db import models  # noqa: E402
+from app.services import token_counter  # noqa: E402
+
+BATCH_SIZE = 10_000
+# Pareto shape for messages per conversation: lower means a longer tail
+CONVERSATION_LENGTH_SHAPE = 1.5
+ARCHIVED_RATIO = 0.1
+TARGET_LANGUAGES = ("English", "English", "English", "Arabic", "French")
+# Timestamps are laid out over the year before this, so runs produce identical rows
+REFERENCE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+_LATIN_SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "de", "van", "tor", "bel", "qu", "str", "an", "en", "is", "or"]
+_ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+
+@dataclass
+class Volumes:
+    conversations: int = 100_000
+    messages: int = 10_000_000
+    notes: int = 1_000_000
+    dictionary_entries: int = 100_000
+
+    def scaled(self, scale: float) -> "Volumes":
+        return Volumes(**{field.name: max(int(getattr(self, field.name) * scale), 1) for field in fields(self)})
+
+
+class _TextGenerator:
+    """
+    Sentences over fixed pseudo-word vocabularies, so the text has realistic word
+    lengths and repetition without shipping a corpus.
+    """
+
+    def __init__(self, rng: random.Random, vocabulary_size: int = 10_000):
+        self.rng = rng
+        self.latin = [self._latin_word() for _ in range(vocabulary_size)]
+        self.arabic = [self._arabic_word() for _ in range(vocabulary_size)]
+
+    def _latin_word(self) -> str:
+        return "".join(self.rng.choice(_LATIN_SYLLABLES) for _ in range(self.rng.randint(1, 4)))
+
+    def _arabic_word(self) -> str:
+        return "".join(self.rng.choice(_ARABIC_LETTERS) for _ in range(self.rng.randint(2, 7)))
+
+    def _word_count(self) -> int:
+        return min(max(int(self.rng.lognormvariate(math.log(10), 0.6)), 1), 200)
+
+    def _word(self, vocabulary: List[str]) -> str:
+        # Zipf-like: a few common words make up much of the text
+        if self.rng.random() < 0.7:
+            return vocabulary[min(int(self.rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)]
+        return self.rng.choice(vocabulary)
+
+    def _words(self, vocabulary: List[str], count: int) -> str:
+        return " ".join(self._word(vocabulary) for _ in range(count))
+
+    def sentence_pair(self):
+        count = self._word_count()
+        original = self._words(self.latin, count).capitalize() + "."
+        translated = self._words(self.arabic, max(int(count * self.rng.uniform(0.8, 1.2)), 1)) + "."
+        return original, translated
+
+    def paragraph(self) -> str:
+        return " ".join(self.sentence_pair()[0] for _ in range(self.rng.randint(1, 4)))
+
+    def term(self) -> str:
+        return " ".join(self.rng.choice(self.latin) for _ in range(self.rng.randint(1, 3)))
+
+
+def _conversation_lengths(rng: random.Random, conversations: int, messages: int) -> List[int]:
+    weights = [rng.paretovariate(CONVERSATION_LENGTH_SHAPE) for _ in range(conversations)]
+    total = sum(weights)
+    lengths = [int(weight / total * messages) for weight in weights]
+    # Hand out what rounding down left over, one message each
+    for index in rng.sample(range(conversations), min(messages - sum(lengths), conversations)):
+        lengths[index] += 1
+    return lengths
+
+
+def _flush(db: Session, model, rows: List[dict]) -> None:
+    if rows:
+        db.execute(insert(model), rows)
+        rows.clear()
+
+
+def _fix_sequence(db: Session, table: str) -> None:
+    # Conversation ids are assigned here rather than by the database; PostgreSQL's
+    # sequence has to be moved past them
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+
+
+def generate(db: Session, volumes: Volumes, seed: int = 42, translation_memory: bool = False, progress: bool = True) -> Dict[str, int]:
+    """
+    Fills an empty database with synthetic rows and returns the row counts.
+    Does nothing (and returns the current counts) if conversations already exist.
+    """
+    if db.execute(select(func.count()).select_from(models.Conversation)).scalar():
+        return row_counts(db)
+
+    rng = random.Random(seed)
+    words = _TextGenerator(random.Random(seed + 1))
+    now = REFERENCE_TIME
+    started = time.perf_counter()
+
+    def report(label: str, done: int, total: int) -> None:
+        if progress:
+            print(f"  {label}: {done:,}/{total:,} ({time.perf_counter() - started:.0f}s)", flush=True)
+
+    lengths = _conversation_lengths(rng, volumes.conversations, volumes.messages)
+    conversations, messages, written, next_report = [], [], 0, 1_000_000
+    for index, length in enumerate(lengths):
+        conversation_id = index + 1
+        created_at = now - timedelta(seconds=rng.uniform(0, 365 * 86400))
+        timestamp = created_at
+        target_language = rng.choice(TARGET_LANGUAGES)
+        original = None
+        for _ in range(length):
+            # A couple of minutes apart on average
+            timestamp = min(timestamp + timedelta(seconds=rng.expovariate(1 / 120)), now)
+            original, translated = words.sentence_pair()
+            messages.append({
+                "conversation_id": conversation_id,
+                "original_text": original,
+                "translated_text": translated,
+                "target_language": target_language,
+                "token_count": token_counter.count_message_tokens(original, translated),
+                "created_at": timestamp,
+            })
+        conversations.append({
+            "id": conversation_id,
+            "title": words.term().title(),
+            "created_at": created_at,
+            "updated_at": timestamp,
+            "use_context": rng.random() < 0.9,
+            "is_archived": rng.random() < ARCHIVED_RATIO,
+            "message_count": length,
+            "last_message_preview": original[:120] if original else None,
+        })
+        if len(messages) >= BATCH_SIZE or len(conversations) >= BATCH_SIZE:
+            # Conversations first, so the messages' foreign keys resolve
+            _flush(db, models.Conversation, conversations)
+            written += len(messages)
+            _flush(db, models.Message, messages)
+            db.commit()
+            if written >= next_report:
+                report("messages", written, volumes.messages)
+                next_report += 1_000_000
+    _flush(db, models.Conversation, conversations)
+    _flush(db, models.Message, messages)
+    _fix_sequence(db, "conversations")
+    db.commit()
+    report("messages", volumes.messages, volumes.messages)
+
+    notes = []
+    for _ in range(volumes.notes):
+        notes.append({
+            "conversation_id": rng.randint(1, volumes.conversations),
+            "content": words.paragraph(),
+            "created_at": now - timedelta(seconds=rng.uniform(0, 365 * 86400)),
+        })
+        if len(notes) >= BATCH_SIZE:
+            _flush(db, models.Note, notes)
+    _flush(db, models.Note, notes)
+    db.commit()
+    report("notes", volumes.notes, volumes.notes)
+
+    entries, seen = [], set()
+    while len(seen) < volumes.dictionary_entries:
+        source = words.term()
+        if source in seen:
+            continue
+        seen.add(source)
+        entries.append({"source_text": source, "target_text": words.sentence_pair()[1].rstrip(".")})
+        if len(entries) >= BATCH_SIZE:
+            _flush(db, models.DictionaryEntry, entries)
+    _flush(db, models.DictionaryEntry, entries)
+    db.commit()
+    report("dictionary entries", volumes.dictionary_entries, volumes.dictionary_entries)
+
+    # Builds the SQLite FTS table from the rows above (PostgreSQL indexes itself)
+    search_crud.ensure_search_index(db)
+    if translation_memory:
+        translation_memory_crud.rebuild_translation_memory(db)
+        db.commit()
+    analyze(db)
+    report("indexes", 1, 1)
+    return row_counts(db)
+
+
+def analyze(db: Session) -> None:
+    """
+    Refreshes the planner statistics, as the database would eventually do on its own.
+    """
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+def row_counts(db: Session) -> Dict[str, int]:
+    counted = {
+        "conversations": models.Conversation,
+        "messages": models.Message,
+        "notes": models.Note,
+        "dictionary_entries": models.DictionaryEntry,
+    }
+    return {name: db.execute(select(func.count()).select_from(model)).scalar() for name, model in counted.items()}
+
+
+def add_volume_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = Volumes()
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to every volume")
+    parser.add_argument("--conversations", type=int, default=defaults.conversations)
+    parser.add_argument("--messages", type=int, default=defaults.messages)
+    parser.add_argument("--notes", type=int, default=defaults.notes)
+    parser.add_argument("--dictionary-entries", type=int, default=defaults.dictionary_entries)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--translation-memory", action="store_true", help="Also fill the translation memory (large)")
+
+
+def volumes_from_args(args: argparse.Namespace) -> Volumes:
+    return Volumes(args.conversations, args.messages, args.notes, args.dictionary_entries).scaled(args.scale)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+    if not os.environ.get("DATABASE_URL"):
+        # Without it the app's default database (./translator.db) would be filled
+        parser.error("set DATABASE_URL to the database to fill, e.g. sqlite:///./bench.db")
+
+    from app.db.database import SessionLocal, create_db_and_tables
+
+    volumes = volumes_from_args(args)
+    print(f"Generating {volumes}")
+    create_db_and_tables()
+    with SessionLocal() as db:
+        counts = generate(db, volumes, seed=args.seed, translation_memory=args.translation_memory)
+    for name, count in counts.items():
+        print(f"{name:<20} {count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import math
+import os
+import struct
+import wave
+
+import pytest
+
+from app.services.audio_segmentation import split_wav, wav_duration_seconds
+
+RATE = 16000
+
+
+def _write_wav(path, seconds, channels=1):
+    """
+    A 440 Hz tone with a short pause every 7 seconds, 16-bit PCM.
+    """
+    frames = bytearray()
+    for index in range(int(seconds * RATE)):
+        quiet = (index / RATE) % 7 > 6.7
+        sample = 0 if quiet else int(8000 * math.sin(2 * math.pi * 440 * index / RATE))
+        frames += struct.pack("<h", sample) * channels
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(bytes(frames))
+    return path
+
+def _check_coverage(segments, duration, overlap_seconds):
+    assert segments[0].start_seconds == 0
+    assert segments[-1].end_seconds == pytest.approx(duration)
+    for previous, segment in zip(segments, segments[1:]):
+        assert segment.start_seconds == pytest.approx(max(previous.end_seconds - overlap_seconds, 0))
+
+def test_short_audio_is_not_split(tmp_path):
+    path = _write_wav(str(tmp_path / "short.wav"), 5)
+    assert split_wav(path, str(tmp_path), segment_seconds=10, overlap_seconds=1, search_seconds=2) == []
+
+def test_segments_cover_the_audio_with_overlap(tmp_path):
+    path = _write_wav(str(tmp_path / "long.wav"), 40)
+    segments = split_wav(path, str(tmp_path), segment_seconds=10, overlap_seconds=1, search_seconds=2)
+
+    assert len(segments) >= 4
+    _check_coverage(segments, 40, overlap_seconds=1)
+    for segment in segments[:-1]:
+        assert os.path.exists(segment.path)
+        # Cut in the search window before the nominal boundary
+        assert 8 - 1 <= segment.end_seconds - segment.start_seconds <= 10 + 1
+
+def test_max_segment_bytes_limits_every_file(tmp_path):
+    path = _write_wav(str(tmp_path / "stereo.wav"), 30, channels=2)
+    max_bytes = 400_000
+    segments = split_wav(
+        path, str(tmp_path), segment_seconds=600, overlap_seconds=0.5, search_seconds=2, max_segment_bytes=max_bytes
+    )
+
+    assert len(segments) > 1
+    _check_coverage(segments, 30, overlap_seconds=0.5)
+    for segment in segments:
+        assert os.path.getsize(segment.path) <= max_bytes
+        assert wav_duration_seconds(segment.path) == pytest.approx(segment.end_seconds - segment.start_seconds)
+
+def test_audio_over_the_byte_limit_is_split_even_when_short(tmp_path):
+    path = _write_wav(str(tmp_path / "short.wav"), 8)
+    segments = split_wav(
+        path, str(tmp_path), segment_seconds=600, overlap_seconds=0, search_seconds=1, max_segment_bytes=100_000
+    )
+    assert len(segments) > 1
+    assert all(os.path.getsize(segment.path) <= 100_000 for segment in segments)
+
+def test_byte_limit_too_small_for_any_audio(tmp_path):
+    path = _write_wav(str(tmp_path / "short.wav"), 3)
+    with pytest.raises(ValueError):
+        split_wav(path, str(tmp_path), segment_seconds=600, overlap_seconds=1, search_seconds=1, max_segment_bytes=20_000)
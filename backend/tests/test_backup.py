@@ -0,0 +1,129 @@
+import io
+import json
+import threading
+import zipfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import backup_service
+
+
+@pytest.fixture
+def backup_db(db, session_factory, monkeypatch):
+    # iter_backup_archive opens its own session
+    monkeypatch.setattr(backup_service, "SessionLocal", session_factory)
+    return db
+
+def _fill(db):
+    db.add(models.Setting(key="ui_language", value="ar"))
+    db.add(models.Prompt(title="formal", content="Translate formally."))
+    db.add(models.DictionaryEntry(source_text="server", target_text="خادم"))
+    conversation = models.Conversation(
+        title="محادثة", custom_prompt="Be brief.", updated_at=datetime(2024, 3, 1, 9, 30), is_archived=True
+    )
+    db.add(conversation)
+    db.flush()
+    for index in range(5):
+        db.add(models.Message(
+            conversation_id=conversation.id,
+            original_text=f"Hello number {index}",
+            translated_text=f"مرحبا رقم {index}",
+            target_language="ar",
+        ))
+    db.add(models.Note(conversation_id=conversation.id, content="ملاحظة"))
+    db.commit()
+
+def _dump(db):
+    """
+    Every backed-up row, as plain values.
+    """
+    return {
+        table.name: [dict(row) for row in db.execute(table.select().order_by(*table.primary_key.columns)).mappings()]
+        for table in backup_service.BACKUP_TABLES
+    }
+
+def _archive():
+    return io.BytesIO(b"".join(backup_service.iter_backup_archive(batch_size=2)))
+
+def test_backup_and_restore_round_trip(backup_db):
+    _fill(backup_db)
+    before = _dump(backup_db)
+    archive = _archive()
+
+    backup_db.query(models.Message).filter(models.Message.id > 2).delete()
+    backup_db.add(models.Setting(key="extra", value="1"))
+    backup_db.commit()
+
+    row_counts = backup_service.restore_backup_archive(backup_db, archive, replace=True, batch_size=2)
+
+    assert row_counts == {name: len(rows) for name, rows in before.items()}
+    assert _dump(backup_db) == before
+    # The translation memory is rebuilt from the restored messages
+    assert backup_db.query(models.TranslationMemoryTrigram).count() > 0
+
+def test_manifest_lists_row_counts(backup_db):
+    _fill(backup_db)
+    with zipfile.ZipFile(_archive()) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["format_version"] == backup_service.BACKUP_FORMAT_VERSION
+    assert manifest["tables"]["messages"] == 5
+    assert manifest["tables"]["notes"] == 1
+
+def test_restore_into_non_empty_tables_needs_replace(backup_db):
+    _fill(backup_db)
+    before = _dump(backup_db)
+    with pytest.raises(backup_service.BackupConflictError):
+        backup_service.restore_backup_archive(backup_db, _archive())
+    assert _dump(backup_db) == before
+
+def test_invalid_archives(backup_db):
+    with pytest.raises(backup_service.BackupError):
+        backup_service.restore_backup_archive(backup_db, io.BytesIO(b"not a zip file"))
+
+    no_manifest = io.BytesIO()
+    with zipfile.ZipFile(no_manifest, "w") as archive:
+        archive.writestr("messages.ndjson", "")
+    no_manifest.seek(0)
+    with pytest.raises(backup_service.BackupError):
+        backup_service.restore_backup_archive(backup_db, no_manifest)
+
+def test_archive_is_one_snapshot(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backup.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    models.Base.metadata.create_all(bind=engine)
+    file_sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(backup_service, "SessionLocal", file_sessions)
+    with file_sessions() as db:
+        _fill(db)
+
+    def write_conversation():
+        with file_sessions() as db:
+            conversation = models.Conversation(title="written during the backup")
+            db.add(conversation)
+            db.flush()
+            db.add(models.Message(conversation_id=conversation.id, original_text="new", translated_text="جديد"))
+            db.commit()
+
+    chunks = backup_service.iter_backup_archive(batch_size=1)
+    archive = io.BytesIO()
+    # Everything up to and including the conversations table
+    for _ in range(4):
+        archive.write(next(chunks))
+    writer = threading.Thread(target=write_conversation)
+    writer.start()
+    writer.join(timeout=0.5)
+    for chunk in chunks:
+        archive.write(chunk)
+    writer.join()
+
+    with zipfile.ZipFile(archive) as backup:
+        conversation_ids = {json.loads(line)["id"] for line in backup.read("conversations.ndjson").splitlines()}
+        messages = [json.loads(line) for line in backup.read("messages.ndjson").splitlines()]
+    assert len(messages) == 5
+    assert {message["conversation_id"] for message in messages} <= conversation_ids
+    with file_sessions() as db:
+        assert db.query(models.Message).count() == 6
+    engine.dispose()
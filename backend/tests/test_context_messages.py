@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud import conversation_crud
+from app.db import models
+from app.services import token_counter
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Same counts with or without tiktoken: one token per four UTF-8 bytes
+    monkeypatch.setattr(token_counter, "_encoding", lambda: None)
+
+def _add_messages(db, texts, token_count=None):
+    conversation = models.Conversation(title="context")
+    db.add(conversation)
+    db.commit()
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    for index, (original_text, translated_text) in enumerate(texts):
+        db.add(models.Message(
+            conversation_id=conversation.id,
+            original_text=original_text,
+            translated_text=translated_text,
+            target_language="Arabic",
+            created_at=start + timedelta(minutes=index),
+            token_count=token_count,
+        ))
+    db.commit()
+    return conversation.id
+
+def _originals(messages):
+    return [message.original_text for message in messages]
+
+def test_newest_messages_that_fit_oldest_first(db):
+    # 8 + 8 bytes: 4 tokens of text and 8 of overhead per message
+    conversation_id = _add_messages(db, [(f"text {i:03d}", f"نص {i:03d}") for i in range(5)])
+    assert token_counter.count_message_tokens("text 000", "نص 000") == 12
+
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 36)) == ["text 002", "text 003", "text 004"]
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 35)) == ["text 003", "text 004"]
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 1000)) == [f"text {i:03d}" for i in range(5)]
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 1000, max_messages=2)) == ["text 003", "text 004"]
+
+def test_stored_token_counts_are_used(db):
+    conversation_id = _add_messages(db, [("a", "b"), ("c", "d")], token_count=50)
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 99)) == ["c"]
+    assert _originals(conversation_crud.get_context_messages(db, conversation_id, 100)) == ["a", "c"]
+
+def test_selection_stops_at_the_first_message_that_does_not_fit(db):
+    conversation_id = _add_messages(db, [("short", "قصير"), ("x" * 400, "y" * 400), ("short", "قصير")])
+    assert len(conversation_crud.get_context_messages(db, conversation_id, 50)) == 1
+
+def test_newest_message_alone_over_budget_is_truncated(db):
+    conversation_id = _add_messages(db, [("old", "قديم"), ("a" * 296 + " end", "b" * 89 + " نهاية")])
+    [message] = conversation_crud.get_context_messages(db, conversation_id, 48)
+
+    # 75 + 25 tokens of text; the 40 left after the overhead are split 3:1, and the end is kept
+    assert message.original_text.endswith(" end") and len(message.original_text) == 30 * 4
+    assert message.translated_text.endswith(" نهاية") and len(message.translated_text.encode("utf-8")) == 10 * 4
+    assert token_counter.count_message_tokens(message.original_text, message.translated_text) <= 48
+
+    # A copy: the stored message is untouched and the copy is not in the session
+    assert message not in db
+    stored = db.get(models.Message, message.id)
+    assert stored.original_text == "a" * 296 + " end"
+
+def test_no_context_when_the_budget_is_too_small(db):
+    conversation_id = _add_messages(db, [("a" * 100, "b" * 100)])
+    assert conversation_crud.get_context_messages(db, conversation_id, 9) == []
+    assert conversation_crud.get_context_messages(db, conversation_id, 0) == []
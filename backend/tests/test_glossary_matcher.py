@@ -0,0 +1,67 @@
+from app.services.dictionary_service import GlossaryMatcher
+
+
+def _matcher(entries, whole_words=True):
+    matcher = GlossaryMatcher(whole_words=whole_words)
+    for entry_id, (source_text, target_text) in enumerate(entries, start=1):
+        matcher.add(entry_id, source_text, target_text)
+    return matcher
+
+def test_finds_terms_in_order_of_first_occurrence():
+    matcher = _matcher([("server", "خادم"), ("database", "قاعدة بيانات")])
+    assert matcher.find("The Database runs on the server.") == [("database", "قاعدة بيانات"), ("server", "خادم")]
+
+def test_overlapping_terms():
+    matcher = _matcher([("machine learning", "تعلم الآلة"), ("learning", "تعلم")])
+    assert matcher.find("machine learning") == [("machine learning", "تعلم الآلة"), ("learning", "تعلم")]
+
+def test_whole_words_only_by_default():
+    matcher = _matcher([("art", "فن")])
+    assert matcher.find("start the party") == []
+    assert matcher.find("art, start") == [("art", "فن")]
+    assert matcher.find("(art)") == [("art", "فن")]
+
+def test_term_edges_that_are_not_letters_need_no_boundary():
+    matcher = _matcher([("c++", "سي بلس بلس")])
+    assert matcher.find("c++11") == [("c++", "سي بلس بلس")]
+    assert matcher.find("abc++") == []
+
+def test_substring_matching():
+    matcher = _matcher([("art", "فن")], whole_words=False)
+    assert matcher.find("start") == [("art", "فن")]
+
+def test_arabic_terms():
+    matcher = _matcher([("كتاب", "book")])
+    assert matcher.find("قرأت كتاب اليوم") == [("كتاب", "book")]
+    assert matcher.find("قرأت الكتابة") == []
+
+def test_arabic_terms_with_attached_prefixes():
+    matcher = _matcher([("كتاب", "book"), ("محكمة", "court")])
+    assert matcher.find("قرأت الكتاب في المحكمة") == [("كتاب", "book"), ("محكمة", "court")]
+    for text in ["وكتاب", "بالكتاب", "للكتاب", "فالكتاب", "وللكتاب", "كالكتاب"]:
+        assert matcher.find(text) == [("كتاب", "book")], text
+
+def test_arabic_prefixes_must_start_the_word():
+    matcher = _matcher([("كتاب", "book")])
+    # "مكتاب" and "سالكتاب" are not a prefix followed by the term
+    assert matcher.find("مكتاب") == []
+    assert matcher.find("سالكتاب") == []
+    # Latin terms get no prefix exception
+    assert _matcher([("art", "فن")]).find("بart") == []
+
+def test_arabic_term_with_article_after_a_conjunction():
+    matcher = _matcher([("الكتاب", "the book")])
+    assert matcher.find("والكتاب") == [("الكتاب", "the book")]
+
+def test_add_replace_and_remove():
+    matcher = _matcher([("cat", "قطة"), ("dog", "كلب")])
+    assert matcher.find("cat and dog") == [("cat", "قطة"), ("dog", "كلب")]
+
+    matcher.remove(1)
+    matcher.add(2, "bird", "طائر")
+    assert matcher.find("cat and dog and bird") == [("bird", "طائر")]
+    assert len(matcher) == 1
+
+def test_entries_sharing_a_term():
+    matcher = _matcher([("Bank", "بنك"), ("bank", "ضفة")])
+    assert matcher.find("the bank") == [("Bank", "بنك"), ("bank", "ضفة")]
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud import conversation_crud
+from app.crud.pagination import InvalidCursorError, decode_cursor, encode_cursor, paginate
+from app.db import models
+
+
+def _add_conversations(db, count):
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    for index in range(count):
+        # Pairs of conversations share an updated_at, so the id has to break the tie
+        updated_at = start + timedelta(minutes=index // 2)
+        db.add(models.Conversation(title=f"c{index}", created_at=updated_at, updated_at=updated_at))
+    db.commit()
+
+def _all_pages(fetch_page):
+    items, cursor, pages = [], None, 0
+    while True:
+        page, cursor = fetch_page(cursor)
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 6, 7, 8, 9, 123456), 42, 1.5, "2024-01-01 12:00:00"]
+    assert decode_cursor(encode_cursor(values), len(values)) == values
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor([1]), "W1sieCIsMV1d"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 2)
+
+def test_pages_cover_every_row_once(db):
+    _add_conversations(db, 23)
+    expected = [
+        conversation.id for conversation in
+        db.query(models.Conversation).order_by(models.Conversation.updated_at.desc(), models.Conversation.id.desc())
+    ]
+
+    conversations, pages = _all_pages(lambda cursor: conversation_crud.get_conversation_summaries_page(db, cursor=cursor, limit=5))
+
+    assert [conversation.id for conversation in conversations] == expected
+    assert pages == 5
+
+def test_mixed_sort_directions(db):
+    _add_conversations(db, 10)
+    query = db.query(models.Conversation)
+    sort_keys = [(models.Conversation.updated_at, False), (models.Conversation.id, True)]
+    expected = [
+        conversation.id for conversation in
+        query.order_by(models.Conversation.updated_at.asc(), models.Conversation.id.desc())
+    ]
+
+    conversations, _ = _all_pages(lambda cursor: paginate(query, sort_keys, cursor, 3))
+
+    assert [conversation.id for conversation in conversations] == expected
+
+def test_last_page_has_no_cursor(db):
+    _add_conversations(db, 4)
+    conversations, cursor = conversation_crud.get_conversation_summaries_page(db, limit=4)
+    assert len(conversations) == 4
+    assert cursor is None
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import text
+
+from app.crud import conversation_crud, note_crud, search_crud
+from app.db import models
+from app.schemas import conversation as conversation_schemas
+from app.schemas import note as note_schemas
+
+
+@pytest.fixture
+def search_db(db, monkeypatch):
+    monkeypatch.setattr(search_crud, "_search_available", False)
+    conversation = models.Conversation(title="search")
+    db.add(conversation)
+    db.commit()
+    db.info["conversation_id"] = conversation.id
+    return db
+
+def _add_message(db, original_text, translated_text="translated"):
+    message = conversation_schemas.MessageCreate(original_text=original_text, translated_text=translated_text)
+    return conversation_crud.create_conversation_message(db, message, db.info["conversation_id"])
+
+def _hits(db, query):
+    items, _ = search_crud.search(db, query)
+    return [(item["kind"], item["id"]) for item in items]
+
+def test_existing_rows_are_indexed_when_the_index_is_created(search_db):
+    message = _add_message(search_db, "The contract was signed")
+    search_crud.ensure_search_index(search_db)
+    assert search_crud.is_search_available()
+    assert _hits(search_db, "contract") == [("message", message.id)]
+
+def test_writes_keep_the_index_current(search_db):
+    search_crud.ensure_search_index(search_db)
+    message = _add_message(search_db, "first draft")
+    note = note_crud.create_note(search_db, note_schemas.NoteCreate(content="remember the draft"), search_db.info["conversation_id"])
+    assert sorted(_hits(search_db, "draft")) == sorted([("message", message.id), ("note", note.id)])
+
+    conversation_crud.update_message(search_db, message.id, "final version", "translated")
+    assert _hits(search_db, "draft") == [("note", note.id)]
+    assert _hits(search_db, "final") == [("message", message.id)]
+
+    note_crud.delete_note(search_db, note.id)
+    assert _hits(search_db, "draft") == []
+    conversation_crud.delete_conversation(search_db, search_db.info["conversation_id"])
+    assert _hits(search_db, "final") == []
+
+def test_writes_outside_the_crud_layer_are_indexed(search_db):
+    search_crud.ensure_search_index(search_db)
+    search_db.execute(
+        text("INSERT INTO messages (conversation_id, original_text, translated_text) VALUES (:cid, :original, '')"),
+        {"cid": search_db.info["conversation_id"], "original": "imported by a script"},
+    )
+    search_db.commit()
+    assert len(_hits(search_db, "script")) == 1
+
+def test_arabic_marks_are_ignored(search_db):
+    search_crud.ensure_search_index(search_db)
+    message = _add_message(search_db, "ذهبت إلى المَدْرَسَة")
+    assert _hits(search_db, "المدرسة") == [("message", message.id)]
+    assert _hits(search_db, "المَدرسة") == [("message", message.id)]
+
+def test_missing_triggers_are_recreated_and_the_index_repaired(search_db):
+    search_crud.ensure_search_index(search_db)
+    search_db.execute(text("DROP TRIGGER search_index_message_insert"))
+    search_db.commit()
+    message = _add_message(search_db, "written while the trigger was missing")
+    assert _hits(search_db, "trigger") == []
+
+    search_crud.ensure_search_index(search_db)
+    assert _hits(search_db, "trigger") == [("message", message.id)]
+    assert len(_hits(search_db, "missing")) == 1
@@ -0,0 +1,232 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+class _Upstream:
+    """
+    A fake upstream stream that sends the chunks it is given and records how it ended.
+    """
+
+    def __init__(self):
+        self.opened = 0
+        self.chunks: "asyncio.Queue" = asyncio.Queue()
+        self.closed = asyncio.Event()
+        self.cancelled = False
+
+    async def open(self):
+        self.opened += 1
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            while True:
+                chunk = await self.chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed.set()
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+async def _collect(iterator):
+    return [chunk async for chunk in iterator]
+
+def test_do_shares_one_call():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+        release = asyncio.Event()
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.create_task(flights.do("key", call)) for _ in range(3)]
+        await _settle()
+        release.set()
+        assert await asyncio.gather(*waiters) == ["result"] * 3
+        assert calls == 1
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2}
+
+    asyncio.run(scenario())
+
+def test_do_survives_one_cancelled_waiter_and_stops_when_all_are_gone():
+    async def scenario():
+        flights = SingleFlight("test")
+        release = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await release.wait()
+                return "result"
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flights.do("key", call))
+        second = asyncio.create_task(flights.do("key", call))
+        await _settle()
+        first.cancel()
+        await _settle()
+        assert not cancelled.is_set()
+        release.set()
+        assert await second == "result"
+
+        release.clear()
+        only = asyncio.create_task(flights.do("other", call))
+        await _settle()
+        only.cancel()
+        await _settle()
+        assert cancelled.is_set()
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_do_raises_to_every_waiter():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def call():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(flights.do("key", call), flights.do("key", call), return_exceptions=True)
+        assert [str(result) for result in results] == ["upstream failed"] * 2
+
+    asyncio.run(scenario())
+
+def test_stream_readers_share_and_replay():
+    async def scenario():
+        flights = SingleFlight("test")
+        upstream = _Upstream()
+        first = await flights.stream("key", upstream.open)
+        upstream.chunks.put_nowait(b"a")
+        upstream.chunks.put_nowait(b"b")
+        first_task = asyncio.create_task(_collect(first))
+        await _settle()
+
+        # A late reader gets the chunks it missed, then follows live
+        second = await flights.stream("key", upstream.open)
+        second_task = asyncio.create_task(_collect(second))
+        upstream.chunks.put_nowait(b"c")
+        upstream.chunks.put_nowait(None)
+
+        assert await first_task == [b"a", b"b", b"c"]
+        assert await second_task == [b"a", b"b", b"c"]
+        assert upstream.opened == 1
+
+    asyncio.run(scenario())
+
+def test_stream_error_reaches_every_reader_after_its_chunks():
+    async def scenario():
+        flights = SingleFlight("test")
+        upstream = _Upstream()
+        readers = [await flights.stream("key", upstream.open) for _ in range(2)]
+        upstream.chunks.put_nowait(b"a")
+        upstream.chunks.put_nowait(RuntimeError("connection reset"))
+        for reader in readers:
+            received = []
+            with pytest.raises(RuntimeError, match="connection reset"):
+                async for chunk in reader:
+                    received.append(chunk)
+            assert received == [b"a"]
+
+    asyncio.run(scenario())
+
+def test_stream_open_error_is_raised_to_every_caller():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def open_stream():
+            await asyncio.sleep(0)
+            raise ConnectionError("refused")
+
+        results = await asyncio.gather(
+            flights.stream("key", open_stream), flights.stream("key", open_stream), return_exceptions=True
+        )
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_stream_continues_while_one_reader_remains():
+    async def scenario():
+        flights = SingleFlight("test")
+        upstream = _Upstream()
+        leaving = await flights.stream("key", upstream.open)
+        staying = await flights.stream("key", upstream.open)
+        upstream.chunks.put_nowait(b"a")
+        assert await leaving.__anext__() == b"a"
+        await leaving.aclose()
+        await _settle()
+        assert not upstream.closed.is_set()
+
+        upstream.chunks.put_nowait(None)
+        assert await _collect(staying) == [b"a"]
+        assert not upstream.cancelled
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("leave", ["aclose", "cancel", "drop"])
+def test_stream_stops_upstream_when_the_last_reader_leaves(leave):
+    async def scenario():
+        flights = SingleFlight("test")
+        upstream = _Upstream()
+        reader = await flights.stream("key", upstream.open)
+        await _settle()
+
+        if leave == "aclose":
+            # Closed without ever being iterated
+            await reader.aclose()
+        elif leave == "cancel":
+            consumer = asyncio.create_task(_collect(reader))
+            await _settle()
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+        else:
+            del reader
+            gc.collect()
+
+        await asyncio.wait_for(upstream.closed.wait(), timeout=1)
+        assert upstream.cancelled
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_cancelled_caller_waiting_for_the_open_is_released():
+    async def scenario():
+        flights = SingleFlight("test")
+        opening = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def open_stream():
+            try:
+                opening.set()
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(flights.stream("key", open_stream))
+        await opening.wait()
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,21 @@
+from app.services.transcription_service import stitch_transcripts
+
+
+def test_overlap_is_kept_once():
+    parts = [
+        "the quick brown fox jumps over the lazy dog",
+        "over the lazy dog and runs into the forest",
+    ]
+    assert stitch_transcripts(parts) == "the quick brown fox jumps over the lazy dog and runs into the forest"
+
+def test_overlap_ignores_case_and_punctuation():
+    parts = ["We met at the station, then we", "At the station then we walked home."]
+    assert stitch_transcripts(parts) == "We met at the station, then we walked home."
+
+def test_parts_without_overlap_are_concatenated():
+    assert stitch_transcripts(["first part here", "second part there"]) == "first part here second part there"
+
+def test_single_and_empty_parts():
+    assert stitch_transcripts([]) == ""
+    assert stitch_transcripts(["only one part"]) == "only one part"
+    assert stitch_transcripts(["", "starts later"]) == "starts later"
@@ -0,0 +1,73 @@
+import pytest
+
+from app.services import translation_cache as translation_cache_module
+from app.services.translation_cache import TranslationCache, make_cache_key
+
+BASE = dict(text="Hello", target_language="Arabic", model_name="gpt-4o-mini", custom_prompt=None, glossary_version=1)
+
+
+def test_key_is_stable():
+    assert make_cache_key(**BASE) == make_cache_key(**BASE)
+    # No custom prompt and an empty one build the same prompt
+    assert make_cache_key(**BASE) == make_cache_key(**{**BASE, "custom_prompt": ""})
+
+@pytest.mark.parametrize("change", [
+    {"text": "Hello!"},
+    {"target_language": "French"},
+    {"model_name": "gpt-4o"},
+    {"custom_prompt": "Be formal."},
+    {"glossary_version": 2},
+    {"context": [("Hi", "مرحبا")]},
+])
+def test_every_input_changes_the_key(change):
+    assert make_cache_key(**{**BASE, **change}) != make_cache_key(**BASE)
+
+def test_context_order_matters():
+    first = make_cache_key(**BASE, context=[("a", "1"), ("b", "2")])
+    second = make_cache_key(**BASE, context=[("b", "2"), ("a", "1")])
+    assert first != second
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TranslationCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+def test_setting_an_existing_key_does_not_evict():
+    cache = TranslationCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.set("a", "A2")
+    assert cache.get("a") == "A2"
+    assert cache.get("b") == "B"
+    assert cache.stats()["evictions"] == 0
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(translation_cache_module.time, "monotonic", lambda: now[0])
+    cache = TranslationCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", "A")
+    now[0] += 59
+    assert cache.get("a") == "A"
+    now[0] += 1
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+def test_zero_entries_disables_the_cache():
+    cache = TranslationCache(max_entries=0, ttl_seconds=60)
+    cache.set("a", "A")
+    assert cache.get("a") is None
+
+def test_stats():
+    cache = TranslationCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", "A")
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
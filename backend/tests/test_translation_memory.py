@@ -0,0 +1,115 @@
+import pytest
+
+from app.core.config import settings
+from app.crud import conversation_crud, translation_memory_crud
+from app.crud.translation_memory_crud import find_matches, normalize_segment, trigrams
+from app.db import models
+from app.schemas import conversation as conversation_schemas
+from app.services import dictionary_service, translation_service
+
+
+@pytest.fixture
+def memory_db(db, monkeypatch):
+    # The glossary matcher and the translation cache are process-wide
+    monkeypatch.setattr(dictionary_service, "_matcher", None)
+    monkeypatch.setattr(settings, "TRANSLATION_CACHE_ENABLED", False)
+    conversation = models.Conversation(title="memory")
+    db.add(conversation)
+    db.commit()
+    db.info["conversation_id"] = conversation.id
+    return db
+
+def _save(db, original_text, translated_text, target_language="Arabic", reuse_key=None):
+    message = conversation_schemas.MessageCreate(
+        original_text=original_text,
+        translated_text=translated_text,
+        target_language=target_language,
+        reuse_key=reuse_key,
+    )
+    return conversation_crud.create_conversation_message(db, message, db.info["conversation_id"])
+
+def test_normalization():
+    assert normalize_segment("  Hello,   WORLD! ") == "hello world"
+    assert normalize_segment("الْكِتَابُ") == "الكتاب"
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+    assert trigrams("") == set()
+
+def test_same_text_after_normalization_is_an_exact_match(memory_db):
+    message = _save(memory_db, "Please sign the contract.", "يرجى توقيع العقد.")
+    [match] = find_matches(memory_db, "please sign the CONTRACT", "Arabic", min_similarity=0.7)
+    assert (match.message_id, match.similarity, match.translated_text) == (message.id, 1.0, "يرجى توقيع العقد.")
+
+def test_similar_texts_are_ranked_by_similarity(memory_db):
+    close = _save(memory_db, "Please sign the contract today", "1")
+    closer = _save(memory_db, "Please sign the contract now", "2")
+    _save(memory_db, "The weather is nice", "3")
+
+    matches = find_matches(memory_db, "Please sign the contract now!", "Arabic", min_similarity=0.5)
+    assert [match.message_id for match in matches] == [closer.id, close.id]
+    assert matches[0].similarity == 1.0
+    assert 0.5 <= matches[1].similarity < 1.0
+
+def test_threshold_language_and_limits(memory_db):
+    _save(memory_db, "Please sign the contract today", "1")
+    _save(memory_db, "Please sign the contract today", "2", target_language="French")
+    assert find_matches(memory_db, "Please sign the form", "Arabic", min_similarity=0.9) == []
+    assert len(find_matches(memory_db, "Please sign the contract today", "Arabic", min_similarity=0.7)) == 1
+    assert find_matches(memory_db, "x" * 50, "Arabic", min_similarity=0.5, max_chars=10) == []
+
+def test_common_trigrams_are_skipped(memory_db):
+    for index in range(6):
+        _save(memory_db, f"the contract number {index}", str(index))
+    target = _save(memory_db, "the contract about zebras", "zebras")
+
+    # Every trigram of "the contract" is in more than max_postings messages
+    matches = find_matches(memory_db, "the contract about zebras", "Arabic", min_similarity=0.7, max_postings=3)
+    assert [match.message_id for match in matches] == [target.id]
+    # Nothing rare is left to look up
+    assert find_matches(memory_db, "the contract", "Arabic", min_similarity=0.5, max_postings=3) == []
+
+def test_edits_and_deletes_update_the_memory(memory_db):
+    message = _save(memory_db, "good morning", "صباح الخير")
+    conversation_crud.update_message(memory_db, message.id, "good evening", "مساء الخير")
+    assert find_matches(memory_db, "good morning", "Arabic", min_similarity=0.9) == []
+    assert find_matches(memory_db, "good evening", "Arabic", min_similarity=0.9)[0].translated_text == "مساء الخير"
+
+    conversation_crud.delete_message(memory_db, message.id)
+    assert find_matches(memory_db, "good evening", "Arabic", min_similarity=0.5) == []
+
+def test_ensure_translation_memory_backfills_old_messages(memory_db):
+    _save(memory_db, "good morning", "صباح الخير")
+    memory_db.query(models.TranslationMemoryTrigram).delete()
+    memory_db.commit()
+
+    translation_memory_crud.ensure_translation_memory(memory_db)
+    assert len(find_matches(memory_db, "good morning", "Arabic", min_similarity=0.9)) == 1
+
+def _prepare(db, text, model_name="gpt-4o-mini", custom_prompt=None):
+    return translation_service._prepare_translation(db, text, "Arabic", [], custom_prompt, model_name)
+
+def _save_translation(db, text, translated_text, model_name="gpt-4o-mini", custom_prompt=None):
+    [reuse_key] = translation_service.make_reuse_keys(db, [text], "Arabic", custom_prompt, model_name)
+    _save(db, text, translated_text, reuse_key=reuse_key)
+
+def test_earlier_translations_are_hints_by_default(memory_db):
+    _save_translation(memory_db, "Please sign the contract", "يرجى توقيع العقد")
+    _, messages, finished_translation = _prepare(memory_db, "Please sign the contract")
+    assert finished_translation is None
+    assert "يرجى توقيع العقد" in messages[0]["content"]
+
+def test_reuse_needs_the_same_raw_text_and_inputs(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSLATION_MEMORY_REUSE_ENABLED", True)
+    _save_translation(memory_db, "Please sign the contract", "يرجى توقيع العقد")
+
+    assert _prepare(memory_db, "Please sign the contract")[2] == "يرجى توقيع العقد"
+    # Normalizes to the same segment, but the raw text differs
+    assert _prepare(memory_db, "please sign the contract!")[2] is None
+    assert _prepare(memory_db, "Please sign the contract", model_name="gpt-4o")[2] is None
+    assert _prepare(memory_db, "Please sign the contract", custom_prompt="Be formal.")[2] is None
+
+def test_reuse_stops_when_the_glossary_changes(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSLATION_MEMORY_REUSE_ENABLED", True)
+    _save_translation(memory_db, "Please sign the contract", "يرجى توقيع العقد")
+    dictionary_service.cache_version_crud.bump_version(memory_db, dictionary_service.GLOSSARY_VERSION_KEY)
+    memory_db.commit()
+    assert _prepare(memory_db, "Please sign the contract")[2] is None
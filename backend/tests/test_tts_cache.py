@@ -0,0 +1,101 @@
+import os
+import time
+
+from app.services import tts_cache as tts_cache_module
+from app.services.tts_cache import TTSAudioCache, make_tts_cache_key
+
+
+def _key(name):
+    return make_tts_cache_key(name, "tts-1", "alloy", "mp3")
+
+def _store(cache, key, data):
+    writer = cache.open_writer(key)
+    writer.write(data)
+    writer.commit()
+
+def _read(path):
+    with open(path, "rb") as cached_file:
+        return cached_file.read()
+
+def test_committed_entries_are_served(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=100)
+    assert cache.get(_key("a")) is None
+    _store(cache, _key("a"), b"audio")
+    assert _read(cache.get(_key("a"))) == b"audio"
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (1, 5, 1, 1)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=25)
+    for name in ("a", "b", "c"):
+        _store(cache, _key(name), b"x" * 10)
+    # Only two fit: "a" was the oldest
+    assert cache.get(_key("a")) is None
+    assert cache.get(_key("b")) is not None
+    _store(cache, _key("d"), b"x" * 10)
+
+    assert cache.get(_key("c")) is None
+    assert cache.get(_key("b")) is not None
+    assert cache.get(_key("d")) is not None
+    assert not os.path.exists(cache.path_for(_key("c")))
+    assert cache.stats()["evictions"] == 2
+
+def test_aborted_and_empty_writes_leave_nothing(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=100)
+    writer = cache.open_writer(_key("aborted"))
+    writer.write(b"partial")
+    writer.abort()
+    _store(cache, _key("empty"), b"")
+
+    assert cache.get(_key("aborted")) is None
+    assert cache.get(_key("empty")) is None
+    assert [name for _, _, names in os.walk(str(tmp_path)) for name in names] == []
+
+def test_files_written_by_another_worker_are_adopted(tmp_path):
+    first = TTSAudioCache(str(tmp_path), max_bytes=25)
+    second = TTSAudioCache(str(tmp_path), max_bytes=25)
+    second.get(_key("warm-up"))
+    _store(first, _key("a"), b"x" * 10)
+
+    assert _read(second.get(_key("a"))) == b"x" * 10
+    assert second.stats()["bytes"] == 10
+    # The adopted file counts towards this worker's cap
+    _store(second, _key("b"), b"y" * 10)
+    _store(second, _key("c"), b"z" * 10)
+    assert not os.path.exists(second.path_for(_key("a")))
+
+def test_files_evicted_by_another_worker_are_forgotten(tmp_path):
+    first = TTSAudioCache(str(tmp_path), max_bytes=100)
+    second = TTSAudioCache(str(tmp_path), max_bytes=100)
+    _store(first, _key("a"), b"x" * 10)
+    assert second.get(_key("a")) is not None
+    os.unlink(first.path_for(_key("a")))
+
+    assert second.get(_key("a")) is None
+    assert second.stats()["bytes"] == 0
+
+def test_existing_files_are_loaded_oldest_first(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=100)
+    for age, name in enumerate(("newest", "middle", "oldest")):
+        _store(cache, _key(name), b"x" * 10)
+        past = time.time() - 60 * (age + 1)
+        os.utime(cache.path_for(_key(name)), (past, past))
+
+    restarted = TTSAudioCache(str(tmp_path), max_bytes=25)
+    assert restarted.get(_key("newest")) is not None
+    assert restarted.get(_key("oldest")) is None
+    assert restarted.get(_key("middle")) is not None
+
+def test_stale_temp_files_are_removed_on_load(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=100)
+    stale = cache.open_writer(_key("stale"))
+    fresh = cache.open_writer(_key("fresh"))
+    stale_path, fresh_path = stale._temp_path, fresh._temp_path
+    past = time.time() - tts_cache_module._STALE_TEMP_FILE_SECONDS - 60
+    os.utime(stale_path, (past, past))
+
+    TTSAudioCache(str(tmp_path), max_bytes=100).get(_key("anything"))
+    assert not os.path.exists(stale_path)
+    assert os.path.exists(fresh_path)
+    stale.abort()
+    fresh.abort()
@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import tts_service
+from app.services.tts_cache import TTSAudioCache, make_tts_cache_key
+
+AUDIO = [b"ID3", b"frame-1", b"frame-2"]
+
+
+class _Response:
+    async def iter_bytes(self):
+        for chunk in AUDIO:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class _ResponseContext:
+    def __init__(self):
+        self.exited = False
+
+    async def __aenter__(self):
+        return _Response()
+
+    async def __aexit__(self, *exc_info):
+        self.exited = True
+
+
+class _Scheduler:
+    async def run(self, api_key, call, **kwargs):
+        return await call()
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    contexts = []
+
+    def create(**kwargs):
+        contexts.append(_ResponseContext())
+        return contexts[-1]
+
+    client = SimpleNamespace(audio=SimpleNamespace(speech=SimpleNamespace(with_streaming_response=SimpleNamespace(create=create))))
+    monkeypatch.setattr(tts_service.upstream_clients, "get_client", lambda api_key: client)
+    monkeypatch.setattr(tts_service, "upstream_scheduler", _Scheduler())
+    monkeypatch.setattr(tts_service, "tts_cache", TTSAudioCache(str(tmp_path / "tts"), max_bytes=1024 * 1024))
+    return contexts
+
+def _speak(text):
+    async def scenario():
+        cache_key = make_tts_cache_key(text, "tts-1", "alloy", "mp3")
+        stream = await tts_service.generate_speech_from_text(text, "key", cache_key=cache_key)
+        if stream is None:
+            return None, cache_key
+        return [chunk async for chunk in stream], cache_key
+    return asyncio.run(scenario())
+
+def test_streamed_audio_is_cached(upstream):
+    chunks, cache_key = _speak("cached")
+    assert chunks == AUDIO
+    assert upstream[0].exited
+    path = tts_service.tts_cache.get(cache_key)
+    with open(path, "rb") as cached_file:
+        assert cached_file.read() == b"".join(AUDIO)
+
+def test_cache_that_cannot_be_opened_does_not_stop_the_audio(upstream, monkeypatch):
+    def fail(key):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(tts_service.tts_cache, "open_writer", fail)
+
+    chunks, cache_key = _speak("unwritable")
+    assert chunks == AUDIO
+    assert upstream[0].exited
+
+def test_write_error_mid_stream_drops_only_the_cache_entry(upstream, monkeypatch):
+    open_writer = tts_service.tts_cache.open_writer
+    writers = []
+
+    def open_failing_writer(key):
+        writer = open_writer(key)
+        original_write = writer.write
+
+        def write(data):
+            if writer.size:
+                raise OSError("no space left on device")
+            original_write(data)
+        writer.write = write
+        writers.append(writer)
+        return writer
+    monkeypatch.setattr(tts_service.tts_cache, "open_writer", open_failing_writer)
+
+    chunks, cache_key = _speak("disk full")
+    assert chunks == AUDIO
+    assert upstream[0].exited
+    assert tts_service.tts_cache.get(cache_key) is None
+    # The partial temp file is gone
+    assert writers[0]._temp_path is None
+
+def test_response_is_closed_when_opening_the_stream_fails(upstream, monkeypatch):
+    def fail(key):
+        raise RuntimeError("unexpected")
+    monkeypatch.setattr(tts_service.tts_cache, "open_writer", fail)
+
+    chunks, _ = _speak("broken")
+    assert chunks is None
+    assert upstream[0].exited
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import settings
+from app.services import upstream_scheduler as scheduler_module
+from app.services.upstream_scheduler import (
+    PRIORITIES, PRIORITY_BATCH, PRIORITY_INTERACTIVE, UpstreamScheduler, _KeyScheduler, _retry_delay, _Waiter,
+)
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _status_error(status_code, headers=None, code=None):
+    response = httpx.Response(status_code, headers=headers or {}, request=_REQUEST)
+    error_class = openai.RateLimitError if status_code == 429 else openai.APIStatusError
+    return error_class("error", response=response, body={"code": code} if code else None)
+
+@pytest.fixture
+def upper_jitter(monkeypatch):
+    # The largest delay each jittered draw allows
+    monkeypatch.setattr(scheduler_module.random, "uniform", lambda low, high: high)
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after": "2"}, 2.2),
+    ({"retry-after-ms": "1500", "retry-after": "9"}, 1.65),
+    ({"retry-after": "1000"}, 30.0),
+])
+def test_retry_after_is_honoured(upper_jitter, headers, expected):
+    assert _retry_delay(_status_error(429, headers), attempt=0) == pytest.approx(expected)
+
+def test_retry_after_as_a_date():
+    delay = _retry_delay(_status_error(503, {"retry-after": formatdate(time.time() + 10, usegmt=True)}), attempt=0)
+    assert 8 <= delay <= 11
+
+def test_backoff_without_retry_after(upper_jitter):
+    delays = [_retry_delay(_status_error(500), attempt) for attempt in range(8)]
+    assert delays == [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+    assert _retry_delay(openai.APIConnectionError(request=_REQUEST), 0) == 0.5
+    assert _retry_delay(openai.APITimeoutError(request=_REQUEST), 0) == 0.5
+
+@pytest.mark.parametrize("error", [
+    _status_error(400, {"retry-after": "1"}),
+    _status_error(401),
+    _status_error(429, {"retry-after": "1"}, code="insufficient_quota"),
+    ValueError("not an upstream error"),
+])
+def test_errors_that_are_not_retried(error):
+    assert _retry_delay(error, attempt=0) is None
+
+def test_interactive_requests_go_first():
+    async def scenario():
+        key = _KeyScheduler(UpstreamScheduler())
+        granted = []
+        for name in ("batch 1", "interactive 1", "batch 2", "interactive 2"):
+            priority = PRIORITIES.index(name.split()[0])
+            key.enqueue(priority, 0).add_done_callback(lambda _, name=name: granted.append(name))
+        await asyncio.sleep(0.05)
+        return granted
+
+    assert asyncio.run(scenario()) == ["interactive 1", "interactive 2", "batch 1", "batch 2"]
+
+def test_batch_work_leaves_a_reserve(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_RPM_LIMIT", 60)
+    monkeypatch.setattr(settings, "UPSTREAM_TPM_LIMIT", 6000)
+    monkeypatch.setattr(settings, "UPSTREAM_INTERACTIVE_RESERVE", 0.5)
+    key = _KeyScheduler(UpstreamScheduler())
+    now = time.monotonic()
+    key.requests.level, key.requests.updated = 40, now
+    key.tokens.level, key.tokens.updated = 3000, now
+    interactive = _Waiter(PRIORITIES.index(PRIORITY_INTERACTIVE), 500, None)
+    batch = _Waiter(PRIORITIES.index(PRIORITY_BATCH), 500, None)
+
+    assert key._wait_time(interactive, now) == 0
+    # Needs 500 + 3000 tokens: 500 more, at 100 a second
+    assert key._wait_time(batch, now) == pytest.approx(5.0)
+
+    key.tokens.level = 6000
+    # Needs 1 + 30 requests: none missing
+    assert key._wait_time(batch, now) == 0
+    key.requests.level = 21
+    # 10 requests missing, at one a second
+    assert key._wait_time(batch, now) == pytest.approx(10.0)
+
+def test_rate_limit_pauses_the_key(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_RETRIES", 1)
+    scheduler = UpstreamScheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _status_error(429, {"retry-after-ms": "200"})
+        return "ok"
+
+    assert asyncio.run(scheduler.run("key", call)) == "ok"
+    assert 0.2 <= attempts[1] - attempts[0] < 1.0
+    assert scheduler._keys["key"].blocked_until >= attempts[0] + 0.2
+    assert (scheduler.rate_limited, scheduler.retries) == (1, 1)
+
+
+def test_retries_stop_at_the_limit(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_RETRIES", 2)
+    scheduler = UpstreamScheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(None)
+        raise _status_error(429, {"retry-after-ms": "10"})
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(scheduler.run("key", call))
+    assert len(attempts) == 3
+    assert (scheduler.retries, scheduler.failures) == (2, 1)
@@ -51,8 +51,10 @@ export const changePassword = (old_password, new_password) => {
 
 
 // --- Conversation APIs ---
-export const getConversations = () => apiClient.get('/api/v1/conversations/');
-export const getArchivedConversations = () => apiClient.get('/api/v1/conversations/archived');
+// The sidebar only needs summaries: the full listing also serializes every message.
+// Both return { items, next_cursor }; pass next_cursor back to get the following page.
+export const getConversations = (cursor) => apiClient.get('/api/v1/conversations/page', { params: { cursor } });
+export const getArchivedConversations = (cursor) => apiClient.get('/api/v1/conversations/archived/page', { params: { cursor } });
 export const createConversation = (title) => apiClient.post('/api/v1/conversations/', { title });
 export const getConversationById = (id) => apiClient.get(`/api/v1/conversations/${id}`);
 export const exportConversation = (id) => apiClient.get(`/api/v1/conversations/${id}/export`);
@@ -31,6 +31,8 @@ function ConversationListPage() {
   const [editingTitle, setEditingTitle] = useState('');
   const [viewMode, setViewMode] = useState('active');
   const [searchQuery, setSearchQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchConversations = async () => {
@@ -39,7 +41,8 @@ function ConversationListPage() {
         const response = viewMode === 'active' 
           ? await getConversations() 
           : await getArchivedConversations();
-        setConversations(response.data);
+        setConversations(response.data.items);
+        setNextCursor(response.data.next_cursor);
         setError('');
       } catch (err) {
         setError(`فشل في جلب المحادثات ال${viewMode === 'active' ? 'نشطة' : 'مؤرشفة'}.`);
@@ -51,6 +54,22 @@ function ConversationListPage() {
     fetchConversations();
   }, [viewMode]);
 
+  const handleLoadMore = async () => {
+    try {
+      setIsLoadingMore(true);
+      const response = viewMode === 'active'
+        ? await getConversations(nextCursor)
+        : await getArchivedConversations(nextCursor);
+      setConversations(current => [...current, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      setError('فشل في جلب المزيد من المحادثات.');
+      console.error(err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const filteredConversations = useMemo(() => {
     if (!searchQuery) {
       return conversations;
@@ -105,6 +124,11 @@ function ConversationListPage() {
             ) : ( <p className="no-conversations"> {searchQuery ? 'لا توجد نتائج تطابق بحثك.' : (viewMode === 'active' ? 'لا توجد محادثات نشطة.' : 'لا توجد محادثات في الأرشيف.')} </p> )}
           </ul>
         )}
+        {!isLoading && nextCursor && (
+          <button onClick={handleLoadMore} disabled={isLoadingMore} className="button-primary load-more-button">
+            {isLoadingMore ? 'جاري التحميل...' : 'تحميل المزيد'}
+          </button>
+        )}
       </div>
     </div>
   );